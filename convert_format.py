@@ -4,7 +4,8 @@
 """
 import openpyxl
 from openpyxl.worksheet.formula import ArrayFormula
-from openpyxl.styles import Alignment, Border, Side, Font, PatternFill
+from openpyxl.styles import Alignment, Border, Side, Font, PatternFill, NamedStyle
+from openpyxl.cell import WriteOnlyCell
 from copy import copy
 import re
 
@@ -170,9 +171,122 @@ def convert_to_template_format(source_file, output_file, template_file):
     print(f"输出文件: {output_file}")
     print(f"共转换 {seq_num - 1} 行数据")
 
+def _named_style_from(cell, name, alignment=None):
+    """用模板单元格的样式构建 NamedStyle（模板单元格无样式时返回None）"""
+    if not cell.has_style:
+        return None
+    return NamedStyle(
+        name=name,
+        font=copy(cell.font),
+        border=copy(cell.border),
+        fill=copy(cell.fill),
+        number_format=cell.number_format,
+        protection=copy(cell.protection),
+        alignment=alignment or copy(cell.alignment)
+    )
+
+def _styled_cell(ws, value, style_name):
+    cell = WriteOnlyCell(ws, value=value)
+    if style_name:
+        cell.style = style_name
+    return cell
+
+def convert_to_template_format_streaming(source_file, output_file, template_file):
+    """
+    转换文件格式（流式写入）
+
+    输出与 convert_to_template_format 相同（公式、列宽、表头和数据行样式），
+    但以只读模式读取源文件、以只写模式逐行写出，模板的表头/数据行样式只注册一次为 NamedStyle，
+    不再为每个单元格复制样式对象，内存占用与行数无关
+    """
+    wb_source = openpyxl.load_workbook(source_file, read_only=True)
+    ws_source = wb_source.active
+    ws_source.reset_dimensions()
+
+    wb_template = openpyxl.load_workbook(template_file)
+    ws_template = wb_template.active
+
+    wb_output = openpyxl.Workbook(write_only=True)
+    ws_output = wb_output.create_sheet('Sheet1 (3)')
+
+    # 从模板第1行（表头）和第2行（数据行）注册样式
+    header_styles = []
+    row_styles = []
+    for col_idx in range(1, 15):
+        alignment = None
+        if col_idx == 3:
+            # 店名单元格自动换行
+            alignment = Alignment(wrap_text=True, vertical='center', horizontal='general')
+        for template_row, prefix, styles in ((1, 'tpl_header', header_styles), (2, 'tpl_row', row_styles)):
+            template_cell = ws_template.cell(template_row, col_idx)
+            style = _named_style_from(template_cell, f'{prefix}_{col_idx}',
+                                      alignment if template_row == 2 else None)
+            if style is None and template_row == 2 and alignment is not None:
+                style = NamedStyle(name=f'{prefix}_{col_idx}', alignment=alignment)
+            if style is not None:
+                wb_output.add_named_style(style)
+            styles.append(style.name if style is not None else None)
+
+    # 只写模式下列宽必须在写入行之前设置
+    for col_idx in range(1, 15):
+        col_letter = openpyxl.utils.get_column_letter(col_idx)
+        if ws_template.column_dimensions[col_letter].width:
+            ws_output.column_dimensions[col_letter].width = ws_template.column_dimensions[col_letter].width
+
+    headers = ['序号', '日期', '店名', '公里数', '公里数',
+               '不含税单价', '含税单价', '不含税合价（运费）', '含税合价（运费）',
+               '司机价格', '司机价格', '司机姓名', '照片', '备注']
+    ws_output.append([_styled_cell(ws_output, h, s) for h, s in zip(headers, header_styles)])
+
+    seq_num = 1
+    for row in ws_source.iter_rows(min_row=2, max_col=7, values_only=True):
+        row = tuple(row) + (None,) * (7 - len(row))
+        date_val, region, store_text, km_formula, price, freight, remark = row
+
+        # 如果没有店铺信息，跳过
+        if not store_text:
+            continue
+
+        store_names, total_km = parse_store_info(store_text)
+        current_row = seq_num + 1
+
+        if isinstance(price, (int, float)):
+            price_value = price
+        else:
+            price_value = f'=IF(D{current_row}<=100,440,IF(D{current_row}<=200,4.2,IF(D{current_row}<=300,4,3.9)))'
+
+        new_row = [
+            seq_num,  # 序号
+            date_val,  # 日期
+            store_names,  # 店名（换行符分隔）
+            km_formula,  # 公里数（保持原公式）
+            total_km if total_km > 0 else None,  # 公里数（计算值）
+            f'=G{current_row}/1.09',  # 不含税单价 = 含税单价 / 1.09
+            price_value,  # 含税单价
+            f'=D{current_row}*F{current_row}',  # 不含税合价 = 公里数 * 不含税单价
+            f'=D{current_row}*G{current_row}',  # 含税合价 = 公里数 * 含税单价
+            f'=IF(D{current_row}<=100,400,IF(D{current_row}<=300,3.2,3))',  # 司机价格单价
+            f'=D{current_row}*J{current_row}',  # 司机价格合价 = 公里数 * 司机价格单价
+            None,  # 司机姓名
+            None,  # 照片
+            remark  # 备注
+        ]
+        ws_output.append([_styled_cell(ws_output, v, s) for v, s in zip(new_row, row_styles)])
+
+        seq_num += 1
+
+    wb_output.save(output_file)
+    wb_template.close()
+    wb_source.close()
+
+    print(f"转换完成！")
+    print(f"源文件: {source_file}")
+    print(f"输出文件: {output_file}")
+    print(f"共转换 {seq_num - 1} 行数据")
+
 if __name__ == '__main__':
     template_file = 'data/jiangxi/summary/惠宜选江西仓对账单模板.xlsx'
     source_file = 'data/jiangxi/summary/2026/惠宜选物流对账单--临努--1月(2).xlsx'
     output_file = 'data/jiangxi/summary/2026/惠宜选物流对账单--临努--1月(2)_转换后.xlsx'
 
-    convert_to_template_format(source_file, output_file, template_file)
+    convert_to_template_format_streaming(source_file, output_file, template_file)
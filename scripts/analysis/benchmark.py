@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+- cache-startup: 比较JSON缓存与二进制快照两种加载方式从进程启动到第一次查询的耗时
+- xlsx-reader: 比较 openpyxl 与 XML 流式解析两种读取后端解析对账单路线的耗时
+
+用法:
+    python -m scripts.analysis.benchmark --mode cache-startup --region hefei
+    python -m scripts.analysis.benchmark --mode cache-startup --region jiangxi --repeat 20
+    python -m scripts.analysis.benchmark --mode xlsx-reader --files 5
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT_DIR)
+
+from scripts.utils.cache_snapshot import load_snapshot_index
+from scripts.utils.common import REGION_CONFIG, get_region_config, iter_routes_from_excel, load_distance_cache
+from scripts.utils.segment_table import split_segment_key
+from scripts.utils.workbook_reader import READERS
+
+# 在新进程中计时：从导入模块开始，到完成第一次路段查询为止；
+# 分别输出总耗时和导入之后的加载+查询耗时（scripts.utils 会导入 pandas，两种方式的导入开销相同）
+_STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from scripts.utils.{module} import {loader}
+loaded = time.perf_counter()
+index = {loader}({cache_file!r})
+index.lookup({from_store!r}, {to_store!r})
+end = time.perf_counter()
+print(end - start, end - loaded)
+"""
+
+_STARTUP_LOADERS = {
+    'json': ('common', 'load_distance_index'),
+    'snapshot': ('cache_snapshot', 'load_snapshot_index'),
+}
+
+
+def _time_startup(loader_name, cache_file, from_store, to_store):
+    module, loader = _STARTUP_LOADERS[loader_name]
+    code = _STARTUP_SCRIPT.format(root=ROOT_DIR, module=module, loader=loader, cache_file=cache_file,
+                                  from_store=from_store, to_store=to_store)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    total, load = output.stdout.split()
+    return float(total), float(load)
+
+
+def benchmark_cache_startup(region, cache_file=None, repeat=10):
+    """
+    比较缓存启动耗时
+
+    先确保快照是最新的，再分别在新进程中重复加载JSON和快照并完成一次查询。
+
+    Args:
+        region: 区域
+        cache_file: 缓存文件路径（可选，默认区域缓存）
+        repeat: 每种方式重复次数
+
+    Returns:
+        {'json': [(总秒数, 加载+查询秒数), ...], 'snapshot': [...]}
+    """
+    config = get_region_config(region)
+    if cache_file is None:
+        cache_file = os.path.join(config['cache_dir'], 'reusable_distances.json')
+
+    # 预热：生成/刷新快照；查询缓存中的第一个路段
+    load_snapshot_index(cache_file)
+    table = load_distance_cache(cache_file)
+    print(f"缓存文件: {cache_file} ({len(table)} 条路段)")
+    from_store, to_store = split_segment_key(table.key_at(0))
+
+    timings = {name: [] for name in _STARTUP_LOADERS}
+    for _ in range(repeat):
+        for name in _STARTUP_LOADERS:
+            timings[name].append(_time_startup(name, cache_file, from_store, to_store))
+
+    medians = {}
+    print("-" * 60)
+    print(f"{'方式':<10}{'总耗时中位数(ms)':>18}{'加载+查询中位数(ms)':>22}{'加载+查询最小(ms)':>20}")
+    for name, values in timings.items():
+        totals = [t for t, _ in values]
+        loads = [l for _, l in values]
+        medians[name] = statistics.median(loads)
+        print(f"{name:<10}{statistics.median(totals) * 1000:>18.1f}"
+              f"{medians[name] * 1000:>22.1f}{min(loads) * 1000:>20.1f}")
+    print(f"\n加载+首次查询: 快照为JSON的 {medians['json'] / medians['snapshot']:.1f} 倍速")
+    return timings
+
+
+def _largest_statements(count):
+    """各区域所有年份的对账单中体积最大的若干个，返回 [(文件路径, 起点), ...]"""
+    files = []
+    for config in REGION_CONFIG.values():
+        # summary_dir 指向当年目录，上一级包含历年对账单
+        pattern = os.path.join(os.path.dirname(config['summary_dir']), '**', '*.xlsx')
+        files.extend((f, config['start_point']) for f in glob.glob(pattern, recursive=True)
+                     if not os.path.basename(f).startswith('~$'))
+    files.sort(key=lambda item: os.path.getsize(item[0]), reverse=True)
+    return files[:count]
+
+
+def benchmark_xlsx_reader(files=5, repeat=3):
+    """
+    比较两种读取后端解析对账单路线的耗时
+
+    直接调用 iter_routes_from_excel（不经过解析缓存），并检查两种后端的解析结果一致。
+
+    Args:
+        files: 取体积最大的对账单数量
+        repeat: 每个文件每种后端重复次数，取最小值
+
+    Returns:
+        {'openpyxl': 总秒数, 'xml': 总秒数}
+    """
+    totals = {backend: 0.0 for backend in READERS}
+    print(f"{'文件':<40}{'大小(KB)':>10}{'路线数':>8}" + ''.join(f"{b + '(ms)':>14}" for b in READERS))
+    print("-" * (58 + 14 * len(READERS)))
+
+    for file_path, start_point in _largest_statements(files):
+        results = {}
+        best = {}
+        for backend in READERS:
+            best[backend] = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results[backend] = list(iter_routes_from_excel(file_path, start_point, backend))
+                best[backend] = min(best[backend], time.perf_counter() - start)
+            totals[backend] += best[backend]
+
+        reference = results[READERS[0]]
+        for backend in READERS[1:]:
+            if results[backend] != reference:
+                raise AssertionError(f"{backend} 后端解析结果与 {READERS[0]} 不一致: {file_path}")
+
+        name = os.path.basename(file_path)
+        print(f"{name[:38]:<40}{os.path.getsize(file_path) / 1024:>10.0f}{len(reference):>8}"
+              + ''.join(f"{best[b] * 1000:>14.1f}" for b in READERS))
+
+    print("-" * (58 + 14 * len(READERS)))
+    print(f"{'合计':<58}" + ''.join(f"{totals[b] * 1000:>14.1f}" for b in READERS))
+    print(f"\nxml 后端为 openpyxl 的 {totals['openpyxl'] / totals['xml']:.1f} 倍速，解析结果一致")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='性能基准测试')
+    parser.add_argument('--mode', '-m', required=True, choices=['cache-startup', 'xlsx-reader'],
+                        help='cache-startup: 缓存启动耗时（JSON vs 二进制快照）；'
+                             'xlsx-reader: 对账单读取耗时（openpyxl vs XML流式解析）')
+    parser.add_argument('--region', '-r', default='hefei', choices=['hefei', 'jiangxi'],
+                        help='区域（默认 hefei）')
+    parser.add_argument('--cache', '-c', help='距离缓存文件路径（可选）')
+    parser.add_argument('--repeat', type=int, help='重复次数（cache-startup 默认10，xlsx-reader 默认3）')
+    parser.add_argument('--files', type=int, default=5, help='xlsx-reader: 取体积最大的对账单数量（默认5）')
+
+    args = parser.parse_args()
+
+    if args.mode == 'cache-startup':
+        benchmark_cache_startup(args.region, args.cache, args.repeat or 10)
+    elif args.mode == 'xlsx-reader':
+        benchmark_xlsx_reader(args.files, args.repeat or 3)
+
+
+if __name__ == '__main__':
+    main()
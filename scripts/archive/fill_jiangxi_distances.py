@@ -7,10 +7,16 @@
 
 import pandas as pd
 import json
+import os
 import re
+import sys
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.utils.normalize import normalize_store_name
+
 # 配置路径
 EXCEL_PATH = 'data/jiangxi/summary/2026/惠宜选江西仓1月份对账单0110.xlsx'
 JSON_PATH = 'data/jiangxi/cache/reusable_distances.json'
@@ -20,31 +26,6 @@ OUTPUT_PATH = 'data/jiangxi/summary/2026/惠宜选江西仓1月份对账单0110.
 START_POINT = "惠宜选南昌仓"
 
 
-def normalize_store_name(name, aggressive=False):
-    """标准化店名，处理常见的格式差异"""
-    if pd.isna(name):
-        return None
-    name = str(name).strip()
-    # 统一括号格式
-    name = name.replace('（', '(').replace('）', ')')
-    # 移除多余空格
-    name = re.sub(r'\s+', '', name)
-
-    if aggressive:
-        # 更激进的标准化，用于模糊匹配
-        # 处理"历臣"和"厉臣"的混用
-        name = name.replace('历臣', '厉臣')
-        # 处理连字符差异
-        name = name.replace('-', '-').replace('—', '-').replace('－', '-')
-        # 处理"共橙一站式"和"共橙-站式"的混用
-        name = re.sub(r'共橙[-\s]*站式', '共橙一站式', name)
-        # 处理"共橙超市"和"共橙一站式超市"
-        name = name.replace('供橙超市', '共橙超市')
-        name = name.replace('供橙一站式超市', '共橙一站式超市')
-
-    return name
-
-
 def find_distance(distances, from_store, to_store):
     """
     从距离字典中查找距离，尝试多种格式匹配
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量构建：只重新运行输入有变化的步骤
+构建清单 (data/cache/build_manifest.json) 记录每个产出来自哪些源工作簿（内容哈希）和哪个版本的脚本。
+
+每个区域的步骤（按此顺序）:
+    convert:<文件>  临努格式对账单 → "<文件名>_转换后.xlsx"（区域汇总目录下有模板时）
+    cache:<区域>    所有对账单 → 距离缓存（任一对账单有变化时，全部对账单按日期从旧到新重新合并；
+                    缓存中对账单里没有的路段保留）
+    fill:<文件>     距离缓存 → 当年对账单中未填充的距离（原地更新）
+
+步骤的工具版本包含实现它的脚本和整个 scripts/utils 包，任一模块修改都会使产出过期。
+对账单填充后内容改变，又是距离缓存的输入，因此一次构建会重复多轮直到没有过期的步骤（最多 --rounds 轮）。
+首次使用时可以用 --adopt 把现有文件记为已构建，避免把所有对账单重新合并进缓存。
+
+用法:
+    python -m scripts.core.build
+    python -m scripts.core.build --region jiangxi --jobs 4
+    python -m scripts.core.build --dry-run
+    python -m scripts.core.build --adopt
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.utils.build_graph import BUILD_MANIFEST, BuildManifest, BuildStep, run_build, step_dependencies
+from scripts.utils.common import REGION_CONFIG, get_region_config
+from scripts.utils.distance_store import open_distance_store
+from scripts.utils.metrics import METRICS, add_metrics_arguments, count, dump_metrics, stage
+
+CONVERTED_SUFFIX = '_转换后'
+CONVERT_SOURCE_MARK = '临努'
+
+_SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 缓存和填充的结果取决于 scripts/utils 中的几乎所有模块（标准化、索引、读取、写回……），整个包计入工具版本
+UTILS_TOOLS = sorted(glob.glob(os.path.join(_SCRIPTS_DIR, 'utils', '*.py')))
+CACHE_TOOLS = [os.path.join(_SCRIPTS_DIR, 'core', 'rebuild_cache.py')] + UTILS_TOOLS
+FILL_TOOLS = [os.path.join(_SCRIPTS_DIR, 'core', 'fill_distances.py')] + UTILS_TOOLS
+CONVERT_TOOLS = [os.path.join(os.path.dirname(_SCRIPTS_DIR), 'convert_format.py')]
+
+
+def _run_convert(source_file, output_file, template_file, changed_inputs):
+    from convert_format import convert_to_template_format_streaming
+    convert_to_template_format_streaming(source_file, output_file, template_file)
+
+
+def _run_cache(region, statements, changed_inputs):
+    from scripts.core.rebuild_cache import rebuild_cache
+    if not any(path.endswith('.xlsx') for path in changed_inputs):
+        # 只有缓存本身在构建之外被修改（如手工维护）：保留修改
+        print("对账单没有变化，保留现有缓存")
+        return
+    # 合并结果与顺序有关（5km内以较新的为准），只把变化的对账单合并到现有缓存上会让旧对账单覆盖较新的距离；
+    # 因此全部对账单按日期重新合并，未变化的对账单从解析缓存读取
+    rebuild_cache(region, statements, keep_other_segments=True)
+
+
+def _run_fill(region, statement, changed_inputs):
+    from scripts.core.fill_distances import fill_distances_to_excel
+    fill_distances_to_excel(region, statement)
+
+
+def region_steps(region):
+    """
+    区域的构建步骤
+
+    Args:
+        region: 区域 ('hefei' 或 'jiangxi')
+
+    Returns:
+        BuildStep 列表
+    """
+    config = get_region_config(region)
+    summary_root = os.path.dirname(config['summary_dir'])
+    store = open_distance_store(region)
+    cache_file = store.location
+    store.close()
+
+    # 汇总目录根下是模板，各年份子目录中是对账单（跳过Excel临时文件）
+    statements = sorted(path for path in glob.glob(os.path.join(summary_root, '*', '**', '*.xlsx'), recursive=True)
+                        if not os.path.basename(path).startswith('~$'))
+    templates = sorted(glob.glob(os.path.join(summary_root, '*模板*.xlsx')))
+
+    steps = []
+    converted = set()
+    for path in statements:
+        stem, ext = os.path.splitext(path)
+        if not templates or CONVERT_SOURCE_MARK not in os.path.basename(stem) or stem.endswith(CONVERTED_SUFFIX):
+            continue
+        output = f"{stem}{CONVERTED_SUFFIX}{ext}"
+        converted.update((path, output))
+        steps.append(BuildStep(f'convert:{path}', _run_convert, (path, output, templates[0]),
+                               [path, templates[0]], [output], CONVERT_TOOLS))
+
+    cache_inputs = sorted(set(statements) | converted)
+    steps.append(BuildStep(f'cache:{region}', _run_cache, (region, cache_inputs),
+                           cache_inputs, [cache_file], CACHE_TOOLS))
+
+    current_year = config['summary_dir'] + os.sep
+    for path in statements:
+        if path.startswith(current_year) and path not in converted:
+            steps.append(BuildStep(f'fill:{path}', _run_fill, (region, path),
+                                   [path, cache_file], [path], FILL_TOOLS))
+    return steps
+
+
+def _print_step(step, reason, ok, log, verbose=False):
+    print(f"  {'✓' if ok else '✗'} {step.name}  ({reason})")
+    if verbose or not ok:
+        lines = log.rstrip().splitlines()
+        shown = lines if verbose else lines[-20:]
+        for line in shown:
+            print(f"      {line}")
+
+
+def build(regions, jobs=1, force=False, rounds=3, manifest_path=BUILD_MANIFEST, verbose=False):
+    """
+    运行增量构建
+
+    Args:
+        regions: 区域列表
+        jobs: 并行进程数
+        force: 忽略清单全部重新运行（只影响第一轮）
+        rounds: 最多运行的轮数
+        manifest_path: 构建清单路径
+        verbose: 打印每个步骤的完整输出
+
+    Returns:
+        是否全部成功
+    """
+    steps = [step for region in regions for step in region_steps(region)]
+    manifest = BuildManifest(manifest_path)
+
+    print("=" * 60)
+    print(f"增量构建: {', '.join(regions)}（{len(steps)} 个步骤, {jobs} 个进程）")
+    print("=" * 60)
+
+    total_ran = 0
+    for round_no in range(1, rounds + 1):
+        print(f"\n第 {round_no} 轮:")
+        with stage('build_round'):
+            result = run_build(steps, manifest, jobs, force and round_no == 1,
+                               lambda *a: _print_step(*a, verbose=verbose))
+        total_ran += len(result['ran'])
+        for name in result['skipped']:
+            print(f"  - {name}  (依赖的步骤失败，未运行)")
+        if result['failed'] or not result['ran']:
+            break
+        print(f"  本轮运行 {len(result['ran'])} 个步骤")
+    else:
+        print(f"\n已达到最大轮数 {rounds}，可能仍有过期的步骤（再次运行 build 继续）")
+
+    count('steps', total_ran)
+    count('failed', len(result['failed']))
+
+    print("\n" + "=" * 60)
+    if result['failed']:
+        print(f"构建失败: {', '.join(result['failed'])}")
+    elif total_ran:
+        print(f"构建完成! 共运行 {total_ran} 个步骤")
+    else:
+        print("所有产出都是最新的")
+    print(f"构建清单: {manifest.path}")
+    print("=" * 60)
+    return not result['failed']
+
+
+def dry_run(regions, manifest_path=BUILD_MANIFEST):
+    """列出会运行的步骤（过期的步骤，以及依赖过期步骤、运行后可能过期的步骤）"""
+    steps = [step for region in regions for step in region_steps(region)]
+    manifest = BuildManifest(manifest_path)
+    deps = step_dependencies(steps)
+    affected = set()
+    for step in steps:
+        reason = manifest.stale_reason(step)
+        if reason is None and any(d in affected for d in deps[step.name]):
+            reason = '依赖的步骤将重新运行'
+        if reason is None:
+            print(f"  = {step.name}")
+        else:
+            affected.add(step.name)
+            print(f"  * {step.name}  ({reason})")
+    print(f"\n{len(affected)}/{len(steps)} 个步骤需要运行")
+
+
+def adopt(regions, manifest_path=BUILD_MANIFEST):
+    """把现有文件记为已构建（不运行任何步骤）"""
+    manifest = BuildManifest(manifest_path)
+    steps = [step for region in regions for step in region_steps(region)]
+    for step in steps:
+        manifest.record(step, manifest.hash_files(step.inputs))
+    manifest.save()
+    print(f"已记录 {len(steps)} 个步骤的当前状态: {manifest.path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='增量构建距离缓存和对账单（只重新运行输入有变化的步骤）')
+    parser.add_argument('--region', '-r', choices=list(REGION_CONFIG), action='append',
+                        help='区域（可重复指定，默认全部区域）')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='并行运行的进程数（默认1；0 表示使用全部CPU核心）')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='最多运行的轮数（默认3）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略构建清单，全部重新运行')
+    parser.add_argument('--dry-run', '-n', action='store_true',
+                        help='只列出需要运行的步骤')
+    parser.add_argument('--adopt', action='store_true',
+                        help='把现有文件记为已构建，不运行任何步骤')
+    parser.add_argument('--manifest', default=BUILD_MANIFEST,
+                        help=f'构建清单路径（默认 {BUILD_MANIFEST}）')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='打印每个步骤的完整输出')
+    add_metrics_arguments(parser)
+
+    args = parser.parse_args()
+    regions = args.region or list(REGION_CONFIG)
+
+    if args.dry_run:
+        dry_run(regions, args.manifest)
+        return
+    if args.adopt:
+        adopt(regions, args.manifest)
+        return
+
+    METRICS.reset('build')
+    ok = build(regions, args.jobs or os.cpu_count() or 1, args.force, args.rounds, args.manifest, args.verbose)
+    dump_metrics(args)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+距离库维护
+- import/export: SQLite距离库与JSON缓存之间的导入导出（合肥和江西共用一个数据库文件，按区域分区）
+- compact: 把 journal 后端的变更日志合并回JSON快照
+
+用法:
+    python -m scripts.core.distance_db import --region hefei
+    python -m scripts.core.distance_db import --region all --db data/cache/distances.sqlite3
+    python -m scripts.core.distance_db export --region jiangxi --json 导出.json
+    python -m scripts.core.distance_db compact --region all
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.utils.common import REGION_CONFIG, get_region_config
+from scripts.utils.distance_store import DEFAULT_DB_FILE, JournalDistanceStore, SqliteDistanceStore
+
+
+def import_region(region, db_file, json_file=None):
+    """把区域JSON缓存导入SQLite（覆盖该区域现有数据）"""
+    if json_file is None:
+        json_file = os.path.join(get_region_config(region)['cache_dir'], 'reusable_distances.json')
+
+    store = SqliteDistanceStore(db_file, region)
+    segments, large_diffs = store.import_json(json_file)
+    store.close()
+
+    print(f"{region}: 从 {json_file} 导入 {segments} 个路段, {large_diffs} 条大差异记录 -> {db_file}")
+    return segments
+
+
+def export_region(region, db_file, json_file=None):
+    """把SQLite中的区域数据导出为JSON缓存"""
+    if json_file is None:
+        json_file = os.path.join(get_region_config(region)['cache_dir'], 'reusable_distances.json')
+
+    store = SqliteDistanceStore(db_file, region)
+    segments, large_diffs = store.export_json(json_file)
+    store.close()
+
+    print(f"{region}: 从 {db_file} 导出 {segments} 个路段, {large_diffs} 条大差异记录 -> {json_file}")
+    return segments
+
+
+def compact_region(region, db_file=None, json_file=None):
+    """把区域变更日志合并回JSON快照"""
+    if json_file is None:
+        json_file = os.path.join(get_region_config(region)['cache_dir'], 'reusable_distances.json')
+
+    store = JournalDistanceStore(json_file)
+    entries = store.compact()
+
+    print(f"{region}: 合并 {entries} 条日志到 {json_file}")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='距离库维护: SQLite导入导出、变更日志压缩')
+    parser.add_argument('action', choices=['import', 'export', 'compact'],
+                        help='import: JSON -> SQLite; export: SQLite -> JSON; compact: 日志 -> JSON快照')
+    parser.add_argument('--region', '-r', required=True, choices=list(REGION_CONFIG) + ['all'],
+                        help='区域: hefei / jiangxi / all')
+    parser.add_argument('--db', default=DEFAULT_DB_FILE,
+                        help=f'SQLite数据库路径（默认 {DEFAULT_DB_FILE}）')
+    parser.add_argument('--json', '-j',
+                        help='JSON缓存文件路径（可选，默认区域缓存目录；--region all 时忽略）')
+
+    args = parser.parse_args()
+
+    regions = list(REGION_CONFIG) if args.region == 'all' else [args.region]
+    json_file = args.json if args.region != 'all' else None
+    action = {'import': import_region, 'export': export_region, 'compact': compact_region}[args.action]
+    for region in regions:
+        action(region, args.db, json_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,6 @@
 """
 
 import argparse
-import json
 import os
 import sys
 from collections import defaultdict
@@ -19,12 +18,15 @@ from collections import defaultdict
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from scripts.utils.common import (
-    get_region_config, extract_routes_from_excel, build_segments,
-    load_distance_cache, save_distance_cache, CONFLICT_THRESHOLD
+    get_region_config, extract_routes_from_excel, CONFLICT_THRESHOLD
 )
+from scripts.utils.distance_store import (
+    BACKEND_JSON, BACKENDS, open_distance_store, large_difference_records
+)
+from scripts.utils.metrics import METRICS, add_metrics_arguments, count, dump_metrics, stage
 
 
-def extract_and_update_cache(region, input_file, source_name=None):
+def extract_and_update_cache(region, input_file, source_name=None, backend=BACKEND_JSON, store_path=None):
     """
     从Excel提取距离并更新缓存
 
@@ -32,11 +34,12 @@ def extract_and_update_cache(region, input_file, source_name=None):
         region: 区域 ('hefei' 或 'jiangxi')
         input_file: 输入Excel文件路径
         source_name: 数据来源名称（用于记录）
+        backend: 存储后端 ('json'、'journal' 或 'sqlite')
+        store_path: 缓存文件/数据库路径（可选，默认按区域配置）
     """
     config = get_region_config(region)
     start_point = config['start_point']
-    cache_file = os.path.join(config['cache_dir'], 'reusable_distances.json')
-    large_diff_file = os.path.join(config['cache_dir'], 'large_distance_differences.json')
+    store = open_distance_store(region, backend, store_path)
 
     if source_name is None:
         source_name = os.path.basename(input_file)
@@ -46,24 +49,26 @@ def extract_and_update_cache(region, input_file, source_name=None):
     print("=" * 80)
 
     # 读取现有缓存
-    print(f"\n读取现有缓存: {cache_file}")
-    existing_distances = load_distance_cache(cache_file)
+    print(f"\n读取现有缓存: {store.location}")
+    with stage('load_cache'):
+        existing_distances = store.load()
     print(f"  现有缓存包含 {len(existing_distances)} 个路段")
 
     # 提取新数据
     print(f"\n处理Excel文件: {input_file}")
-    routes = extract_routes_from_excel(input_file, start_point)
+    with stage('read_routes'):
+        routes = extract_routes_from_excel(input_file, start_point)
     print(f"  提取到 {len(routes)} 条路线")
 
-    # 构建新数据的距离字典（每个路段取平均值）
+    # 构建新数据的距离字典（每个路段取平均值），路段以缓存的店名ID对为键；
+    # 路线批次中的店名ID按店名映射一次，不逐个路段查找字符串
+    registry = existing_distances.registry
     new_distance_map = defaultdict(list)
-    for route in routes:
-        segments = build_segments(route, start_point)
-        for seg in segments:
-            key = (seg[0], seg[1])
-            distance = seg[2]
-            if distance is not None:
-                new_distance_map[key].append(distance)
+    with stage('build_segments'):
+        segments = routes.known_segment_ids(start_point)
+        id_map = [registry.intern(name) for name in routes.registry.names]
+        for from_id, to_id, distance in segments:
+            new_distance_map[(id_map[from_id], id_map[to_id])].append(distance)
 
     # 计算平均距离
     new_avg_distances = {}
@@ -73,74 +78,36 @@ def extract_and_update_cache(region, input_file, source_name=None):
 
     print(f"  新数据包含 {len(new_avg_distances)} 个路段")
 
-    # 合并数据
-    conflicts = []
-    large_differences = []
-    new_additions = 0
-    updates = 0
-
-    for key, new_distance in new_avg_distances.items():
-        segment_key = f"{key[0]} -> {key[1]}"
-
-        if segment_key in existing_distances:
-            old_distance = existing_distances[segment_key]
-            diff = abs(new_distance - old_distance)
-
-            if diff <= CONFLICT_THRESHOLD:
-                if diff > 0.1:
-                    conflicts.append({
-                        'segment': segment_key,
-                        'old_distance': old_distance,
-                        'new_distance': new_distance,
-                        'difference': diff
-                    })
-                existing_distances[segment_key] = new_distance
-                updates += 1
-            else:
-                large_differences.append({
-                    'segment': segment_key,
-                    'old_distance': old_distance,
-                    'new_distance': new_distance,
-                    'difference': diff,
-                    'used_distance': old_distance
-                })
-        else:
-            existing_distances[segment_key] = new_distance
-            new_additions += 1
-
-    # 保存更新后的缓存
-    save_distance_cache(cache_file, existing_distances)
-
-    print(f"\n✓ 缓存已更新: {cache_file}")
+    # 按冲突阈值合并并保存
+    with stage('merge_and_save'):
+        merged = store.merge(existing_distances, new_avg_distances, CONFLICT_THRESHOLD)
+    conflicts = merged['conflicts']
+    large_differences = merged['large_differences']
+    new_additions = merged['new']
+    updates = merged['updated']
+
+    print(f"\n✓ 缓存已更新: {store.location}")
     print(f"  总路段数: {len(existing_distances)}")
     print(f"  新增路段: {new_additions}")
     print(f"  更新路段: {updates}")
 
     # 保存大差异数据
     if large_differences:
-        existing_large_diffs = []
-        try:
-            with open(large_diff_file, 'r', encoding='utf-8') as f:
-                existing_large_diffs = json.load(f)
-        except FileNotFoundError:
-            pass
-
-        for d in large_differences:
-            existing_large_diffs.append({
-                'segment': d['segment'],
-                'old_distance_km': d['old_distance'],
-                'new_distance_km': d['new_distance'],
-                'difference_km': round(d['difference'], 2),
-                'used_distance_km': d['used_distance'],
-                'source': source_name,
-                'warning': '距离差异超过5km，已保留旧数据，请人工检查'
-            })
-
-        with open(large_diff_file, 'w', encoding='utf-8') as f:
-            json.dump(existing_large_diffs, f, ensure_ascii=False, indent=2)
-
-        print(f"\n✓ 大差异数据已保存: {large_diff_file}")
-        print(f"  包含 {len(existing_large_diffs)} 个需要检查的路段")
+        with stage('save_large_differences'):
+            total_large_diffs = store.append_large_differences(
+                large_difference_records(large_differences, source_name))
+
+        print(f"\n✓ 大差异数据已保存: {store.large_diff_location}")
+        print(f"  包含 {total_large_diffs} 个需要检查的路段")
+
+    store.close()
+
+    count('routes', len(routes))
+    count('segments', len(new_avg_distances))
+    count('new', new_additions)
+    count('updated', updates)
+    count('conflicts', len(conflicts))
+    count('large_differences', len(large_differences))
 
     # 冲突报告
     if conflicts:
@@ -189,9 +156,16 @@ def main():
                         help='输入Excel文件路径')
     parser.add_argument('--source', '-s',
                         help='数据来源名称（可选）')
+    parser.add_argument('--backend', '-b', choices=BACKENDS, default=BACKEND_JSON,
+                        help='存储后端: json（默认）、journal（追加变更日志）或 sqlite')
+    parser.add_argument('--store',
+                        help='缓存文件/数据库路径（可选，默认按区域配置）')
+    add_metrics_arguments(parser)
 
     args = parser.parse_args()
-    extract_and_update_cache(args.region, args.input, args.source)
+    METRICS.reset('extract_distances')
+    extract_and_update_cache(args.region, args.input, args.source, args.backend, args.store)
+    dump_metrics(args)
 
 
 if __name__ == '__main__':
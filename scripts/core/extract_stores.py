@@ -12,6 +12,8 @@
 import argparse
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
@@ -45,17 +47,32 @@ def parse_date_range(date_range):
     return dates
 
 
-def extract_stores(region, input_dir, dates, output_file, file_pattern="临努{date}.xlsx", store_column=4):
+def _parse_files(file_paths, store_column, jobs):
     """
-    从Excel文件中提取店名数据
+    解析各文件的店名，结果顺序与 file_paths 一致
+
+    jobs > 1 时在进程池中并行解析，子进程只回传车辆店名列表
+    """
+    if jobs <= 1 or len(file_paths) <= 1:
+        return [extract_stores_from_excel(path, store_column) for path in file_paths]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(file_paths))) as executor:
+        return list(executor.map(extract_stores_from_excel, file_paths, repeat(store_column)))
+
+
+def collect_store_data(region, input_dir, dates, file_pattern="临努{date}.xlsx", store_column=4, jobs=1):
+    """
+    从各日期的物流Excel中提取店名（不写文件）
 
     Args:
         region: 区域
         input_dir: 输入目录
         dates: 日期列表
-        output_file: 输出文件路径
         file_pattern: 文件名模式，{date}会被替换为日期
         store_column: 店名所在列
+        jobs: 并行解析的进程数（默认1，串行）；结果与串行完全一致
+
+    Returns:
+        {日期: [[车1店名], [车2店名], ...], ...}，按 dates 顺序，缺失的日期不包含在内
     """
     print("=" * 60)
     print(f"提取{region.upper()}物流店名数据")
@@ -63,6 +80,7 @@ def extract_stores(region, input_dir, dates, output_file, file_pattern="临努{d
 
     all_data = {}
 
+    found = []
     for date_str in dates:
         file_name = file_pattern.format(date=date_str)
         file_path = os.path.join(input_dir, file_name)
@@ -70,18 +88,33 @@ def extract_stores(region, input_dir, dates, output_file, file_pattern="临努{d
         if not os.path.exists(file_path):
             print(f"\n警告: 文件不存在 - {file_path}")
             continue
+        found.append((date_str, file_path))
+
+    if jobs > 1:
+        print(f"\n使用 {jobs} 个进程并行解析 {len(found)} 个文件")
+    results = _parse_files([path for _, path in found], store_column, jobs)
 
+    # 按日期顺序合并结果
+    for (date_str, file_path), vehicles in zip(found, results):
         print(f"\n处理 {date_str}: {file_path}")
-        vehicles = extract_stores_from_excel(file_path, store_column)
         all_data[date_str] = vehicles
         print(f"  提取到 {len(vehicles)} 辆车")
         for i, vehicle in enumerate(vehicles, 1):
             if vehicle:
                 print(f"    第{i}车: {len(vehicle)}个店铺, 首店: {vehicle[0][:30]}...")
 
-    # 写入输出文件
-    print(f"\n写入输出文件: {output_file}")
+    return all_data
 
+
+def write_store_txt(all_data, dates, output_file):
+    """
+    把店名数据写成 fill_stores 读取的txt格式
+
+    Args:
+        all_data: collect_store_data 的返回值
+        dates: 日期列表（写入顺序）
+        output_file: 输出文件路径
+    """
     # 确保输出目录存在
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
@@ -101,12 +134,39 @@ def extract_stores(region, input_dir, dates, output_file, file_pattern="临努{d
                     f.write(f"{store}\n")
                 f.write("\n")  # 车辆之间用空行分隔
 
+
+def store_data_totals(all_data):
+    """(日期数, 总车次, 总店铺数)"""
     total_vehicles = sum(len(v) for v in all_data.values())
     total_stores = sum(sum(len(stores) for stores in v) for v in all_data.values())
+    return len(all_data), total_vehicles, total_stores
+
+
+def extract_stores(region, input_dir, dates, output_file, file_pattern="临努{date}.xlsx", store_column=4,
+                   jobs=1):
+    """
+    从Excel文件中提取店名数据
+
+    Args:
+        region: 区域
+        input_dir: 输入目录
+        dates: 日期列表
+        output_file: 输出文件路径
+        file_pattern: 文件名模式，{date}会被替换为日期
+        store_column: 店名所在列
+        jobs: 并行解析的进程数（默认1，串行）；输出与串行完全一致
+    """
+    all_data = collect_store_data(region, input_dir, dates, file_pattern, store_column, jobs)
+
+    # 写入输出文件
+    print(f"\n写入输出文件: {output_file}")
+    write_store_txt(all_data, dates, output_file)
+
+    total_dates, total_vehicles, total_stores = store_data_totals(all_data)
 
     print("=" * 60)
     print("提取完成!")
-    print(f"  处理日期: {len(all_data)} 天")
+    print(f"  处理日期: {total_dates} 天")
     print(f"  总车次: {total_vehicles}")
     print(f"  总店铺: {total_stores}")
     print(f"输出文件: {output_file}")
@@ -129,6 +189,8 @@ def main():
                         help='文件名模式，默认 "临努{date}.xlsx"')
     parser.add_argument('--column', '-c', type=int, default=4,
                         help='店名所在列，默认4')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='并行解析的进程数（默认1；0 表示使用全部CPU核心）')
 
     args = parser.parse_args()
 
@@ -142,7 +204,8 @@ def main():
         parser.error("--dates 参数是必需的")
 
     dates = parse_date_range(args.dates)
-    extract_stores(args.region, input_dir, dates, output_file, args.pattern, args.column)
+    jobs = args.jobs or os.cpu_count() or 1
+    extract_stores(args.region, input_dir, dates, output_file, args.pattern, args.column, jobs)
 
 
 if __name__ == '__main__':
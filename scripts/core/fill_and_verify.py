@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+填充距离并验证对账单（月末流程）
+对账单只加载一次：填充距离、保存、再用内存中的同一份工作簿做验证，不重新读取文件
+
+用法:
+    python -m scripts.core.fill_and_verify --region hefei --input 对账单.xlsx
+    python -m scripts.core.fill_and_verify --region jiangxi --input 对账单.xlsx --output 新对账单.xlsx --verify filled,summary,complete
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.core.fill_distances import fill_distances_to_excel
+from scripts.utils.distance_store import BACKEND_JSON, BACKENDS
+from scripts.utils.metrics import METRICS, add_metrics_arguments, dump_metrics, stage
+from scripts.utils.workbook_session import WRITER_OPENPYXL, WRITERS, open_session
+from scripts.verification.verify_billing import VERIFY_MODES, run_verification
+
+DEFAULT_VERIFY_MODES = ('filled', 'complete')
+
+
+def fill_and_verify(region, input_excel, output_excel=None, cache_file=None, estimate=False,
+                    backend=BACKEND_JSON, verify_modes=DEFAULT_VERIFY_MODES, preview_rows=10,
+                    writer=WRITER_OPENPYXL):
+    """
+    填充距离后立即验证
+
+    Args:
+        region: 区域 ('hefei' 或 'jiangxi')
+        input_excel: 输入Excel文件路径
+        output_excel: 输出Excel文件路径（可选，默认覆盖原文件）
+        cache_file: 距离缓存文件/数据库路径（可选）
+        estimate: 是否对缓存中没有的路段做图估算
+        backend: 距离存储后端
+        verify_modes: 依次运行的验证模式
+        preview_rows: filled 模式的预览车次数
+        writer: 写回方式 ('openpyxl' 或 'patch')
+
+    Returns:
+        fill_distances_to_excel 的统计结果
+    """
+    if output_excel is None:
+        output_excel = input_excel
+
+    with stage('load_workbook'):
+        session = open_session(input_excel, writer)
+
+    stats = fill_distances_to_excel(region, input_excel, output_excel, cache_file,
+                                    estimate=estimate, backend=backend, session=session)
+
+    for mode in verify_modes:
+        print()
+        run_verification(session, mode, preview_rows)
+
+    session.close()
+
+    total_stops = stats['total_stops']
+    print("\n" + "=" * 60)
+    print("月末流程完成!")
+    print(f"  输出文件: {output_excel}")
+    print(f"  总路线数: {stats['total_routes']}")
+    print(f"  总站点数: {total_stops}")
+    if total_stops > 0:
+        print(f"  找到距离: {stats['found']} ({stats['found']/total_stops*100:.1f}%)")
+        if stats['estimated']:
+            print(f"  估算距离: {stats['estimated']} ({stats['estimated']/total_stops*100:.1f}%)")
+        print(f"  未找到距离: {stats['not_found']} ({stats['not_found']/total_stops*100:.1f}%)")
+    print(f"  验证模式: {', '.join(verify_modes) or '无'}")
+    print("=" * 60)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='填充距离并验证对账单（只加载一次工作簿）')
+    parser.add_argument('--region', '-r', required=True, choices=['hefei', 'jiangxi'],
+                        help='区域: hefei 或 jiangxi')
+    parser.add_argument('--input', '-i', required=True,
+                        help='输入Excel文件路径')
+    parser.add_argument('--output', '-o',
+                        help='输出Excel文件路径（可选，默认覆盖原文件）')
+    parser.add_argument('--cache', '-c',
+                        help='距离缓存文件/数据库路径（可选）')
+    parser.add_argument('--backend', '-b', choices=BACKENDS, default=BACKEND_JSON,
+                        help='距离存储后端: json（默认）、journal 或 sqlite')
+    parser.add_argument('--estimate', action='store_true',
+                        help='对缓存中没有的路段按反向路段/已知路径估算')
+    parser.add_argument('--verify', '-v', default=','.join(DEFAULT_VERIFY_MODES),
+                        help=f'验证模式，逗号分隔（默认 {",".join(DEFAULT_VERIFY_MODES)}；'
+                             f'可选 {"/".join(VERIFY_MODES)}）')
+    parser.add_argument('--rows', type=int, default=10,
+                        help='filled 模式预览行数（默认10）')
+    parser.add_argument('--writer', '-w', choices=WRITERS, default=WRITER_OPENPYXL,
+                        help='写回方式: openpyxl（默认，整本保存）或 patch（只改写填充的单元格）')
+    add_metrics_arguments(parser)
+
+    args = parser.parse_args()
+
+    verify_modes = [m.strip() for m in args.verify.split(',') if m.strip()]
+    for mode in verify_modes:
+        if mode not in VERIFY_MODES:
+            parser.error(f"未知验证模式: {mode}，可选 {'/'.join(VERIFY_MODES)}")
+
+    METRICS.reset('fill_and_verify')
+    fill_and_verify(args.region, args.input, args.output, args.cache, args.estimate, args.backend,
+                    verify_modes, args.rows, args.writer)
+    dump_metrics(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,160 +8,460 @@
 用法:
     python -m scripts.core.fill_distances --region hefei --input 对账单.xlsx
     python -m scripts.core.fill_distances --region jiangxi --input 对账单.xlsx --output 新对账单.xlsx
+    python -m scripts.core.fill_distances --region hefei --input data/hefei/summary/2026/02
+    python -m scripts.core.fill_distances --region hefei --input 对账单.xlsx --writer patch
 """
 
 import argparse
+import fnmatch
 import os
 import re
 import sys
+from collections import defaultdict
 
 import pandas as pd
-from openpyxl import load_workbook
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from scripts.utils.common import (
-    get_region_config, load_distance_cache, process_route, format_distance
+    get_region_config, split_route_stops, split_filled_stops, route_segment_pairs,
+    build_route_results, format_distance, ESTIMATE_MARK
 )
+from scripts.utils.distance_graph import DistanceGraph
+from scripts.utils.distance_store import BACKEND_JSON, BACKENDS, open_distance_store
+from scripts.utils.fill_state import FillState, stops_fingerprint
+from scripts.utils.metrics import METRICS, add_metrics_arguments, count, count_tiers, dump_metrics, stage, timed
+from scripts.utils.store_suggest import StoreNameIndex
+from scripts.utils.workbook_session import WRITER_OPENPYXL, WRITERS, open_session
 
 
-def fill_distances_to_excel(region, input_excel, output_excel=None, cache_file=None):
-    """
-    将距离数据填充到对账单Excel
-
-    Args:
-        region: 区域 ('hefei' 或 'jiangxi')
-        input_excel: 输入Excel文件路径
-        output_excel: 输出Excel文件路径（可选，默认覆盖原文件）
-        cache_file: 距离缓存文件路径（可选，默认使用区域配置）
-    """
-    config = get_region_config(region)
-    start_point = config['start_point']
-
-    if cache_file is None:
-        cache_file = os.path.join(config['cache_dir'], 'reusable_distances.json')
-
-    if output_excel is None:
-        output_excel = input_excel
+def _new_stats():
+    return {
+        'total_routes': 0,
+        'total_stops': 0,
+        'found': 0,
+        'not_found': 0,
+        'estimated': 0,
+        'tiers': defaultdict(int),
+        'not_found_details': []
+    }
 
-    print("=" * 60)
-    print(f"{region.upper()}仓对账单距离填充")
-    print("=" * 60)
 
-    # 读取距离数据
-    print(f"\n读取距离数据: {cache_file}")
-    distances = load_distance_cache(cache_file)
-    print(f"共加载 {len(distances)} 条距离记录")
+def collect_pending_routes(ws, fill_state=None, cache_version=None):
+    """
+    收集需要填充距离的行
 
-    # 读取Excel数据
-    print(f"\n读取Excel数据: {input_excel}")
-    df = pd.read_excel(input_excel, header=None)
-    print(f"Excel尺寸: {df.shape}")
+    未填充的行全部处理；已填充的行只在还有 "?km"、估算距离 "约XXkm"（或未填写）的站点、
+    并且站点列表有变化或距离缓存在上次填充后有更新时重新处理，已有精确距离的站点保留原样。
 
-    # 使用openpyxl处理以保留格式
-    wb = load_workbook(input_excel)
-    ws = wb.active
+    Args:
+        ws: openpyxl 工作表，或补丁模式的 PatchedSheet
+        fill_state: 该对账单的 FillState（可选；不传时已填充行中的 "?km" 每次都重新查询）
+        cache_version: 当前距离缓存版本（与 fill_state 一起使用）
 
-    # 统计信息
-    total_routes = 0
-    total_stops = 0
-    found_count = 0
-    not_found_count = 0
-    not_found_details = []
+    Returns:
+        [(行号, [站点...], {保留原文的站点序号: 原文}, {原有估算距离的站点序号: 原文}), ...]
+    """
+    pending = []
 
     # 处理每一行（从第2行开始，跳过标题行）
-    print("\n开始处理路线...")
-    print("-" * 60)
-
     for row_idx in range(2, ws.max_row + 1):
         # 读取店名列（C列，索引3）
-        store_cell = ws.cell(row=row_idx, column=3)
-        route_text = store_cell.value
+        route_text = ws.cell(row=row_idx, column=3).value
 
         if pd.isna(route_text) or not str(route_text).strip():
             continue
 
+        lines = split_route_stops(route_text)
+        if not lines:
+            continue
+
         # 检查是否已经包含距离信息（格式：店名-XXkm）
-        first_line = str(route_text).split('\n')[0].strip()
-        if re.search(r'-\d+(\.\d+)?km', first_line) or re.search(r'-\?km', first_line):
+        first_line = lines[0]
+        if re.search(rf'-{ESTIMATE_MARK}?\d+(\.\d+)?km', first_line) or re.search(r'-\?km', first_line):
+            stops, kept, estimated = split_filled_stops(lines)
+        else:
+            stops, kept, estimated = lines, None, {}
+
+        fingerprint = stops_fingerprint(stops)
+        if fill_state is not None:
+            previous_version = fill_state.cache_version(fingerprint)
+            fill_state.record(fingerprint, cache_version)
+        else:
+            previous_version = None
+
+        if kept is None:
+            pending.append((row_idx, stops, {}, {}))
+        elif len(kept) == len(stops):
             print(f"\n第{row_idx}行: 已包含距离信息，跳过")
-            continue
+        elif previous_version is not None and previous_version == cache_version:
+            print(f"\n第{row_idx}行: 未找到的路段在上次填充后缓存没有更新，跳过")
+        else:
+            pending.append((row_idx, stops, kept, estimated))
 
-        total_routes += 1
-        results = process_route(route_text, distances, start_point)
+    return pending
 
-        if not results:
-            continue
+
+def collect_segment_pairs(pending, start_point):
+    """汇总待填充行中的所有路段（含重复）"""
+    for _, stops, _, _ in pending:
+        yield from route_segment_pairs(stops, start_point)
+
+
+@timed()
+def estimate_missing_segments(graph, resolved):
+    """
+    对缓存中没有的路段做图估算
+
+    Args:
+        graph: DistanceGraph
+        resolved: resolve_segments 的返回值
+
+    Returns:
+        {(起点, 终点): 估算结果}，只包含能估算的路段
+    """
+    estimates = {}
+    for pair, (dist, _, _) in resolved.items():
+        if dist is None:
+            estimate = graph.estimate(*pair)
+            if estimate is not None:
+                estimates[pair] = estimate
+    return estimates
+
+
+def apply_resolved_routes(ws, pending, resolved, start_point, stats, estimates=None):
+    """
+    将批量解析的距离写回C列
+
+    Args:
+        ws: openpyxl 工作表，或补丁模式的 PatchedSheet
+        pending: collect_pending_routes 的返回值
+        resolved: resolve_segments 的返回值
+        start_point: 起点名称
+        stats: 统计信息（原地累加）
+        estimates: estimate_missing_segments 的返回值（可选，估算模式）
+    """
+    estimates = estimates or {}
+    for row_idx, stops, kept, previous_estimates in pending:
+        stats['total_routes'] += 1
+        results = build_route_results(stops, start_point, resolved)
 
         # 构建带距离的店名字符串
         formatted_stops = []
 
-        print(f"\n第{row_idx}行 (第{total_routes}车):")
-        for r in results:
-            total_stops += 1
-            if r['found']:
-                found_count += 1
-                dist_str = format_distance(r['distance'])
-                formatted_stops.append(f"{r['stop']}-{dist_str}")
-                print(f"  {r['stop']}-{dist_str} [找到]")
+        print(f"\n第{row_idx}行 (第{stats['total_routes']}车):")
+        for i, r in enumerate(results):
+            if i in kept:
+                # 重新填充的行中已有距离的站点保持原样
+                formatted_stops.append(kept[i])
+                print(f"  {kept[i]} [已有]")
+                continue
+            stats['total_stops'] += 1
+            stats['tiers'][r.tier] += 1
+            if r.found:
+                stats['found'] += 1
+                dist_str = format_distance(r.distance)
+                formatted_stops.append(f"{r.stop}-{dist_str}")
+                print(f"  {r.stop}-{dist_str} [找到]")
+            elif (r.from_store, r.to_store) in estimates:
+                stats['estimated'] += 1
+                estimate = estimates[(r.from_store, r.to_store)]
+                dist_str = format_distance(estimate['distance'], estimated=True)
+                formatted_stops.append(f"{r.stop}-{dist_str}")
+                print(f"  {r.stop}-{dist_str} [估算: {' + '.join(estimate['path'])}]")
+            elif i in previous_estimates:
+                # 缓存中仍没有该路段且本次未估算：保留原有的估算距离
+                stats['estimated'] += 1
+                formatted_stops.append(previous_estimates[i])
+                print(f"  {previous_estimates[i]} [已有估算]")
             else:
-                not_found_count += 1
-                formatted_stops.append(f"{r['stop']}-?km")
-                not_found_details.append({
+                stats['not_found'] += 1
+                formatted_stops.append(f"{r.stop}-?km")
+                stats['not_found_details'].append({
                     'row': row_idx,
-                    'from': r['from'],
-                    'to': r['to']
+                    'from': r.from_store,
+                    'to': r.to_store
                 })
-                print(f"  {r['stop']}-?km [未找到]")
+                print(f"  {r.stop}-?km [未找到]")
 
         # 将格式化后的店名（带距离）写回C列
         new_route_text = '\n'.join(formatted_stops)
         ws.cell(row=row_idx, column=3, value=new_route_text)
 
-    # 保存结果
+
+def _print_summary(stats):
+    total_stops = stats['total_stops']
+    tier_counts = stats['tiers']
     print("\n" + "=" * 60)
     print("处理完成!")
-    print(f"  总路线数: {total_routes}")
+    print(f"  总路线数: {stats['total_routes']}")
     print(f"  总站点数: {total_stops}")
     if total_stops > 0:
-        print(f"  找到距离: {found_count} ({found_count/total_stops*100:.1f}%)")
-        print(f"  未找到距离: {not_found_count} ({not_found_count/total_stops*100:.1f}%)")
+        print(f"  找到距离: {stats['found']} ({stats['found']/total_stops*100:.1f}%)")
+        if stats['estimated']:
+            print(f"  估算距离: {stats['estimated']} ({stats['estimated']/total_stops*100:.1f}%)")
+        print(f"  未找到距离: {stats['not_found']} ({stats['not_found']/total_stops*100:.1f}%)")
+        print(f"  匹配层级: 精确 {tier_counts['exact']}, 标准化 {tier_counts['normalized']}, "
+              f"激进 {tier_counts['aggressive']}")
+
 
-    # 保存文件
-    print(f"\n保存结果到: {output_excel}")
-    wb.save(output_excel)
-    print("保存成功!")
+@timed()
+def attach_suggestions(not_found_details, index, k=3):
+    """
+    为未找到距离的路段中缓存里不存在的店名附加相近的已知店名
 
-    # 输出未找到的距离详情
+    Args:
+        not_found_details: 未找到的路段列表（原地添加 'suggestions' 字段）
+        index: DistanceIndex 或 SnapshotIndex
+        k: 每个店名的建议条数
+    """
+    if not not_found_details:
+        return
+
+    name_index = StoreNameIndex(index.store_names())
+    suggested = {}
+    for item in not_found_details:
+        item['suggestions'] = {}
+        for name in (item['from'], item['to']):
+            if name in name_index:
+                continue
+            if name not in suggested:
+                suggested[name] = name_index.suggest(name, k)
+            item['suggestions'][name] = suggested[name]
+
+
+def _print_not_found(not_found_details):
     if not_found_details:
         print("\n未找到的距离段:")
         for item in not_found_details[:20]:
             print(f"  行{item['row']}: {item['from']} -> {item['to']}")
+            for name, suggestions in item.get('suggestions', {}).items():
+                if suggestions:
+                    hint = ', '.join(f"{s}(差{d}字)" for s, d in suggestions)
+                    print(f"      {name} 不在缓存中, 相近店名: {hint}")
+                else:
+                    print(f"      {name} 不在缓存中, 无相近店名")
         if len(not_found_details) > 20:
             print(f"  ... 还有 {len(not_found_details) - 20} 条未显示")
 
+
+def _record_metrics(stats):
+    count_tiers(stats['tiers'])
+    count('routes', stats['total_routes'])
+    count('stops', stats['total_stops'])
+    count('estimated', stats['estimated'])
+
+
+def _stats_result(stats):
     return {
-        'total_routes': total_routes,
-        'total_stops': total_stops,
-        'found': found_count,
-        'not_found': not_found_count
+        'total_routes': stats['total_routes'],
+        'total_stops': stats['total_stops'],
+        'found': stats['found'],
+        'not_found': stats['not_found'],
+        'estimated': stats['estimated'],
+        'tiers': dict(stats['tiers'])
     }
 
 
+def _load_index(region, backend, cache_file, estimate=False):
+    """
+    加载距离索引
+
+    Returns:
+        (索引, 缓存版本)；估算模式的版本带 "+estimate" 后缀，切换到估算模式时会重新处理 "?km"
+    """
+    store = open_distance_store(region, backend, cache_file)
+    print(f"\n读取距离数据: {store.location}")
+    with stage('load_cache'):
+        index = store.load_index()
+        cache_version = store.version()
+    store.close()
+    print(f"共加载 {len(index)} 条距离记录")
+    if estimate:
+        cache_version += '+estimate'
+    return index, cache_version
+
+
+def fill_distances_to_excel(region, input_excel, output_excel=None, cache_file=None, estimate=False,
+                            backend=BACKEND_JSON, session=None, writer=WRITER_OPENPYXL, loaded_index=None):
+    """
+    将距离数据填充到对账单Excel
+
+    先收集整本工作簿的全部路段并去重批量解析，再把结果写回各行。
+    已填充的行按填充状态索引（FillState）判断是否需要重新查询其中的 "?km" 路段。
+
+    Args:
+        region: 区域 ('hefei' 或 'jiangxi')
+        input_excel: 输入Excel文件路径
+        output_excel: 输出Excel文件路径（可选，默认覆盖原文件）
+        cache_file: 距离缓存文件/数据库路径（可选，默认使用区域配置）
+        estimate: 是否对缓存中没有的路段做图估算（写为 "店名-约XXkm"）
+        backend: 距离存储后端 ('json'、'journal' 或 'sqlite')
+        session: 已加载的 WorkbookSession/PatchSession（可选，传入时不再重新读取 input_excel，
+                 填充结果留在会话中供后续验证使用）
+        writer: 写回方式 ('openpyxl' 整本保存，或 'patch' 只改写填充的单元格)；传入 session 时忽略
+        loaded_index: 已加载的 (距离索引, 缓存版本)（可选，常驻进程传入时不再重新读取缓存）
+    """
+    config = get_region_config(region)
+    start_point = config['start_point']
+
+    if output_excel is None:
+        output_excel = input_excel
+
+    print("=" * 60)
+    print(f"{region.upper()}仓对账单距离填充")
+    print("=" * 60)
+
+    # 读取距离数据
+    if loaded_index is None:
+        loaded_index = _load_index(region, backend, cache_file, estimate)
+    index, cache_version = loaded_index
+
+    # 读取Excel数据（openpyxl完整模式以保留格式，或补丁模式只读A-C列；整个流程只加载一次）
+    print(f"\n读取Excel数据: {input_excel}")
+    owns_session = session is None
+    if owns_session:
+        with stage('load_workbook'):
+            session = open_session(input_excel, writer)
+    print(f"Excel尺寸: {session.shape}")
+    ws = session.ws
+
+    print("\n开始处理路线...")
+    print("-" * 60)
+
+    fill_state = FillState(input_excel)
+    with stage('collect_routes'):
+        pending = collect_pending_routes(ws, fill_state, cache_version)
+    with stage('resolve_segments'):
+        resolved = index.resolve_segments(collect_segment_pairs(pending, start_point))
+    print(f"\n共 {len(pending)} 条路线, {len(resolved)} 个不重复路段")
+    estimates = estimate_missing_segments(DistanceGraph(index), resolved) if estimate else None
+
+    stats = _new_stats()
+    with stage('apply_routes'):
+        apply_resolved_routes(ws, pending, resolved, start_point, stats, estimates)
+
+    # 保存结果
+    _print_summary(stats)
+
+    # 保存文件（没有需要填充的行且原地更新时不重写对账单，文件内容保持不变）
+    if not pending and owns_session and os.path.abspath(output_excel) == os.path.abspath(input_excel):
+        print("\n没有需要填充的行，对账单未修改")
+    else:
+        print(f"\n保存结果到: {output_excel}")
+        with stage('save_workbook'):
+            session.save(output_excel)
+        print("保存成功!")
+    fill_state.save(output_excel)
+
+    # 输出未找到的距离详情及相近店名建议
+    attach_suggestions(stats['not_found_details'], index)
+    _print_not_found(stats['not_found_details'])
+    _record_metrics(stats)
+
+    return _stats_result(stats)
+
+
+def fill_distances_in_directory(region, input_dir, output_dir=None, cache_file=None, pattern='*.xlsx',
+                                estimate=False, backend=BACKEND_JSON, writer=WRITER_OPENPYXL):
+    """
+    批量填充目录下所有对账单的距离
+
+    所有工作簿的路段先汇总去重，只解析一次，再分别写回并保存。
+
+    Args:
+        region: 区域 ('hefei' 或 'jiangxi')
+        input_dir: 对账单目录
+        output_dir: 输出目录（可选，默认覆盖原文件）
+        cache_file: 距离缓存文件/数据库路径（可选，默认使用区域配置）
+        pattern: 文件名匹配模式
+        estimate: 是否对缓存中没有的路段做图估算
+        backend: 距离存储后端 ('json'、'journal' 或 'sqlite')
+        writer: 写回方式 ('openpyxl' 或 'patch')
+    """
+    config = get_region_config(region)
+    start_point = config['start_point']
+
+    if output_dir is None:
+        output_dir = input_dir
+
+    print("=" * 60)
+    print(f"{region.upper()}仓对账单距离批量填充: {input_dir}")
+    print("=" * 60)
+
+    index, cache_version = _load_index(region, backend, cache_file, estimate)
+
+    # 加载所有工作簿并收集待填充行（跳过Excel临时文件）
+    file_names = sorted(f for f in fnmatch.filter(os.listdir(input_dir), pattern)
+                        if not f.startswith('~$'))
+    workbooks = []
+    for file_name in file_names:
+        print(f"\n读取Excel数据: {file_name}")
+        with stage('load_workbook'):
+            session = open_session(os.path.join(input_dir, file_name), writer)
+        fill_state = FillState(os.path.join(input_dir, file_name))
+        with stage('collect_routes'):
+            pending = collect_pending_routes(session.ws, fill_state, cache_version)
+        workbooks.append((file_name, session, pending, fill_state))
+
+    pairs = (pair for _, _, pending, _ in workbooks
+             for pair in collect_segment_pairs(pending, start_point))
+    with stage('resolve_segments'):
+        resolved = index.resolve_segments(pairs)
+    print(f"\n共 {len(workbooks)} 个文件, {len(resolved)} 个不重复路段")
+    estimates = estimate_missing_segments(DistanceGraph(index), resolved) if estimate else None
+
+    stats = _new_stats()
+    os.makedirs(output_dir, exist_ok=True)
+    for file_name, session, pending, fill_state in workbooks:
+        output_excel = os.path.join(output_dir, file_name)
+        if not pending:
+            fill_state.save(output_excel)
+            continue
+        print(f"\n{'-' * 60}\n{file_name}")
+        with stage('apply_routes'):
+            apply_resolved_routes(session.ws, pending, resolved, start_point, stats, estimates)
+        with stage('save_workbook'):
+            session.save(output_excel)
+        fill_state.save(output_excel)
+        print(f"\n保存结果到: {output_excel}")
+
+    _print_summary(stats)
+    attach_suggestions(stats['not_found_details'], index)
+    _print_not_found(stats['not_found_details'])
+    _record_metrics(stats)
+
+    return _stats_result(stats)
+
+
 def main():
     parser = argparse.ArgumentParser(description='从距离缓存填充距离到对账单Excel')
     parser.add_argument('--region', '-r', required=True, choices=['hefei', 'jiangxi'],
                         help='区域: hefei 或 jiangxi')
     parser.add_argument('--input', '-i', required=True,
-                        help='输入Excel文件路径')
+                        help='输入Excel文件路径，或对账单目录（目录下所有工作簿统一批量填充）')
     parser.add_argument('--output', '-o',
-                        help='输出Excel文件路径（可选，默认覆盖原文件）')
+                        help='输出Excel文件路径或输出目录（可选，默认覆盖原文件）')
     parser.add_argument('--cache', '-c',
-                        help='距离缓存文件路径（可选）')
+                        help='距离缓存文件/数据库路径（可选）')
+    parser.add_argument('--backend', '-b', choices=BACKENDS, default=BACKEND_JSON,
+                        help='距离存储后端: json（默认）、journal 或 sqlite')
+    parser.add_argument('--estimate', action='store_true',
+                        help='对缓存中没有的路段按反向路段/已知路径估算，写为"店名-约XXkm"')
+    parser.add_argument('--writer', '-w', choices=WRITERS, default=WRITER_OPENPYXL,
+                        help='写回方式: openpyxl（默认，整本保存）或 patch（只改写填充的单元格，其余内容原样保留）')
+    add_metrics_arguments(parser)
 
     args = parser.parse_args()
-
-    fill_distances_to_excel(args.region, args.input, args.output, args.cache)
+    METRICS.reset('fill_distances')
+
+    if os.path.isdir(args.input):
+        fill_distances_in_directory(args.region, args.input, args.output, args.cache,
+                                    estimate=args.estimate, backend=args.backend, writer=args.writer)
+    else:
+        fill_distances_to_excel(args.region, args.input, args.output, args.cache,
+                                estimate=args.estimate, backend=args.backend, writer=args.writer)
+    dump_metrics(args)
 
 
 if __name__ == '__main__':
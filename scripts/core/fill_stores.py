@@ -18,38 +18,25 @@ import openpyxl
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from scripts.utils.common import parse_txt_data, date_str_to_excel_serial, get_region_config
+from scripts.utils.metrics import METRICS, add_metrics_arguments, count, dump_metrics, stage
 
 
-def fill_stores_to_excel(input_txt, input_excel, output_excel=None, year=2026):
+def _sorted_dates(store_data):
+    return sorted(store_data.keys(), key=lambda x: tuple(map(int, x.split('.'))))
+
+
+def fill_stores_to_worksheet(ws, store_data, year=2026):
     """
-    将txt中的店名数据填充到Excel
+    把店名数据追加到工作表第一个空白行之后（不保存）
 
     Args:
-        input_txt: 输入txt文件路径
-        input_excel: 输入Excel文件路径
-        output_excel: 输出Excel文件路径（可选，默认覆盖原文件）
+        ws: openpyxl 工作表
+        store_data: {日期: [[车1店名], [车2店名], ...], ...}
         year: 年份（默认2026）
-    """
-    if output_excel is None:
-        output_excel = input_excel
-
-    print("=" * 60)
-    print("填充店名数据到对账单")
-    print("=" * 60)
-
-    # 解析txt数据
-    print(f"\n读取txt文件: {input_txt}")
-    txt_data = parse_txt_data(input_txt)
-
-    print(f"\n解析到 {len(txt_data)} 个日期的数据:")
-    for date_str, vehicles in sorted(txt_data.items(), key=lambda x: tuple(map(int, x[0].split('.')))):
-        print(f"  {date_str}: {len(vehicles)} 辆车")
-
-    # 加载Excel
-    print(f"\n加载Excel文件: {input_excel}")
-    wb = openpyxl.load_workbook(input_excel)
-    ws = wb.active
 
+    Returns:
+        填充的行数，未找到空白行时返回None
+    """
     # 找到第一个空白行
     first_empty_row = None
     for i in range(2, 1000):
@@ -59,7 +46,7 @@ def fill_stores_to_excel(input_txt, input_excel, output_excel=None, year=2026):
 
     if first_empty_row is None:
         print("未找到空白行!")
-        return
+        return None
 
     print(f"从第 {first_empty_row} 行开始填充数据")
 
@@ -73,10 +60,10 @@ def fill_stores_to_excel(input_txt, input_excel, output_excel=None, year=2026):
     current_row = first_empty_row
 
     # 按日期排序
-    sorted_dates = sorted(txt_data.keys(), key=lambda x: tuple(map(int, x.split('.'))))
+    sorted_dates = _sorted_dates(store_data)
 
     for date_str in sorted_dates:
-        vehicles = txt_data[date_str]
+        vehicles = store_data[date_str]
         excel_date = date_str_to_excel_serial(date_str, year)
 
         print(f"\n填充日期: {date_str} (Excel序列号: {excel_date})")
@@ -99,10 +86,52 @@ def fill_stores_to_excel(input_txt, input_excel, output_excel=None, year=2026):
 
             current_row += 1
 
+    total_rows = current_row - first_empty_row
+    count('dates', len(sorted_dates))
+    count('rows', total_rows)
+    return total_rows
+
+
+def fill_stores_to_excel(input_txt, input_excel, output_excel=None, year=2026):
+    """
+    将txt中的店名数据填充到Excel
+
+    Args:
+        input_txt: 输入txt文件路径
+        input_excel: 输入Excel文件路径
+        output_excel: 输出Excel文件路径（可选，默认覆盖原文件）
+        year: 年份（默认2026）
+    """
+    if output_excel is None:
+        output_excel = input_excel
+
+    print("=" * 60)
+    print("填充店名数据到对账单")
+    print("=" * 60)
+
+    # 解析txt数据
+    print(f"\n读取txt文件: {input_txt}")
+    with stage('parse_txt'):
+        txt_data = parse_txt_data(input_txt)
+
+    print(f"\n解析到 {len(txt_data)} 个日期的数据:")
+    for date_str in _sorted_dates(txt_data):
+        print(f"  {date_str}: {len(txt_data[date_str])} 辆车")
+
+    # 加载Excel
+    print(f"\n加载Excel文件: {input_excel}")
+    with stage('load_workbook'):
+        wb = openpyxl.load_workbook(input_excel)
+    ws = wb.active
+
+    total_rows = fill_stores_to_worksheet(ws, txt_data, year)
+    if total_rows is None:
+        return
+
     # 保存文件
-    wb.save(output_excel)
+    with stage('save_workbook'):
+        wb.save(output_excel)
 
-    total_rows = current_row - first_empty_row
     print("\n" + "=" * 60)
     print(f"数据填充完成! 共填充 {total_rows} 行数据")
     print(f"保存到: {output_excel}")
@@ -123,10 +152,13 @@ def main():
                         help='输出Excel文件路径（可选，默认覆盖原文件）')
     parser.add_argument('--year', '-y', type=int, default=2026,
                         help='年份（默认2026）')
+    add_metrics_arguments(parser)
 
     args = parser.parse_args()
+    METRICS.reset('fill_stores')
 
     fill_stores_to_excel(args.input, args.excel, args.output, args.year)
+    dump_metrics(args)
 
 
 if __name__ == '__main__':
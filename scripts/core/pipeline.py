@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日常流程一步完成：提取店名 → 填充店名 → 填充距离 → 验证
+整个流程在一个进程中进行：店名数据不经过txt中转，对账单只加载一次、只保存一次，
+验证直接读取内存中的工作簿，最后输出一份合并报告
+
+用法:
+    python -m scripts.core.pipeline --region hefei --dates 1.9-1.12 --excel 对账单.xlsx
+    python -m scripts.core.pipeline --region jiangxi --dates 1.13,1.15 --excel 对账单.xlsx --output 新对账单.xlsx --stores-txt stores.txt
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.core.extract_stores import collect_store_data, parse_date_range, store_data_totals, write_store_txt
+from scripts.core.fill_and_verify import DEFAULT_VERIFY_MODES
+from scripts.core.fill_distances import fill_distances_to_excel
+from scripts.core.fill_stores import fill_stores_to_worksheet
+from scripts.utils.common import get_region_config
+from scripts.utils.distance_store import BACKEND_JSON, BACKENDS
+from scripts.utils.metrics import METRICS, add_metrics_arguments, dump_metrics, stage
+from scripts.utils.workbook_session import WorkbookSession
+from scripts.verification.verify_billing import VERIFY_MODES, run_verification
+
+
+def _run_verification_counted(session, mode, preview_rows):
+    """运行一种验证，返回该验证新增的计数器（如 issues、segments.missing）"""
+    before = dict(METRICS.counters)
+    run_verification(session, mode, preview_rows)
+    return {name: value - before.get(name, 0) for name, value in METRICS.counters.items()
+            if value != before.get(name, 0)}
+
+
+def run_pipeline(region, excel_file, dates, input_dir=None, output_excel=None,
+                 file_pattern="临努{date}.xlsx", store_column=4, jobs=1, year=2026,
+                 cache_file=None, backend=BACKEND_JSON, estimate=False,
+                 verify_modes=DEFAULT_VERIFY_MODES, preview_rows=10, stores_txt=None):
+    """
+    运行完整的日常流程
+
+    Args:
+        region: 区域 ('hefei' 或 'jiangxi')
+        excel_file: 对账单Excel文件路径
+        dates: 日期列表
+        input_dir: 物流明细目录（可选，默认区域配置的 details_dir）
+        output_excel: 输出Excel文件路径（可选，默认覆盖原文件）
+        file_pattern: 明细文件名模式，{date}会被替换为日期
+        store_column: 明细中店名所在列
+        jobs: 并行解析明细的进程数
+        year: 日期所属年份
+        cache_file: 距离缓存文件/数据库路径（可选）
+        backend: 距离存储后端
+        estimate: 是否对缓存中没有的路段做图估算
+        verify_modes: 依次运行的验证模式
+        preview_rows: filled 模式的预览车次数
+        stores_txt: 店名中间结果txt路径（可选，仅用于调试/留档）
+
+    Returns:
+        合并报告字典，未找到空白行时返回None
+    """
+    config = get_region_config(region)
+    input_dir = input_dir or config['details_dir']
+    if output_excel is None:
+        output_excel = excel_file
+
+    # 1. 提取店名（内存中）
+    with stage('extract_stores'):
+        store_data = collect_store_data(region, input_dir, dates, file_pattern, store_column, jobs)
+    if stores_txt:
+        write_store_txt(store_data, dates, stores_txt)
+        print(f"\n店名数据已写入: {stores_txt}")
+
+    # 2. 填充店名到内存中的对账单
+    print("\n" + "=" * 60)
+    print("填充店名数据到对账单")
+    print("=" * 60)
+    print(f"加载Excel文件: {excel_file}")
+    with stage('load_workbook'):
+        session = WorkbookSession(excel_file)
+    with stage('fill_stores'):
+        rows_filled = fill_stores_to_worksheet(session.ws, store_data, year)
+    if rows_filled is None:
+        session.close()
+        return None
+
+    # 3. 填充距离并保存（整个流程唯一的一次保存）
+    print()
+    distance_stats = fill_distances_to_excel(region, excel_file, output_excel, cache_file,
+                                             estimate=estimate, backend=backend, session=session)
+
+    # 4. 验证内存中的工作簿
+    verification = {}
+    for mode in verify_modes:
+        print()
+        verification[mode] = _run_verification_counted(session, mode, preview_rows)
+    session.close()
+
+    total_dates, total_vehicles, total_stores = store_data_totals(store_data)
+    report = {
+        'region': region,
+        'input': excel_file,
+        'output': output_excel,
+        'stores': {'dates': total_dates, 'vehicles': total_vehicles, 'stores': total_stores},
+        'rows_filled': rows_filled,
+        'distances': distance_stats,
+        'verification': verification
+    }
+    if stores_txt:
+        report['stores_txt'] = stores_txt
+    _print_report(report)
+    return report
+
+
+def _print_report(report):
+    stats = report['distances']
+    total_stops = stats['total_stops']
+    print("\n" + "=" * 60)
+    print("日常流程完成!")
+    print(f"  输出文件: {report['output']}")
+    print(f"  提取店名: {report['stores']['dates']} 天, {report['stores']['vehicles']} 车, "
+          f"{report['stores']['stores']} 店")
+    print(f"  填充行数: {report['rows_filled']}")
+    print(f"  总路线数: {stats['total_routes']}")
+    print(f"  总站点数: {total_stops}")
+    if total_stops > 0:
+        print(f"  找到距离: {stats['found']} ({stats['found']/total_stops*100:.1f}%)")
+        if stats['estimated']:
+            print(f"  估算距离: {stats['estimated']} ({stats['estimated']/total_stops*100:.1f}%)")
+        print(f"  未找到距离: {stats['not_found']} ({stats['not_found']/total_stops*100:.1f}%)")
+    for mode, counters in report['verification'].items():
+        summary = ', '.join(f"{name}={value}" for name, value in counters.items()) or '无计数'
+        print(f"  验证 {mode}: {summary}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日常流程：提取店名 → 填充店名 → 填充距离 → 验证（一次加载、一次保存）')
+    parser.add_argument('--region', '-r', required=True, choices=['hefei', 'jiangxi'],
+                        help='区域: hefei 或 jiangxi')
+    parser.add_argument('--dates', '-d', required=True,
+                        help='日期范围，如 "1.9-1.12" 或 "1.13,1.15,1.16"')
+    parser.add_argument('--excel', '-e', required=True,
+                        help='对账单Excel文件路径')
+    parser.add_argument('--output', '-o',
+                        help='输出Excel文件路径（可选，默认覆盖原文件）')
+    parser.add_argument('--input-dir', '-i',
+                        help='物流明细目录（可选，默认区域配置）')
+    parser.add_argument('--pattern', '-p', default='临努{date}.xlsx',
+                        help='明细文件名模式，默认 "临努{date}.xlsx"')
+    parser.add_argument('--column', type=int, default=4,
+                        help='明细中店名所在列，默认4')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='并行解析明细的进程数（默认1；0 表示使用全部CPU核心）')
+    parser.add_argument('--year', '-y', type=int, default=2026,
+                        help='年份（默认2026）')
+    parser.add_argument('--cache', '-c',
+                        help='距离缓存文件/数据库路径（可选）')
+    parser.add_argument('--backend', '-b', choices=BACKENDS, default=BACKEND_JSON,
+                        help='距离存储后端: json（默认）、journal 或 sqlite')
+    parser.add_argument('--estimate', action='store_true',
+                        help='对缓存中没有的路段按反向路段/已知路径估算')
+    parser.add_argument('--verify', '-v', default=','.join(DEFAULT_VERIFY_MODES),
+                        help=f'验证模式，逗号分隔（默认 {",".join(DEFAULT_VERIFY_MODES)}；'
+                             f'可选 {"/".join(VERIFY_MODES)}）')
+    parser.add_argument('--rows', type=int, default=10,
+                        help='filled 模式预览行数（默认10）')
+    parser.add_argument('--stores-txt',
+                        help='同时把提取的店名写入txt（可选，调试/留档用）')
+    parser.add_argument('--report',
+                        help='合并报告JSON输出路径（可选）')
+    add_metrics_arguments(parser)
+
+    args = parser.parse_args()
+
+    verify_modes = [m.strip() for m in args.verify.split(',') if m.strip()]
+    for mode in verify_modes:
+        if mode not in VERIFY_MODES:
+            parser.error(f"未知验证模式: {mode}，可选 {'/'.join(VERIFY_MODES)}")
+
+    METRICS.reset('pipeline')
+    report = run_pipeline(args.region, args.excel, parse_date_range(args.dates), args.input_dir, args.output,
+                          args.pattern, args.column, args.jobs or os.cpu_count() or 1, args.year,
+                          args.cache, args.backend, args.estimate, verify_modes, args.rows, args.stores_txt)
+    if report is not None and args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"合并报告: {args.report}")
+    dump_metrics(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量查询路线距离（流式）
+从标准输入或txt文件读取路线（与 extract_stores 输出、parse_txt_data 读取的格式相同：
+可选的日期行，每车一组店名行，车辆之间空行分隔），距离索引只加载一次，
+每读完一车立即输出该车的 "地址名称-距离km" / "地址名称-?km"，可以放在shell管道中使用。
+
+用法:
+    python -m scripts.core.query --region jiangxi --input 物流店名数据_1.10-1.13.txt
+    cat stores.txt | python -m scripts.core.query --region hefei
+    python -m scripts.core.query --region hefei --explain < stores.txt
+    python -m scripts.core.query --region hefei --format json < stores.txt | jq .missing
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.utils.common import get_region_config, iter_txt_vehicles
+from scripts.utils.distance_store import BACKEND_JSON, BACKENDS, open_distance_store
+from scripts.utils.route_query import format_query_logic, format_route_output, query_routes, route_result_dict
+
+FORMAT_TEXT = 'text'
+FORMAT_JSON = 'json'
+
+
+def stream_queries(index, start_point, lines, out, output_format=FORMAT_TEXT, explain=False):
+    """
+    逐车查询并输出
+
+    Args:
+        index: DistanceIndex 或 SnapshotIndex
+        start_point: 起点名称
+        lines: 可迭代的输入行
+        out: 输出流（每车输出后立即刷新）
+        output_format: 'text'（与输入相同的分组格式）或 'json'（每车一行JSON）
+        explain: 同时输出每一段的查询逻辑
+
+    Returns:
+        {'routes': 路线数, 'stops': 站点数, 'missing': 未找到的站点数}
+    """
+    totals = {'routes': 0, 'stops': 0, 'missing': 0}
+    last_date = None
+    for date_str, stops in iter_txt_vehicles(lines):
+        results, = query_routes(index, [stops], start_point)
+        totals['routes'] += 1
+        totals['stops'] += len(results)
+        totals['missing'] += sum(1 for r in results if not r.found)
+
+        if output_format == FORMAT_JSON:
+            record = {'date': date_str, **route_result_dict(results)}
+            if explain:
+                record['logic'] = format_query_logic(results)
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            # 日期变化时输出日期行，保持与输入相同的格式
+            if date_str is not None and date_str != last_date:
+                out.write(f"{date_str}\n\n")
+                last_date = date_str
+            if explain:
+                out.write('\n'.join(format_query_logic(results)) + '\n')
+            out.write('\n'.join(format_route_output(results)) + '\n\n')
+        out.flush()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量查询路线距离（从标准输入或txt文件流式读取）')
+    parser.add_argument('--region', '-r', required=True, choices=['hefei', 'jiangxi'],
+                        help='区域: hefei 或 jiangxi')
+    parser.add_argument('--input', '-i', default='-',
+                        help='输入txt文件路径（默认 "-" 读取标准输入）')
+    parser.add_argument('--cache', '-c',
+                        help='距离缓存文件/数据库路径（可选）')
+    parser.add_argument('--backend', '-b', choices=BACKENDS, default=BACKEND_JSON,
+                        help='距离存储后端: json（默认）、journal 或 sqlite')
+    parser.add_argument('--format', '-f', choices=[FORMAT_TEXT, FORMAT_JSON], default=FORMAT_TEXT,
+                        help='输出格式: text（默认）或 json（每车一行）')
+    parser.add_argument('--explain', '-e', action='store_true',
+                        help='同时输出每一段的查询逻辑（查询键、结果）')
+
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    store = open_distance_store(args.region, args.backend, args.cache)
+    index = store.load_index()
+    store.close()
+    start_point = get_region_config(args.region)['start_point']
+    print(f"已加载 {len(index)} 条距离记录: {store.location} "
+          f"({(time.perf_counter() - started) * 1000:.0f}ms)", file=sys.stderr)
+
+    started = time.perf_counter()
+    try:
+        if args.input == '-':
+            totals = stream_queries(index, start_point, sys.stdin, sys.stdout, args.format, args.explain)
+        else:
+            with open(args.input, 'r', encoding='utf-8') as f:
+                totals = stream_queries(index, start_point, f, sys.stdout, args.format, args.explain)
+    except BrokenPipeError:
+        # 下游（如 head）提前关闭管道：静默退出
+        sys.stdout = open(os.devnull, 'w')
+        return
+    elapsed = time.perf_counter() - started
+    print(f"共 {totals['routes']} 条路线, {totals['stops']} 个站点, 未找到 {totals['missing']} 个 "
+          f"({elapsed * 1000:.0f}ms)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
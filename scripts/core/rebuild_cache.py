@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从多份历史对账单重建距离缓存
+各对账单在进程池中并行解析，解析完成后按时间顺序（对账单中最晚的车次日期，相同时按路径）
+依次合并：差值5km内以较新的对账单为准，超过5km保留旧数据并记入大差异报告。
+合并顺序与并行度无关，相同的输入总是得到相同的缓存。
+
+一次运行同时写出 reusable_distances.json 和 large_distance_differences.json（整体替换，不追加）。
+不指定 --output 时写入区域缓存，会丢失不在这些对账单中的路段（如手工维护的条目），
+因此区域缓存已存在时需要加 --force；被替换的文件先备份为 "<文件名>.bak-<时间>"。
+
+用法:
+    python -m scripts.core.rebuild_cache --region jiangxi --output /tmp/reusable_distances.json
+    python -m scripts.core.rebuild_cache --region jiangxi data/jiangxi/summary/2025 --jobs 4 --force
+    python -m scripts.core.rebuild_cache --region hefei a.xlsx b.xlsx --order given --output /tmp/reusable_distances.json
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.utils.cache_journal import write_json_atomic
+from scripts.utils.common import CONFLICT_THRESHOLD, extract_routes_from_excel, get_region_config
+from scripts.utils.distance_store import (
+    BACKEND_JSON, large_difference_records, merge_segment_distances, open_distance_store
+)
+from scripts.utils.metrics import METRICS, add_metrics_arguments, count, dump_metrics, stage
+from scripts.utils.segment_table import SegmentTable
+
+ORDER_DATE = 'date'
+ORDER_GIVEN = 'given'
+
+# Excel日期序列号的起点
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+def collect_statements(paths):
+    """
+    展开输入路径：文件原样保留，目录递归查找其中的 .xlsx（跳过Excel临时文件）
+
+    Returns:
+        去重后的文件列表，保持输入顺序
+    """
+    statements = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = sorted(glob.glob(os.path.join(path, '**', '*.xlsx'), recursive=True))
+        else:
+            found = [path]
+        for file_path in found:
+            if not os.path.basename(file_path).startswith('~$') and file_path not in statements:
+                statements.append(file_path)
+    return statements
+
+
+def statement_date(routes):
+    """
+    对账单的日期：车次中最晚的日期（Excel序列号）；没有可识别的日期时返回None
+
+    Args:
+        routes: RouteBatch
+    """
+    serials = []
+    for value in routes.dates:
+        if isinstance(value, datetime):
+            serials.append((value - _EXCEL_EPOCH).days)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            serials.append(value)
+    return max(serials) if serials else None
+
+
+def statement_segment_averages(routes, start_point, registry):
+    """
+    对账单中各路段的平均距离（同一路段出现多次时取平均，保留2位小数）
+
+    Args:
+        routes: RouteBatch
+        start_point: 起点名称
+        registry: 路段表的店名驻留表（返回的ID属于该表）
+
+    Returns:
+        {(起点ID, 终点ID): 平均距离}
+    """
+    segment_distances = defaultdict(list)
+    segments = routes.known_segment_ids(start_point)
+    id_map = [registry.intern(name) for name in routes.registry.names]
+    for from_id, to_id, distance in segments:
+        segment_distances[(id_map[from_id], id_map[to_id])].append(distance)
+    return {key: round(sum(values) / len(values), 2) for key, values in segment_distances.items()}
+
+
+def sort_by_statement_date(parsed):
+    """
+    按对账单日期从旧到新排序（合并顺序）
+
+    没有日期的对账单排在最前（视为最旧），日期相同时按路径，结果与文件修改时间、输入顺序无关。
+
+    Args:
+        parsed: [(对账单路径, RouteBatch), ...]
+
+    Returns:
+        排序后的 [(对账单路径, RouteBatch), ...]
+    """
+    dated = [(statement_date(routes), path, routes) for path, routes in parsed]
+    dated.sort(key=lambda item: (item[0] is not None, item[0] or 0, item[1]))
+    return [(path, routes) for _, path, routes in dated]
+
+
+def _parse_statements(statements, start_point, jobs):
+    """解析各对账单的路线，结果顺序与 statements 一致"""
+    if jobs <= 1 or len(statements) <= 1:
+        return [extract_routes_from_excel(path, start_point) for path in statements]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(statements))) as executor:
+        return list(executor.map(extract_routes_from_excel, statements, repeat(start_point)))
+
+
+def merge_statements(parsed, start_point, threshold=CONFLICT_THRESHOLD):
+    """
+    按顺序把各对账单的路段合并为新的路段表
+
+    Args:
+        parsed: [(对账单路径, RouteBatch), ...]，按合并顺序（从旧到新）
+        start_point: 起点名称
+        threshold: 冲突阈值（km）
+
+    Returns:
+        (SegmentTable, 冲突列表, 大差异记录列表, {对账单: 最终采用的路段数})
+    """
+    table = SegmentTable()
+    source_of = {}
+    conflicts = []
+    large_diff_records = []
+
+    for path, routes in parsed:
+        source_name = os.path.basename(path)
+        averages = statement_segment_averages(routes, start_point, table.registry)
+        names = table.registry.names
+        old_sources = {f"{names[from_id]} -> {names[to_id]}": source_of[(from_id, to_id)]
+                       for from_id, to_id in averages if (from_id, to_id) in source_of}
+        merged = merge_segment_distances(table, averages, threshold)
+
+        for conflict in merged['conflicts']:
+            conflicts.append(dict(conflict, source=source_name, old_source=old_sources[conflict['segment']]))
+        # 大差异记录附上旧数据的来源
+        for record in large_difference_records(merged['large_differences'], source_name):
+            record['old_source'] = old_sources[record['segment']]
+            large_diff_records.append(record)
+        for from_id, to_id, _ in merged['changed']:
+            source_of[(from_id, to_id)] = source_name
+
+        print(f"  {source_name}: {len(averages)} 个路段, 新增 {merged['new']}, 更新 {merged['updated']}, "
+              f"大差异 {len(merged['large_differences'])}")
+
+    return table, conflicts, large_diff_records, Counter(source_of.values())
+
+
+def backup_files(paths):
+    """
+    把已存在的文件复制为 "<文件名>.bak-<时间>"
+
+    Returns:
+        备份文件路径列表
+    """
+    suffix = time.strftime('%Y%m%d-%H%M%S')
+    backups = []
+    for path in paths:
+        if os.path.exists(path):
+            backup = f"{path}.bak-{suffix}"
+            shutil.copy2(path, backup)
+            backups.append(backup)
+    return backups
+
+
+def carry_over_segments(table, existing):
+    """
+    把现有缓存中对账单里没有的路段（如手工维护的条目）按原顺序追加到路段表
+
+    Args:
+        table: 由对账单重建的 SegmentTable（原地追加）
+        existing: 现有缓存的 SegmentTable
+
+    Returns:
+        追加的路段数
+    """
+    added = 0
+    for row in range(len(existing)):
+        segment_key = existing.key_at(row)
+        if segment_key not in table:
+            table[segment_key] = existing.distance_at(row)
+            added += 1
+    return added
+
+
+def rebuild_cache(region, statements, output_file=None, jobs=1, order=ORDER_DATE, threshold=CONFLICT_THRESHOLD,
+                  keep_other_segments=False):
+    """
+    从对账单重建距离缓存和大差异报告
+
+    Args:
+        region: 区域 ('hefei' 或 'jiangxi')
+        statements: 对账单路径列表
+        output_file: 输出的 reusable_distances.json 路径（可选，默认区域缓存；大差异报告写在同一目录）
+        jobs: 并行解析的进程数
+        order: 合并顺序，'date'（按对账单日期从旧到新）或 'given'（按输入顺序）
+        threshold: 冲突阈值（km）
+        keep_other_segments: 保留现有缓存中这些对账单里没有的路段（此时不备份）；
+                             对账单中有的路段仍完全由对账单重新计算，结果与缓存的合并历史无关
+
+    Returns:
+        {'total': 路段数, 'conflicts': 冲突数, 'large_diff': 大差异数}
+    """
+    config = get_region_config(region)
+    start_point = config['start_point']
+    store = open_distance_store(region, BACKEND_JSON, output_file)
+
+    print("=" * 80)
+    print(f"从 {len(statements)} 份对账单重建{region.upper()}距离缓存")
+    print("=" * 80)
+
+    if jobs > 1:
+        print(f"\n使用 {jobs} 个进程并行解析")
+    with stage('read_routes'):
+        parsed = list(zip(statements, _parse_statements(statements, start_point, jobs)))
+
+    if order == ORDER_DATE:
+        parsed = sort_by_statement_date(parsed)
+
+    print("\n合并顺序（从旧到新）:")
+    with stage('merge'):
+        table, conflicts, large_diff_records, sources = merge_statements(parsed, start_point, threshold)
+
+    if keep_other_segments:
+        with stage('carry_over'):
+            carried = carry_over_segments(table, store.load())
+        print(f"\n保留现有缓存中对账单里没有的路段: {carried} 个")
+
+    with stage('save'):
+        os.makedirs(os.path.dirname(os.path.abspath(store.location)), exist_ok=True)
+        if not keep_other_segments:
+            # 整体替换前备份现有的缓存、变更日志和大差异报告
+            for backup in backup_files([store.cache_file, store.journal_file, store.large_diff_file]):
+                print(f"\n已备份: {backup}")
+        store.save(table)
+        write_json_atomic(store.large_diff_location, large_diff_records)
+    store.close()
+
+    print(f"\n✓ 缓存已重建: {store.location}")
+    print(f"  总路段数: {len(table)}")
+    print(f"✓ 大差异报告: {store.large_diff_location}")
+    print(f"  包含 {len(large_diff_records)} 个需要检查的路段")
+
+    print("\n数据来源统计（最终采用的路段数）:")
+    for path, _ in parsed:
+        print(f"  {os.path.basename(path)}: {sources.get(os.path.basename(path), 0)} 个路段")
+
+    if conflicts:
+        print("\n" + "=" * 80)
+        print(f"发现 {len(conflicts)} 个冲突路段（距离相差{threshold:g}km内，已使用较新的数据）")
+        print("=" * 80)
+        for c in conflicts[:10]:
+            print(f"\n路段: {c['segment']}")
+            print(f"  {c['old_source']}: {c['old_distance']} km")
+            print(f"  {c['source']}: {c['new_distance']} km (使用)")
+            print(f"  差值: {c['difference']:.2f} km")
+        if len(conflicts) > 10:
+            print(f"\n... 还有 {len(conflicts) - 10} 个冲突路段未显示")
+
+    if large_diff_records:
+        print("\n" + "=" * 80)
+        print(f"警告：发现 {len(large_diff_records)} 个路段距离相差超过{threshold:g}km，已保留旧数据")
+        print("=" * 80)
+        for d in large_diff_records[:10]:
+            print(f"\n路段: {d['segment']}")
+            print(f"  {d['old_source']}: {d['old_distance_km']} km (保留)")
+            print(f"  {d['source']}: {d['new_distance_km']} km")
+            print(f"  差值: {d['difference_km']:.2f} km")
+        if len(large_diff_records) > 10:
+            print(f"\n... 还有 {len(large_diff_records) - 10} 个大差异路段未显示")
+        print("\n这些路段已保留旧数据，请人工检查后决定使用哪个数据！")
+
+    count('statements', len(statements))
+    count('segments', len(table))
+    count('conflicts', len(conflicts))
+    count('large_differences', len(large_diff_records))
+
+    print("\n" + "=" * 80)
+    print("重建完成！")
+    print("=" * 80)
+
+    return {'total': len(table), 'conflicts': len(conflicts), 'large_diff': len(large_diff_records)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从多份历史对账单并行重建距离缓存和大差异报告')
+    parser.add_argument('--region', '-r', required=True, choices=['hefei', 'jiangxi'],
+                        help='区域: hefei 或 jiangxi')
+    parser.add_argument('inputs', nargs='*',
+                        help='对账单文件或目录（目录递归查找 .xlsx；默认该区域汇总目录下的全部对账单）')
+    parser.add_argument('--order', choices=[ORDER_DATE, ORDER_GIVEN], default=ORDER_DATE,
+                        help='合并顺序: date（按对账单中最晚的车次日期，默认）或 given（按输入顺序）')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='并行解析的进程数（默认1；0 表示使用全部CPU核心）')
+    parser.add_argument('--output', '-o',
+                        help='输出的 reusable_distances.json 路径（可选，默认覆盖区域缓存，需要 --force）')
+    parser.add_argument('--force', action='store_true',
+                        help='允许替换已存在的区域缓存（替换前自动备份）')
+    parser.add_argument('--threshold', type=float, default=CONFLICT_THRESHOLD,
+                        help=f'冲突阈值km（默认 {CONFLICT_THRESHOLD:g}）')
+    add_metrics_arguments(parser)
+
+    args = parser.parse_args()
+
+    inputs = args.inputs
+    if not inputs:
+        summary_root = os.path.dirname(get_region_config(args.region)['summary_dir'])
+        inputs = sorted(glob.glob(os.path.join(summary_root, '*', '')))
+    statements = collect_statements(inputs)
+    if not statements:
+        parser.error("没有找到对账单")
+
+    if args.output is None and not args.force:
+        store = open_distance_store(args.region, BACKEND_JSON)
+        store.close()
+        if os.path.exists(store.cache_file):
+            parser.error(f"将整体替换区域缓存 {store.cache_file}（不在这些对账单中的路段会丢失），"
+                         f"请用 --output 写到其他位置，或加 --force（替换前自动备份）")
+
+    METRICS.reset('rebuild_cache')
+    rebuild_cache(args.region, statements, args.output, args.jobs or os.cpu_count() or 1, args.order,
+                  args.threshold)
+    dump_metrics(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地路线距离查询服务
+启动时加载各区域的距离缓存并常驻内存，按README的查询规则（"上一站 -> 下一站"逐段查询）
+返回 "地址名称-距离km" / "地址名称-?km" 格式的结果和每一段的查询键。
+缓存文件有更新时（按 --check-interval 检查）自动重新加载，不需要重启服务。
+
+接口:
+    GET  /health                                   各区域已加载的路段数和缓存版本
+    GET  /query?region=hefei&stop=店A&stop=店B      单条路线，返回纯文本结果（&explain=1 附查询逻辑）
+    GET  /query?region=hefei&route=店A%0A店B        同上，站点用换行分隔
+    POST /query  {"region": "hefei", "routes": [["店A", "店B"], "店C\\n店D"], "explain": false}
+                                                   批量查询，返回JSON
+
+用法:
+    python -m scripts.core.route_server
+    python -m scripts.core.route_server --port 8765 --region jiangxi
+    python -m scripts.core.route_server --unix /tmp/route_query.sock
+    curl -s 'http://127.0.0.1:8765/query?region=jiangxi&stop=共橙一站式超市（南昌京东大道店）'
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.utils.common import REGION_CONFIG, get_region_config, split_route_stops
+from scripts.utils.distance_store import BACKEND_JSON, BACKENDS
+from scripts.utils.route_query import (
+    WarmDistanceIndex, format_query_logic, format_route_output, query_routes, route_result_dict
+)
+
+DEFAULT_PORT = 8765
+
+
+class QueryError(ValueError):
+    """请求参数错误（返回400）"""
+
+
+class RouteQueryService:
+    """各区域常驻的距离索引和查询入口"""
+
+    def __init__(self, regions, backend=BACKEND_JSON, check_interval=1.0):
+        """
+        Args:
+            regions: 区域列表
+            backend: 距离存储后端
+            check_interval: 检查缓存是否更新的最小间隔秒数
+        """
+        self.indexes = {region: WarmDistanceIndex(region, backend, check_interval=check_interval)
+                        for region in regions}
+
+    def warm_up(self):
+        for region, warm_index in self.indexes.items():
+            index, version = warm_index.get()
+            print(f"  {region}: {len(index)} 条距离记录 ({warm_index.location}, 版本 {version})")
+
+    def status(self):
+        status = {}
+        for region, warm_index in self.indexes.items():
+            index, version = warm_index.get()
+            status[region] = {'segments': len(index), 'version': version, 'reloads': warm_index.reloads}
+        return status
+
+    def query(self, region, routes):
+        """
+        查询路线
+
+        Args:
+            region: 区域
+            routes: [[站点...], ...]
+
+        Returns:
+            (每条路线的 StopResult 列表, 缓存版本)
+        """
+        if region not in self.indexes:
+            raise QueryError(f"未加载的区域: {region}，可选 {list(self.indexes)}")
+        if not routes or not all(routes):
+            raise QueryError("缺少站点")
+        index, version = self.indexes[region].get()
+        return query_routes(index, routes, get_region_config(region)['start_point']), version
+
+
+def _parse_route(route):
+    """请求中的路线：站点列表，或用换行分隔站点的文本"""
+    if isinstance(route, str):
+        return split_route_stops(route)
+    if isinstance(route, list) and all(isinstance(stop, str) for stop in route):
+        return [stop.strip() for stop in route if stop.strip()]
+    raise QueryError(f"无法识别的路线: {route!r}")
+
+
+class RouteQueryHandler(BaseHTTPRequestHandler):
+    server_version = 'RouteQuery/1.0'
+    protocol_version = 'HTTP/1.1'
+    # 响应头和正文分两次写出，保持连接时需关闭Nagle算法，否则每次请求会等待约40ms的延迟确认
+    disable_nagle_algorithm = True
+
+    def _send(self, status, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False), 'application/json')
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        service = self.server.service
+        try:
+            if url.path == '/health':
+                self._send_json(200, {'regions': service.status()})
+            elif url.path == '/query':
+                params = parse_qs(url.query)
+                region = params.get('region', [''])[0]
+                if 'route' in params:
+                    stops = _parse_route(params['route'][0])
+                else:
+                    stops = _parse_route(params.get('stop', []))
+                (results,), _ = service.query(region, [stops])
+                lines = format_route_output(results)
+                if params.get('explain', ['0'])[0] not in ('', '0', 'false'):
+                    lines = ['查询逻辑:'] + format_query_logic(results) + ['', '输出结果:'] + lines
+                self._send(200, '\n'.join(lines) + '\n', 'text/plain')
+            else:
+                self._send_json(404, {'error': f'未知路径: {url.path}'})
+        except QueryError as e:
+            self._send_json(400, {'error': str(e)})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/query':
+            self._send_json(404, {'error': f'未知路径: {url.path}'})
+            return
+        started = time.perf_counter()
+        try:
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                raise QueryError(f"无效的 Content-Length: {self.headers.get('Content-Length')!r}")
+            if length < 0:
+                raise QueryError(f"无效的 Content-Length: {length}")
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError as e:
+                raise QueryError(f"请求不是有效的JSON: {e}")
+            if not isinstance(request, dict):
+                raise QueryError("请求应为JSON对象")
+            routes = request.get('routes')
+            if routes is None and 'route' in request:
+                routes = [request['route']]
+            if not isinstance(routes, list):
+                raise QueryError("缺少 routes")
+            region = request.get('region')
+            if not isinstance(region, str) or not region:
+                raise QueryError("缺少 region")
+            route_results, version = self.server.service.query(region, [_parse_route(route) for route in routes])
+        except QueryError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        results = []
+        for stop_results in route_results:
+            result = route_result_dict(stop_results)
+            if request.get('explain'):
+                result['logic'] = format_query_logic(stop_results)
+            results.append(result)
+        self._send_json(200, {
+            'region': region,
+            'version': version,
+            'results': results,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+        })
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            sys.stderr.write(f"[{self.log_date_time_string()}] {format % args}\n")
+
+
+class UnixRouteQueryHandler(RouteQueryHandler):
+    # Unix套接字没有 TCP_NODELAY 选项
+    disable_nagle_algorithm = False
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """监听Unix套接字的HTTP服务"""
+
+    address_family = socket.AF_UNIX
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler 期望 client_address 为 (地址, 端口)
+        return request, ('unix', 0)
+
+
+def serve(regions, host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None, backend=BACKEND_JSON,
+          check_interval=1.0, quiet=False):
+    """
+    启动查询服务（阻塞，Ctrl+C 停止）
+
+    Args:
+        regions: 加载的区域列表
+        host / port: 监听地址（unix_socket 为空时使用）
+        unix_socket: Unix套接字路径（可选）
+        backend: 距离存储后端
+        check_interval: 检查缓存是否更新的最小间隔秒数
+        quiet: 不打印访问日志
+    """
+    service = RouteQueryService(regions, backend, check_interval)
+    print("加载距离缓存:")
+    service.warm_up()
+
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, UnixRouteQueryHandler)
+        address = unix_socket
+    else:
+        server = ThreadingHTTPServer((host, port), RouteQueryHandler)
+        address = f"http://{host}:{server.server_port}"
+    server.service = service
+    server.quiet = quiet
+
+    print(f"\n查询服务已启动: {address}（Ctrl+C 停止）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n停止服务")
+    finally:
+        server.server_close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地路线距离查询服务（缓存常驻内存，更新时自动重新加载）')
+    parser.add_argument('--region', '-r', choices=list(REGION_CONFIG), action='append',
+                        help='加载的区域（可重复指定，默认全部区域）')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='监听地址（默认 127.0.0.1）')
+    parser.add_argument('--port', '-p', type=int, default=DEFAULT_PORT,
+                        help=f'监听端口（默认 {DEFAULT_PORT}）')
+    parser.add_argument('--unix',
+                        help='改为监听Unix套接字（路径）')
+    parser.add_argument('--backend', '-b', choices=BACKENDS, default=BACKEND_JSON,
+                        help='距离存储后端: json（默认）、journal 或 sqlite')
+    parser.add_argument('--check-interval', type=float, default=1.0,
+                        help='检查缓存是否更新的最小间隔秒数（默认1）')
+    parser.add_argument('--quiet', '-q', action='store_true',
+                        help='不打印访问日志')
+
+    args = parser.parse_args()
+    serve(args.region or list(REGION_CONFIG), args.host, args.port, args.unix, args.backend,
+          args.check_interval, args.quiet)
+
+
+if __name__ == '__main__':
+    main()
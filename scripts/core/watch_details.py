@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监听物流明细目录，自动把新到的车次填入当月对账单
+常驻进程：距离缓存索引和对账单（含已有车次索引）只加载一次并常驻内存，
+每个新增或修改的明细文件在写入稳定后（防抖）只把对账单中还没有的车次追加进去，
+再填充这些行的距离并保存对账单。
+
+距离缓存有更新时自动重新加载；对账单在进程外被修改（如手工编辑）时重新读取。
+
+用法:
+    python -m scripts.core.watch_details --region hefei --excel 对账单.xlsx
+    python -m scripts.core.watch_details --region jiangxi --excel 对账单.xlsx --month 2 --scan-existing
+    python -m scripts.core.watch_details --region hefei --excel 对账单.xlsx --month 2 --once
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.core.fill_distances import fill_distances_to_excel
+from scripts.core.fill_stores import fill_stores_to_worksheet
+from scripts.utils.common import (
+    date_str_to_excel_serial, extract_stores_from_excel, get_region_config, split_filled_stops, split_route_stops
+)
+from scripts.utils.distance_store import BACKEND_JSON, BACKENDS
+from scripts.utils.metrics import METRICS, add_metrics_arguments, count, dump_metrics, stage
+from scripts.utils.route_query import WarmDistanceIndex
+from scripts.utils.workbook_session import WorkbookSession
+
+
+def date_file_regex(file_pattern):
+    """
+    把明细文件名模式转换为正则，第1组为日期
+
+    Args:
+        file_pattern: 如 "临努{date}.xlsx"
+    """
+    head, _, tail = file_pattern.partition('{date}')
+    return re.compile(rf'^{re.escape(head)}(\d{{1,2}}\.\d{{1,2}}){re.escape(tail)}$')
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _date_key(date_str):
+    return tuple(map(int, date_str.split('.')))
+
+
+class DetailWatcher:
+    """
+    轮询明细目录，返回写入已稳定的新增/修改文件
+
+    文件的大小和修改时间连续 debounce 秒不变才视为写入完成；
+    处理过的文件记录其签名，内容不变时不会再次返回。
+    """
+
+    def __init__(self, input_dir, file_pattern, month=None, debounce=5.0):
+        """
+        Args:
+            input_dir: 明细目录
+            file_pattern: 文件名模式，{date}为日期
+            month: 只处理该月份的明细（可选）
+            debounce: 防抖秒数
+        """
+        self.input_dir = input_dir
+        self.file_regex = date_file_regex(file_pattern)
+        self.month = month
+        self.debounce = debounce
+        self.processed = {}
+        self._changing = {}
+
+    def scan(self):
+        """当前目录中匹配的明细文件 {文件名: (日期, 签名)}"""
+        files = {}
+        for entry in os.scandir(self.input_dir):
+            match = self.file_regex.match(entry.name)
+            if not match or not entry.is_file():
+                continue
+            date_str = match.group(1)
+            if self.month is not None and _date_key(date_str)[0] != self.month:
+                continue
+            try:
+                files[entry.name] = (date_str, _file_signature(entry.path))
+            except FileNotFoundError:
+                continue
+        return files
+
+    def mark_existing(self):
+        """把目录中已有的文件记为已处理（只监听之后新增或修改的文件）"""
+        for name, (_, signature) in self.scan().items():
+            self.processed[name] = signature
+
+    def poll(self, now=None):
+        """
+        检查一次目录
+
+        Args:
+            now: 当前时间（可选，默认 time.monotonic()）
+
+        Returns:
+            [(日期, 文件路径, 签名), ...]，按日期排序
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        files = self.scan()
+        for name, (date_str, signature) in files.items():
+            if self.processed.get(name) == signature:
+                self._changing.pop(name, None)
+                continue
+            first_seen = self._changing.get(name)
+            if first_seen is None or first_seen[0] != signature:
+                # 新出现或仍在写入：重新计时
+                self._changing[name] = (signature, now)
+            elif now - first_seen[1] >= self.debounce:
+                ready.append((date_str, os.path.join(self.input_dir, name), signature))
+        for name in list(self._changing):
+            if name not in files:
+                del self._changing[name]
+        return sorted(ready, key=lambda item: _date_key(item[0]))
+
+    def mark_processed(self, file_path, signature):
+        self.processed[os.path.basename(file_path)] = signature
+        self._changing.pop(os.path.basename(file_path), None)
+
+
+def _fill_index(warm_index, estimate=False):
+    """
+    取常驻的距离索引，供 fill_distances_to_excel 使用
+
+    Returns:
+        (距离索引, 缓存版本)，与 fill_distances 的 _load_index 相同，估算模式的版本带 "+estimate" 后缀
+    """
+    reloads = warm_index.reloads
+    index, version = warm_index.get()
+    if warm_index.reloads != reloads:
+        print(f"\n距离缓存有更新，重新加载: 共 {len(index)} 条距离记录")
+        count('cache_reloads')
+    return index, f"{version}+estimate" if estimate else version
+
+
+class StatementState:
+    """
+    常驻内存的对账单及其已有车次索引
+
+    车次以 (日期序列号, 站点列表) 计数，同一明细文件再次到达时只追加对账单中还没有的车次。
+    新车次在对账单保存成功后才计入（add_vehicles），写入失败时下次重试仍会追加。
+    """
+
+    def __init__(self, excel_file):
+        self.excel_file = excel_file
+        self.session = None
+        self.vehicles = Counter()
+        self._signature = None
+
+    def ensure_loaded(self):
+        """首次使用或对账单在进程外被修改时（重新）加载"""
+        signature = _file_signature(self.excel_file)
+        if self.session is not None and signature == self._signature:
+            return
+        if self.session is not None:
+            print("\n对账单在外部被修改，重新加载")
+            self.session.close()
+        print(f"\n加载对账单: {self.excel_file}")
+        with stage('load_workbook'):
+            self.session = WorkbookSession(self.excel_file)
+        self.vehicles = Counter()
+        for row in self.session.ws.iter_rows(min_row=2, max_col=3, values_only=True):
+            if row[1] is None or row[2] is None or not str(row[2]).strip():
+                continue
+            stops, _, _ = split_filled_stops(split_route_stops(row[2]))
+            self.vehicles[(row[1], tuple(stops))] += 1
+        self._signature = signature
+        print(f"对账单已有 {sum(self.vehicles.values())} 车次")
+
+    def new_vehicles(self, date_str, vehicles, year, batch):
+        """
+        筛选出对账单中还没有的车次
+
+        Args:
+            date_str: 日期 "月.日"
+            vehicles: [[店名...], ...]
+            year: 年份
+            batch: 本批次已筛选出、尚未写入的车次计数（原地累加）
+
+        Returns:
+            需要追加的车次列表
+        """
+        excel_date = date_str_to_excel_serial(date_str, year)
+        present = Counter()
+        new = []
+        for stops in vehicles:
+            key = (excel_date, tuple(stops))
+            present[key] += 1
+            if present[key] > self.vehicles[key] + batch[key]:
+                new.append(stops)
+                batch[key] += 1
+        return new
+
+    def add_vehicles(self, batch):
+        """对账单保存成功后计入本批次追加的车次"""
+        self.vehicles.update(batch)
+
+    def saved(self):
+        """本进程保存对账单后更新签名，不把自己的写入当作外部修改"""
+        self._signature = _file_signature(self.excel_file)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+
+def process_ready_files(region, ready, statement, warm_index, watcher, store_column=4, year=2026,
+                        estimate=False, backend=BACKEND_JSON, cache_file=None):
+    """
+    把一批写入稳定的明细文件中的新车次填入对账单
+
+    Args:
+        region: 区域
+        ready: DetailWatcher.poll() 的返回值
+        statement: StatementState
+        warm_index: WarmDistanceIndex
+        watcher: DetailWatcher（处理成功的文件记为已处理）
+        store_column: 明细中店名所在列
+        year: 年份
+        estimate: 是否对缓存中没有的路段做图估算
+        backend: 距离存储后端
+        cache_file: 距离缓存文件/数据库路径（可选）
+
+    Returns:
+        追加的车次数
+    """
+    statement.ensure_loaded()
+
+    store_data = {}
+    parsed = []
+    batch = Counter()
+    for date_str, file_path, signature in ready:
+        print(f"\n明细文件: {file_path}")
+        try:
+            with stage('extract_stores'):
+                vehicles = extract_stores_from_excel(file_path, store_column)
+        except Exception as e:
+            # 文件可能仍在被复制或已损坏：保持未处理状态，内容再变化时重试
+            print(f"  读取失败，跳过: {e}")
+            continue
+        new = statement.new_vehicles(date_str, vehicles, year, batch)
+        print(f"  共 {len(vehicles)} 车, 新增 {len(new)} 车")
+        if new:
+            store_data.setdefault(date_str, []).extend(new)
+        parsed.append((file_path, signature))
+
+    added = sum(len(v) for v in store_data.values())
+    if added:
+        with stage('fill_stores'):
+            rows_filled = fill_stores_to_worksheet(statement.session.ws, store_data, year)
+        if rows_filled is None:
+            # 没有写入任何行：文件保持未处理状态，之后重试
+            return 0
+        print()
+        fill_distances_to_excel(region, statement.excel_file, statement.excel_file, cache_file,
+                                estimate=estimate, backend=backend, session=statement.session,
+                                loaded_index=_fill_index(warm_index, estimate))
+        statement.saved()
+        statement.add_vehicles(batch)
+        count('vehicles', added)
+
+    for file_path, signature in parsed:
+        watcher.mark_processed(file_path, signature)
+    count('files', len(parsed))
+    return added
+
+
+def _process_batch(region, ready, statement, warm_index, watcher, *args):
+    """
+    处理一批明细文件；失败时（如对账单被Excel占用无法保存、缓存损坏）不退出，
+    丢弃内存中未保存的修改并重新加载对账单，文件保持未处理状态，之后重试
+
+    Returns:
+        追加的车次数，失败时返回None
+    """
+    try:
+        return process_ready_files(region, ready, statement, warm_index, watcher, *args)
+    except Exception as e:
+        print(f"\n[{time.strftime('%H:%M:%S')}] 处理失败，稍后重试: {type(e).__name__}: {e}")
+        count('batch_errors')
+        statement.close()
+        try:
+            statement.ensure_loaded()
+        except Exception as reload_error:
+            # 仍无法读取：下一批处理前再次尝试加载
+            print(f"  重新加载对账单失败: {reload_error}")
+        return None
+
+
+def watch_details(region, excel_file, input_dir=None, file_pattern="临努{date}.xlsx", month=None,
+                  store_column=4, year=2026, cache_file=None, backend=BACKEND_JSON, estimate=False,
+                  interval=2.0, debounce=5.0, scan_existing=False, once=False):
+    """
+    监听明细目录并持续填充对账单
+
+    Args:
+        region: 区域 ('hefei' 或 'jiangxi')
+        excel_file: 当月对账单Excel文件路径（原地更新）
+        input_dir: 明细目录（可选，默认区域配置的 details_dir）
+        file_pattern: 明细文件名模式，{date}会被替换为日期
+        month: 只处理该月份的明细（可选）
+        store_column: 明细中店名所在列
+        year: 年份
+        cache_file: 距离缓存文件/数据库路径（可选）
+        backend: 距离存储后端
+        estimate: 是否对缓存中没有的路段做图估算
+        interval: 轮询间隔秒数
+        debounce: 文件稳定多少秒后处理
+        scan_existing: 启动时也处理目录中已有的文件（对账单中已有的车次不会重复追加）
+        once: 处理目录中已有的文件后退出（不防抖、不常驻）
+    """
+    config = get_region_config(region)
+    input_dir = input_dir or config['details_dir']
+
+    print("=" * 60)
+    print(f"{region.upper()}仓明细目录监听: {input_dir}")
+    print(f"对账单: {excel_file}")
+    print("=" * 60)
+
+    watcher = DetailWatcher(input_dir, file_pattern, month, 0 if once else debounce)
+    statement = StatementState(excel_file)
+    warm_index = WarmDistanceIndex(region, backend, cache_file)
+
+    # 启动时预热：加载距离索引和对账单
+    index, _ = warm_index.get()
+    print(f"\n读取距离数据: {warm_index.location}")
+    print(f"共加载 {len(index)} 条距离记录")
+    statement.ensure_loaded()
+    if not (scan_existing or once):
+        watcher.mark_existing()
+
+    args = (store_column, year, estimate, backend, cache_file)
+    try:
+        if once:
+            watcher.poll()
+            process_ready_files(region, watcher.poll(), statement, warm_index, watcher, *args)
+            return
+        print(f"\n开始监听（每 {interval}s 检查一次，文件稳定 {debounce}s 后处理，Ctrl+C 停止）")
+        while True:
+            ready = watcher.poll()
+            if ready:
+                with stage('process_batch'):
+                    added = _process_batch(region, ready, statement, warm_index, watcher, *args)
+                if added is not None:
+                    print(f"\n[{time.strftime('%H:%M:%S')}] 处理 {len(ready)} 个文件, 追加 {added} 车次, 继续监听...")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n停止监听")
+    finally:
+        statement.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='监听物流明细目录，把新车次自动填入对账单（常驻进程）')
+    parser.add_argument('--region', '-r', required=True, choices=['hefei', 'jiangxi'],
+                        help='区域: hefei 或 jiangxi')
+    parser.add_argument('--excel', '-e', required=True,
+                        help='当月对账单Excel文件路径（原地更新）')
+    parser.add_argument('--input-dir', '-i',
+                        help='物流明细目录（可选，默认区域配置）')
+    parser.add_argument('--pattern', '-p', default='临努{date}.xlsx',
+                        help='明细文件名模式，默认 "临努{date}.xlsx"')
+    parser.add_argument('--month', '-m', type=int,
+                        help='只处理该月份的明细（可选，建议指定以免把其他月份填入对账单）')
+    parser.add_argument('--column', type=int, default=4,
+                        help='明细中店名所在列，默认4')
+    parser.add_argument('--year', '-y', type=int, default=2026,
+                        help='年份（默认2026）')
+    parser.add_argument('--cache', '-c',
+                        help='距离缓存文件/数据库路径（可选）')
+    parser.add_argument('--backend', '-b', choices=BACKENDS, default=BACKEND_JSON,
+                        help='距离存储后端: json（默认）、journal 或 sqlite')
+    parser.add_argument('--estimate', action='store_true',
+                        help='对缓存中没有的路段按反向路段/已知路径估算')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='轮询间隔秒数（默认2）')
+    parser.add_argument('--debounce', type=float, default=5.0,
+                        help='文件大小和修改时间稳定多少秒后处理（默认5）')
+    parser.add_argument('--scan-existing', action='store_true',
+                        help='启动时也处理目录中已有的明细（已有车次不会重复追加）')
+    parser.add_argument('--once', action='store_true',
+                        help='处理目录中已有的明细后退出')
+    add_metrics_arguments(parser)
+
+    args = parser.parse_args()
+    METRICS.reset('watch_details')
+
+    watch_details(args.region, args.excel, args.input_dir, args.pattern, args.month, args.column, args.year,
+                  args.cache, args.backend, args.estimate, args.interval, args.debounce,
+                  args.scan_existing, args.once)
+    dump_metrics(args)
+
+
+if __name__ == '__main__':
+    main()
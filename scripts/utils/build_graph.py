@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+基于内容哈希的增量构建
+构建清单记录每个步骤上次运行时全部输入的内容哈希、工具版本（实现该步骤的脚本的内容哈希）
+以及产出文件的内容哈希。步骤只在以下情况重新运行：没有记录、工具版本变化、任一输入内容变化、
+输入列表变化，或产出文件缺失/在构建之外被修改。
+
+步骤按声明顺序确定依赖：输入是前面某个步骤产出的，要等该步骤完成后才判断是否过期；
+互不依赖的步骤并行运行。
+"""
+
+import hashlib
+import io
+import json
+import os
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+
+from .parse_cache import file_digest
+
+BUILD_MANIFEST = os.path.join('data', 'cache', 'build_manifest.json')
+BUILD_MANIFEST_VERSION = 1
+
+
+class BuildStep(namedtuple('BuildStep', ['name', 'action', 'args', 'inputs', 'outputs', 'tools'])):
+    """
+    构建步骤
+
+    name: 步骤名（清单中的键）
+    action: 模块级函数（可在子进程中调用），调用方式 action(*args, changed_inputs)
+    inputs / outputs: 输入、产出文件路径列表（产出可以同时是输入，即原地更新）
+    tools: 实现该步骤的脚本路径（包括其依赖的全部模块），其内容哈希作为工具版本
+    """
+
+    __slots__ = ()
+
+
+class BuildManifest:
+    """构建清单（data/cache/build_manifest.json）"""
+
+    def __init__(self, path=BUILD_MANIFEST):
+        self.path = path
+        self.steps = {}
+        self._digests = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == BUILD_MANIFEST_VERSION:
+                self.steps = data['steps']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    def digest(self, path):
+        """文件内容哈希（按大小和修改时间记忆），文件不存在时返回None"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        if key not in self._digests:
+            self._digests[key] = file_digest(path)
+        return self._digests[key]
+
+    def tool_version(self, tools):
+        """工具版本：各脚本内容哈希的组合哈希（脚本缺失时视为内容为空）"""
+        h = hashlib.blake2b(digest_size=8)
+        for path in tools:
+            h.update(f"{os.path.basename(path)}:{self.digest(path)}\n".encode('utf-8'))
+        return h.hexdigest()
+
+    def hash_files(self, paths):
+        return {path: self.digest(path) for path in paths}
+
+    def stale_reason(self, step):
+        """
+        判断步骤是否需要重新运行
+
+        Returns:
+            过期原因，未过期时返回None
+        """
+        record = self.steps.get(step.name)
+        if record is None:
+            return '没有构建记录'
+        if record['tool'] != self.tool_version(step.tools):
+            return '工具版本变化'
+        if set(record['inputs']) != set(step.inputs):
+            return '输入列表变化'
+        for path in step.inputs:
+            if self.digest(path) != record['inputs'][path]:
+                return f'输入变化: {path}'
+        for path in step.outputs:
+            digest = self.digest(path)
+            if digest is None:
+                return f'产出缺失: {path}'
+            if digest != record['outputs'].get(path):
+                return f'产出在构建之外被修改: {path}'
+        return None
+
+    def changed_inputs(self, step, input_digests):
+        """
+        与上次记录相比内容有变化的输入（没有记录或工具版本变化时为全部输入）
+
+        Args:
+            step: BuildStep
+            input_digests: 本次运行前的输入哈希
+        """
+        record = self.steps.get(step.name)
+        if record is None or record['tool'] != self.tool_version(step.tools):
+            return list(step.inputs)
+        return [path for path in step.inputs if record['inputs'].get(path) != input_digests[path]]
+
+    def record(self, step, input_digests):
+        """
+        记录步骤已完成：运行前的输入哈希和运行后的产出哈希
+
+        原地更新的文件（既是输入又是产出）记录运行后的哈希，步骤自己的修改不会使其过期
+        """
+        outputs = self.hash_files(step.outputs)
+        self.steps[step.name] = {
+            'tool': self.tool_version(step.tools),
+            'inputs': {path: outputs.get(path, digest) for path, digest in input_digests.items()},
+            'outputs': outputs,
+            'built_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': BUILD_MANIFEST_VERSION, 'steps': self.steps}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def _run_step(step, changed_inputs):
+    """运行一个步骤，捕获其输出；返回 (是否成功, 输出文本)"""
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            step.action(*step.args, changed_inputs)
+        return True, log.getvalue()
+    except Exception:
+        return False, log.getvalue() + traceback.format_exc()
+
+
+def step_dependencies(steps):
+    """{步骤名: [前面产出其输入的步骤名]}"""
+    deps = {}
+    for i, step in enumerate(steps):
+        inputs = set(step.inputs)
+        deps[step.name] = [earlier.name for earlier in steps[:i] if inputs.intersection(earlier.outputs)]
+    return deps
+
+
+def run_build(steps, manifest, jobs=1, force=False, on_finish=None):
+    """
+    运行一轮构建：按依赖顺序运行过期的步骤，互不依赖的步骤并行
+
+    每个步骤完成后立即写入清单，中途失败时已完成的步骤不会重复运行。
+
+    Args:
+        steps: BuildStep 列表（按声明顺序）
+        manifest: BuildManifest
+        jobs: 并行进程数（1 表示在当前进程中依次运行）
+        force: 忽略清单，全部重新运行
+        on_finish: 回调 on_finish(step, reason, ok, log)（可选）
+
+    Returns:
+        {'ran': [步骤名], 'failed': [步骤名], 'skipped': [因依赖失败未运行的步骤名], 'fresh': [未过期的步骤名]}
+    """
+    deps = step_dependencies(steps)
+    result = {'ran': [], 'failed': [], 'skipped': [], 'fresh': []}
+    finished = set()
+    waiting = list(steps)
+    running = {}
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+
+    def finish(step, reason, input_digests, ok, log):
+        if ok:
+            manifest.record(step, input_digests)
+            manifest.save()
+            result['ran'].append(step.name)
+        else:
+            result['failed'].append(step.name)
+        finished.add(step.name)
+        if on_finish:
+            on_finish(step, reason, ok, log)
+
+    try:
+        while waiting or running:
+            for step in list(waiting):
+                step_deps = deps[step.name]
+                if any(d in result['failed'] or d in result['skipped'] for d in step_deps):
+                    waiting.remove(step)
+                    result['skipped'].append(step.name)
+                    finished.add(step.name)
+                    continue
+                if not all(d in finished for d in step_deps):
+                    continue
+                waiting.remove(step)
+                reason = '强制重建' if force else manifest.stale_reason(step)
+                if reason is None:
+                    result['fresh'].append(step.name)
+                    finished.add(step.name)
+                    continue
+                input_digests = manifest.hash_files(step.inputs)
+                changed = manifest.changed_inputs(step, input_digests)
+                if executor is None:
+                    finish(step, reason, input_digests, *_run_step(step, changed))
+                else:
+                    running[executor.submit(_run_step, step, changed)] = (step, reason, input_digests)
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step, reason, input_digests = running.pop(future)
+                    finish(step, reason, input_digests, *future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return result
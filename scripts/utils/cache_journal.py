@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+距离缓存变更日志
+每次路段写入和每条大差异记录都作为一行JSON追加到日志文件，
+加载时在快照（reusable_distances.json / large_distance_differences.json）之上重放，
+压缩时把日志合并回快照并清空日志
+"""
+
+import json
+import os
+
+OP_UPSERT = 'upsert'
+OP_LARGE_DIFF = 'large_diff'
+
+
+def journal_path_for(cache_file):
+    """返回缓存文件对应的日志路径，如 reusable_distances.journal.jsonl"""
+    base, _ = os.path.splitext(cache_file)
+    return f"{base}.journal.jsonl"
+
+
+def upsert_entry(from_store, to_store, distance):
+    return {'op': OP_UPSERT, 'from': from_store, 'to': to_store, 'distance': distance}
+
+
+def large_diff_entry(record):
+    return {'op': OP_LARGE_DIFF, 'record': record}
+
+
+def append_journal(journal_file, entries):
+    """
+    追加日志
+
+    一次调用只做一次写入并 fsync，写入成本只与本次变更量有关
+
+    Args:
+        journal_file: 日志路径
+        entries: upsert_entry / large_diff_entry 生成的记录
+    """
+    lines = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in entries)
+    if not lines:
+        return
+    with open(journal_file, 'a', encoding='utf-8') as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_journal(journal_file):
+    """
+    逐条读取日志
+
+    进程在写入中途退出时最后一行可能不完整，这样的行会被忽略
+
+    Yields:
+        日志记录字典
+    """
+    try:
+        f = open(journal_file, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+
+def replay_journal(journal_file, table=None, large_diffs=None):
+    """
+    在快照上重放日志
+
+    Args:
+        journal_file: 日志路径
+        table: SegmentTable，重放路段写入（可选）
+        large_diffs: 大差异记录列表，重放追加（可选）
+
+    Returns:
+        重放的日志条数
+    """
+    count = 0
+    for entry in read_journal(journal_file):
+        count += 1
+        op = entry.get('op')
+        if op == OP_UPSERT and table is not None:
+            table[f"{entry['from']} -> {entry['to']}"] = entry['distance']
+        elif op == OP_LARGE_DIFF and large_diffs is not None:
+            large_diffs.append(entry['record'])
+    return count
+
+
+def write_json_atomic(path, data):
+    """先写临时文件再替换，避免压缩中途退出留下半个快照"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+距离缓存二进制快照
+把 DistanceIndex 的全部内容（驻留字符串表、路段ID列、距离列、标准化索引）
+写成一个带版本号的二进制文件，与 reusable_distances.json 放在一起。
+加载时直接 mmap，查询在映射内存上二分查找，不为每条记录创建Python对象；
+JSON 或变更日志的大小/修改时间变化后自动重建。
+
+文件布局（小端，各段按8字节对齐）:
+    头部 | 店名表 | 标准化名表 | 激进标准化名表 | from列 to列 | 距离列 | 整数标记列 |
+    店名->标准化名ID | 店名->激进名ID | 精确索引 | 标准化索引 | 激进索引
+字符串表按 UTF-8 字节序排序（与 str 比较顺序一致），ID即排序后的位置；
+索引为排序后的打包键 u64 数组加对应的行号 i32 数组。
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from .cache_journal import journal_path_for
+from .common import load_distance_cache
+from .distance_index import (
+    DistanceIndex, TIER_AGGRESSIVE, TIER_EXACT, TIER_MISS, TIER_NORMALIZED,
+    _to_full_brackets, _to_half_brackets
+)
+from .normalize import normalize_store_name
+from .segment_table import SEGMENT_SEPARATOR, pack_pair
+
+SNAPSHOT_MAGIC = b'LGDS'
+SNAPSHOT_VERSION = 1
+
+# magic, version, json大小, json修改时间, 日志大小, 日志修改时间,
+# 店名数, 路段数, 标准化名数, 激进名数, 标准化索引条数, 激进索引条数
+_HEADER = struct.Struct('<4sIqqqqIIIIII')
+
+
+def snapshot_path_for(cache_file):
+    """返回缓存文件对应的快照路径，如 reusable_distances.snapshot.bin"""
+    base, _ = os.path.splitext(cache_file)
+    return f"{base}.snapshot.bin"
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 0, 0
+    return st.st_size, st.st_mtime_ns
+
+
+def source_fingerprint(cache_file):
+    """快照依赖的源文件指纹：(json大小, json修改时间, 日志大小, 日志修改时间)"""
+    return _file_stamp(cache_file) + _file_stamp(journal_path_for(cache_file))
+
+
+def _pad(buf):
+    buf.extend(b'\0' * (-len(buf) % 8))
+
+
+def _write_strings(buf, names):
+    offsets = array('I', [0])
+    blob = bytearray()
+    for name in names:
+        blob.extend(name.encode('utf-8'))
+        offsets.append(len(blob))
+    buf.extend(offsets.tobytes())
+    buf.extend(blob)
+    _pad(buf)
+
+
+def _write_index(buf, mapping):
+    items = sorted(mapping.items())
+    buf.extend(array('Q', [k for k, _ in items]).tobytes())
+    buf.extend(array('i', [row for _, row in items]).tobytes())
+    _pad(buf)
+
+
+def write_snapshot(index, snapshot_file, fingerprint):
+    """
+    把 DistanceIndex 写成二进制快照（先写临时文件再替换）
+
+    Args:
+        index: DistanceIndex
+        snapshot_file: 快照路径
+        fingerprint: source_fingerprint 的返回值
+    """
+    table = index.table
+    names = index.registry.names
+    if names:
+        index._store_keys(len(names) - 1)
+
+    # 三张字符串表按字节序重排，旧ID -> 新ID
+    store_order = sorted(range(len(names)), key=names.__getitem__)
+    store_rank = array('i', [0]) * len(names)
+    for rank, old in enumerate(store_order):
+        store_rank[old] = rank
+
+    def ranked(registry):
+        order = sorted(range(len(registry.names)), key=registry.names.__getitem__)
+        rank = array('i', [0]) * len(order)
+        for r, old in enumerate(order):
+            rank[old] = r
+        return [registry.names[i] for i in order], rank
+
+    norm_names, norm_rank = ranked(index._norm_names)
+    agg_names, agg_rank = ranked(index._agg_names)
+
+    def remap_pair(packed, rank):
+        return pack_pair(rank[packed >> 32], rank[packed & 0xFFFFFFFF])
+
+    exact = {pack_pair(store_rank[table.from_ids[row]], store_rank[table.to_ids[row]]): row
+             for row in range(len(table))}
+    normalized = {remap_pair(k, norm_rank): row for k, row in index._normalized.items()}
+    aggressive = {remap_pair(k, agg_rank): row for k, row in index._aggressive.items()}
+
+    store_norm = array('i', [-1]) * len(names)
+    store_agg = array('i', [-1]) * len(names)
+    for old in range(len(names)):
+        norm_id = index._store_norm[old]
+        agg_id = index._store_agg[old]
+        store_norm[store_rank[old]] = norm_rank[norm_id] if norm_id >= 0 else -1
+        store_agg[store_rank[old]] = agg_rank[agg_id] if agg_id >= 0 else -1
+
+    buf = bytearray(_HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, *fingerprint,
+        len(names), len(table), len(norm_names), len(agg_names), len(normalized), len(aggressive)))
+    _pad(buf)
+    _write_strings(buf, [names[i] for i in store_order])
+    _write_strings(buf, norm_names)
+    _write_strings(buf, agg_names)
+    buf.extend(array('i', [store_rank[i] for i in table.from_ids]).tobytes())
+    buf.extend(array('i', [store_rank[i] for i in table.to_ids]).tobytes())
+    _pad(buf)
+    buf.extend(table.values.tobytes())
+    buf.extend(bytes(table._int_flags))
+    _pad(buf)
+    buf.extend(store_norm.tobytes())
+    buf.extend(store_agg.tobytes())
+    _pad(buf)
+    _write_index(buf, exact)
+    _write_index(buf, normalized)
+    _write_index(buf, aggressive)
+
+    tmp_file = f"{snapshot_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(buf)
+    os.replace(tmp_file, snapshot_file)
+
+
+def _view(views, mv, start, length, fmt=None):
+    """在映射内存上切出一段视图并记录，关闭快照前需要逐个释放"""
+    part = mv[start:start + length]
+    views.append(part)
+    if fmt is not None:
+        part = part.cast(fmt)
+        views.append(part)
+    return part
+
+
+class _StringTable:
+    """映射内存上的已排序字符串表"""
+
+    def __init__(self, views, mv, offset, count):
+        self.count = count
+        self.offsets = _view(views, mv, offset, (count + 1) * 4, 'I')
+        self.blob_start = offset + (count + 1) * 4
+        self.mv = mv
+        end = self.blob_start + self.offsets[count]
+        self.end = end + (-end % 8)
+
+    def __len__(self):
+        return self.count
+
+    def raw(self, i):
+        return self.mv[self.blob_start + self.offsets[i]:self.blob_start + self.offsets[i + 1]].tobytes()
+
+    def get(self, i):
+        return self.raw(i).decode('utf-8')
+
+    def find(self, name):
+        """二分查找店名，返回ID或None"""
+        if not name:
+            return None
+        target = name.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.raw(lo) == target:
+            return lo
+        return None
+
+
+class _PackedIndex:
+    """映射内存上的已排序打包键索引"""
+
+    def __init__(self, views, mv, offset, count):
+        self.keys = _view(views, mv, offset, count * 8, 'Q')
+        rows_start = offset + count * 8
+        self.rows = _view(views, mv, rows_start, count * 4, 'i')
+        end = rows_start + count * 4
+        self.end = end + (-end % 8)
+
+    def get(self, packed):
+        i = bisect_left(self.keys, packed)
+        if i < len(self.keys) and self.keys[i] == packed:
+            return self.rows[i]
+        return None
+
+
+class SnapshotIndex:
+    """
+    基于 mmap 快照的只读距离索引
+
+    查询接口与 DistanceIndex 相同（lookup / resolve_segments），
+    需要完整对象（如构建估算图）时用 materialize() 转换为 DistanceIndex。
+    """
+
+    def __init__(self, snapshot_file):
+        with open(snapshot_file, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mv = memoryview(self._mm)
+        self._views = []
+        try:
+            self._map(snapshot_file)
+        except (IndexError, TypeError, struct.error) as e:
+            self.close()
+            raise ValueError(f"快照文件损坏: {snapshot_file}") from e
+
+    def _map(self, snapshot_file):
+        mv = self._mv
+        views = self._views
+        header = _HEADER.unpack_from(mv, 0)
+        if header[0] != SNAPSHOT_MAGIC or header[1] != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"快照格式不匹配: {snapshot_file}")
+        self.fingerprint = header[2:6]
+        n_stores, n_segments, n_norm, n_agg, n_norm_index, n_agg_index = header[6:]
+
+        offset = _HEADER.size + (-_HEADER.size % 8)
+        self._stores = _StringTable(views, mv, offset, n_stores)
+        self._norm_names = _StringTable(views, mv, self._stores.end, n_norm)
+        self._agg_names = _StringTable(views, mv, self._norm_names.end, n_agg)
+
+        offset = self._agg_names.end
+        self._from_ids = _view(views, mv, offset, n_segments * 4, 'i')
+        offset += n_segments * 4
+        self._to_ids = _view(views, mv, offset, n_segments * 4, 'i')
+        offset += n_segments * 4
+        offset += -offset % 8
+        self._values = _view(views, mv, offset, n_segments * 8, 'd')
+        offset += n_segments * 8
+        self._int_flags = _view(views, mv, offset, n_segments)
+        offset += n_segments
+        offset += -offset % 8
+        self._store_norm = _view(views, mv, offset, n_stores * 4, 'i')
+        offset += n_stores * 4
+        self._store_agg = _view(views, mv, offset, n_stores * 4, 'i')
+        offset += n_stores * 4
+        offset += -offset % 8
+
+        self._exact = _PackedIndex(views, mv, offset, n_segments)
+        self._normalized = _PackedIndex(views, mv, self._exact.end, n_norm_index)
+        self._aggressive = _PackedIndex(views, mv, self._normalized.end, n_agg_index)
+        if self._aggressive.end != len(self._mm):
+            self.close()
+            raise ValueError(f"快照文件不完整: {snapshot_file}")
+        self._n_segments = n_segments
+
+    def __len__(self):
+        return self._n_segments
+
+    def __contains__(self, segment_key):
+        parts = segment_key.split(SEGMENT_SEPARATOR)
+        return len(parts) == 2 and self._exact_row(parts[0], parts[1]) is not None
+
+    def distance_at(self, row):
+        value = self._values[row]
+        return int(value) if self._int_flags[row] else value
+
+    def key_at(self, row):
+        return (f"{self._stores.get(self._from_ids[row])}{SEGMENT_SEPARATOR}"
+                f"{self._stores.get(self._to_ids[row])}")
+
+    def store_names(self):
+        """全部已知店名（按需解码）"""
+        return [self._stores.get(i) for i in range(len(self._stores))]
+
+    def _exact_row(self, from_store, to_store):
+        from_id = self._stores.find(from_store)
+        if from_id is None:
+            return None
+        to_id = self._stores.find(to_store)
+        if to_id is None:
+            return None
+        return self._exact.get(pack_pair(from_id, to_id))
+
+    def _hit(self, row, tier):
+        return self.distance_at(row), self.key_at(row), tier
+
+    def lookup(self, from_store, to_store):
+        """与 DistanceIndex.lookup 相同的三级查找"""
+        from_norm = normalize_store_name(from_store)
+        to_norm = normalize_store_name(to_store)
+
+        if not from_norm or not to_norm:
+            return None, None, TIER_MISS
+
+        for pair in ((from_store, to_store),
+                     (_to_half_brackets(from_store), _to_half_brackets(to_store)),
+                     (_to_full_brackets(from_store), _to_full_brackets(to_store))):
+            row = self._exact_row(*pair)
+            if row is not None:
+                return self._hit(row, TIER_EXACT)
+
+        from_id = self._norm_names.find(from_norm)
+        to_id = self._norm_names.find(to_norm)
+        if from_id is not None and to_id is not None:
+            row = self._normalized.get(pack_pair(from_id, to_id))
+            if row is not None:
+                return self._hit(row, TIER_NORMALIZED)
+
+        from_id = self._agg_names.find(normalize_store_name(from_store, aggressive=True))
+        to_id = self._agg_names.find(normalize_store_name(to_store, aggressive=True))
+        if from_id is not None and to_id is not None:
+            row = self._aggressive.get(pack_pair(from_id, to_id))
+            if row is not None:
+                return self._hit(row, TIER_AGGRESSIVE)
+
+        return None, None, TIER_MISS
+
+    def resolve_segments(self, pairs):
+        """批量查找路段距离，重复的 (起点, 终点) 只查询一次"""
+        resolved = {}
+        for pair in pairs:
+            if pair not in resolved:
+                resolved[pair] = self.lookup(pair[0], pair[1])
+        return resolved
+
+    def materialize(self):
+        """按原始行序还原为 DistanceIndex"""
+        distances = {self.key_at(row): self.distance_at(row) for row in range(self._n_segments)}
+        return DistanceIndex(distances)
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mv.release()
+        self._mm.close()
+
+
+def load_snapshot_index(cache_file, rebuild=True):
+    """
+    加载距离缓存的查询索引，优先使用二进制快照
+
+    快照不存在、版本不符或JSON/变更日志已变化时，从JSON重新构建索引并重写快照。
+
+    Args:
+        cache_file: reusable_distances.json 路径
+        rebuild: 快照过期时是否重写快照
+
+    Returns:
+        SnapshotIndex（快照有效）或 DistanceIndex（刚从JSON构建）
+    """
+    snapshot_file = snapshot_path_for(cache_file)
+    fingerprint = source_fingerprint(cache_file)
+
+    if sys.byteorder == 'little':
+        try:
+            index = SnapshotIndex(snapshot_file)
+        except (OSError, ValueError):
+            index = None
+        if index is not None:
+            if tuple(index.fingerprint) == fingerprint:
+                return index
+            index.close()
+
+    index = DistanceIndex(load_distance_cache(cache_file))
+    if rebuild and sys.byteorder == 'little':
+        try:
+            write_snapshot(index, snapshot_file, fingerprint)
+        except OSError:
+            pass
+    return index
@@ -7,10 +7,17 @@
 import re
 import json
 import pandas as pd
-from openpyxl import load_workbook
 from datetime import datetime
 from collections import defaultdict
 
+from .cache_journal import journal_path_for, replay_journal
+from .distance_index import DistanceIndex, exact_name_variants
+from .normalize import normalize_store_name
+from .parse_cache import PARSE_CACHE, decode_routes, decode_vehicles, encode_routes, encode_vehicles
+from .route_model import Route, RouteBatch, StopResult, route_segments
+from .segment_table import SegmentTable
+from .workbook_reader import iter_column_values, iter_route_records
+
 # 区域配置
 REGION_CONFIG = {
     'hefei': {
@@ -30,6 +37,9 @@ REGION_CONFIG = {
 # 默认冲突阈值（km）
 CONFLICT_THRESHOLD = 5.0
 
+# 估算距离标记，如 "店名-约12km"，与缓存精确命中的距离区分
+ESTIMATE_MARK = '约'
+
 
 def get_region_config(region):
     """获取区域配置"""
@@ -39,44 +49,6 @@ def get_region_config(region):
     return REGION_CONFIG[region]
 
 
-def normalize_store_name(name, aggressive=False):
-    """
-    标准化店名，处理常见的格式差异
-
-    Args:
-        name: 店名
-        aggressive: 是否使用激进模式（处理更多变体）
-
-    Returns:
-        标准化后的店名，或None如果输入无效
-    """
-    if pd.isna(name) or name is None:
-        return None
-
-    name = str(name).strip()
-    if not name:
-        return None
-
-    # 统一括号格式
-    name = name.replace('（', '(').replace('）', ')')
-    # 移除多余空格
-    name = re.sub(r'\s+', '', name)
-
-    if aggressive:
-        # 更激进的标准化，用于模糊匹配
-        # 处理"历臣"和"厉臣"的混用
-        name = name.replace('历臣', '厉臣')
-        # 处理连字符差异
-        name = name.replace('-', '-').replace('—', '-').replace('－', '-')
-        # 处理"共橙一站式"和"共橙-站式"的混用
-        name = re.sub(r'共橙[-\s]*站式', '共橙一站式', name)
-        # 处理"共橙超市"和"供橙超市"
-        name = name.replace('供橙超市', '共橙超市')
-        name = name.replace('供橙一站式超市', '共橙一站式超市')
-
-    return name
-
-
 def parse_shop_and_distance(shop_line):
     """
     解析店名行，提取店名和距离
@@ -85,7 +57,7 @@ def parse_shop_and_distance(shop_line):
         shop_line: 格式如 "店名-XXkm" 或纯店名
 
     Returns:
-        (店名, 距离) 元组，距离可能为None
+        (店名, 距离) 元组，距离可能为None（估算距离 "店名-约XXkm" 也返回None，不作为已知距离）
     """
     shop_line = str(shop_line).strip()
     # 匹配格式：店名-距离km
@@ -96,76 +68,119 @@ def parse_shop_and_distance(shop_line):
         shop_name = match.group(1)
         distance = float(match.group(2))
         return shop_name, distance
-    else:
-        return shop_line, None
+
+    match = re.match(rf'^(.+?)-{ESTIMATE_MARK}\d+(?:\.\d+)?km$', shop_line)
+    if match:
+        return match.group(1), None
+
+    return shop_line, None
+
+
+def build_distance_index(distances):
+    """
+    根据距离字典构建查询索引
+
+    Args:
+        distances: 距离字典 {"A -> B": 10.5, ...}，已是索引时原样返回
+
+    Returns:
+        DistanceIndex
+    """
+    if isinstance(distances, DistanceIndex):
+        return distances
+    return DistanceIndex(distances)
+
+
+def load_distance_index(cache_file):
+    """加载距离缓存并构建查询索引"""
+    return build_distance_index(load_distance_cache(cache_file))
 
 
 def find_distance(distances, from_store, to_store):
     """
-    从距离字典中查找距离，尝试多种格式匹配
+    从距离索引中查找距离，依次尝试精确、标准化、激进标准化匹配
 
     Args:
-        distances: 距离字典 {"A -> B": 10.5, ...}
+        distances: DistanceIndex 或距离字典 {"A -> B": 10.5, ...}
+            （传入字典时精确命中直接查字典，否则每次调用都会临时构建索引，批量查询请先构建索引）
         from_store: 起点店名
         to_store: 终点店名
 
     Returns:
         (距离值, 匹配的键) 或 (None, None)
     """
-    from_norm = normalize_store_name(from_store)
-    to_norm = normalize_store_name(to_store)
+    if not isinstance(distances, DistanceIndex):
+        # 精确层（原始名称及括号变体）只需查字典，不必构建整个索引
+        if normalize_store_name(from_store) and normalize_store_name(to_store):
+            for from_name, to_name in exact_name_variants(from_store, to_store):
+                key = f"{from_name} -> {to_name}"
+                if key in distances:
+                    return distances[key], key
+    index = build_distance_index(distances)
+    dist, key, _ = index.lookup(from_store, to_store)
+    return dist, key
+
+
+def split_route_stops(route_text):
+    """
+    拆分路线文本为站点列表
 
-    if not from_norm or not to_norm:
-        return None, None
+    Args:
+        route_text: 包含换行符的站点列表
 
-    # 构建可能的查询键变体
-    key_variants = []
+    Returns:
+        [站点1, 站点2, ...]，空值返回空列表
+    """
+    if route_text is None or pd.isna(route_text):
+        return []
+    return [s.strip() for s in str(route_text).split('\n') if s.strip()]
 
-    # 原始格式
-    key_variants.append(f"{from_store} -> {to_store}")
-    key_variants.append(f"{from_norm} -> {to_norm}")
 
-    # 尝试不同的括号格式
-    from_half = from_store.replace('（', '(').replace('）', ')')
-    to_half = to_store.replace('（', '(').replace('）', ')')
-    key_variants.append(f"{from_half} -> {to_half}")
+def route_segment_pairs(stops, start_point):
+    """
+    按"上一站 -> 下一站"规则生成路线的路段
 
-    # 尝试全角括号
-    from_full = from_store.replace('(', '（').replace(')', '）')
-    to_full = to_store.replace('(', '（').replace(')', '）')
-    key_variants.append(f"{from_full} -> {to_full}")
+    Args:
+        stops: 站点列表
+        start_point: 起点名称
 
-    # 遍历所有变体查找
-    for key in key_variants:
-        if key in distances:
-            return distances[key], key
+    Returns:
+        [(起点, 第一站), (第一站, 第二站), ...]
+    """
+    return list(zip([start_point] + stops[:-1], stops))
 
-    # 模糊匹配：使用激进标准化
-    from_agg = normalize_store_name(from_store, aggressive=True)
-    to_agg = normalize_store_name(to_store, aggressive=True)
 
-    # 遍历所有距离记录进行模糊匹配
-    for dist_key, dist_val in distances.items():
-        if ' -> ' not in dist_key:
-            continue
-        parts = dist_key.split(' -> ')
-        if len(parts) != 2:
-            continue
-        key_from, key_to = parts
-        key_from_norm = normalize_store_name(key_from)
-        key_to_norm = normalize_store_name(key_to)
-        key_from_agg = normalize_store_name(key_from, aggressive=True)
-        key_to_agg = normalize_store_name(key_to, aggressive=True)
+def resolve_segments(distances, pairs):
+    """
+    批量解析路段距离，相同的 (起点, 终点) 只查询一次
 
-        # 普通匹配
-        if key_from_norm == from_norm and key_to_norm == to_norm:
-            return dist_val, dist_key
+    Args:
+        distances: DistanceIndex 或距离字典
+        pairs: 可迭代的 (起点, 终点) 元组
 
-        # 激进匹配
-        if key_from_agg == from_agg and key_to_agg == to_agg:
-            return dist_val, dist_key
+    Returns:
+        {(起点, 终点): (距离值, 匹配的键, 匹配层级), ...}
+    """
+    return build_distance_index(distances).resolve_segments(pairs)
 
-    return None, None
+
+def build_route_results(stops, start_point, resolved):
+    """
+    根据已解析的路段结果生成路线每个站点的距离信息
+
+    Args:
+        stops: 站点列表
+        start_point: 起点名称
+        resolved: resolve_segments 的返回值
+
+    Returns:
+        与 process_route 相同的 StopResult 列表
+    """
+    results = []
+    for prev_stop, curr_stop in route_segment_pairs(stops, start_point):
+        dist, key, tier = resolved[(prev_stop, curr_stop)]
+        results.append(StopResult(curr_stop, prev_stop, curr_stop, dist, key, tier))
+    return results
 
 
 def process_route(route_text, distances, start_point):
@@ -174,154 +189,172 @@ def process_route(route_text, distances, start_point):
 
     Args:
         route_text: 包含换行符的站点列表
-        distances: 距离字典
+        distances: DistanceIndex 或距离字典
         start_point: 起点名称
 
     Returns:
-        [{'stop': ..., 'from': ..., 'to': ..., 'distance': ..., 'found': ...}, ...]
+        [StopResult(stop, from_store, to_store, distance, key, tier), ...]，找到距离时 found 为True
     """
-    if pd.isna(route_text):
-        return []
-
-    stops = [s.strip() for s in str(route_text).split('\n') if s.strip()]
+    stops = split_route_stops(route_text)
     if not stops:
         return []
 
-    results = []
+    # 第一站从起点出发，后续站点为前一站到下一站
+    resolved = resolve_segments(distances, route_segment_pairs(stops, start_point))
+    return build_route_results(stops, start_point, resolved)
 
-    # 第一站：从起点到第一站
-    first_stop = stops[0]
-    dist, key = find_distance(distances, start_point, first_stop)
-    results.append({
-        'stop': first_stop,
-        'from': start_point,
-        'to': first_stop,
-        'distance': dist,
-        'key': key,
-        'found': dist is not None
-    })
-
-    # 后续站点：前一站到下一站
-    for i in range(1, len(stops)):
-        prev_stop = stops[i-1]
-        curr_stop = stops[i]
-        dist, key = find_distance(distances, prev_stop, curr_stop)
-        results.append({
-            'stop': curr_stop,
-            'from': prev_stop,
-            'to': curr_stop,
-            'distance': dist,
-            'key': key,
-            'found': dist is not None
-        })
 
-    return results
+# 已填写距离的站点行：精确距离 "店名-12km"、估算距离 "店名-约12km"；未找到的为 "店名-?km"
+_FILLED_LINE = re.compile(r'^(.+?)-\d+(?:\.\d+)?km$')
+_ESTIMATED_LINE = re.compile(rf'^(.+?)-{ESTIMATE_MARK}\d+(?:\.\d+)?km$')
+_MISSING_LINE = re.compile(r'^(.+?)-\?km$')
 
 
-def extract_routes_from_excel(file_path, start_point):
+def split_filled_stops(lines):
     """
-    从对账单Excel中提取路线数据
+    拆分已填充距离的路线的站点行
 
     Args:
-        file_path: Excel文件路径
-        start_point: 起点名称
+        lines: split_route_stops 的返回值，每行为 "店名-XXkm"、"店名-约XXkm"、"店名-?km" 或纯店名
 
     Returns:
-        路线列表 [{'vehicle_no': ..., 'date': ..., 'shops': [...], 'distances': [...]}, ...]
+        (站点名列表, {站点序号: 原文}, {站点序号: 原文})：
+        第二项为已有精确距离、重新填充时保留原样的站点；
+        第三项为估算距离的站点，重新填充时和 "?km" 一样重新查询
     """
-    wb = load_workbook(file_path)
-    ws = wb.active
-    routes = []
-
-    for row_idx in range(2, ws.max_row + 1):
-        vehicle_no = ws.cell(row=row_idx, column=1).value
-        date_value = ws.cell(row=row_idx, column=2).value
-        shop_names_cell = ws.cell(row=row_idx, column=3).value
+    stops = []
+    kept = {}
+    estimated = {}
+    for i, line in enumerate(lines):
+        match = _FILLED_LINE.match(line)
+        if match:
+            kept[i] = line
+        else:
+            match = _ESTIMATED_LINE.match(line)
+            if match:
+                estimated[i] = line
+            else:
+                match = _MISSING_LINE.match(line)
+        stops.append(match.group(1) if match else line)
+    return stops, kept, estimated
 
-        if vehicle_no is None:
-            break
 
-        shops = []
-        distances = []
+def parse_route_text(route_text):
+    """
+    解析路线文本中的站点和已填写的距离
 
-        if shop_names_cell:
-            shop_lines = [s.strip() for s in str(shop_names_cell).split('\n') if s.strip()]
+    Args:
+        route_text: 包含换行符的站点列表，每行为 "店名-XXkm" 或纯店名
 
-            for shop_line in shop_lines:
+    Returns:
+        (站点列表, 距离列表)，没有距离的站点距离为None
+    """
+    shops = []
+    distances = []
+    if route_text:
+        for shop_line in str(route_text).split('\n'):
+            shop_line = shop_line.strip()
+            if shop_line:
                 shop_name, distance = parse_shop_and_distance(shop_line)
                 shops.append(shop_name)
                 distances.append(distance)
+    return shops, distances
 
-        route = {
-            'vehicle_no': vehicle_no,
-            'date': date_value,
-            'shops': shops,
-            'distances': distances
-        }
 
-        routes.append(route)
+def route_from_record(record):
+    """对账单的一行（RouteRecord） -> Route"""
+    shops, distances = parse_route_text(record.route_text)
+    return Route(record.vehicle_no, record.date, shops, distances)
 
-    return routes
 
+def iter_routes_from_excel(file_path, start_point, backend=None):
+    """
+    从对账单Excel中逐条读取路线数据（流式只读，不整本加载工作簿）
 
-def build_segments(route, start_point):
+    Args:
+        file_path: Excel文件路径
+        start_point: 起点名称
+        backend: 读取后端 'openpyxl' 或 'xml'（可选）
+
+    Yields:
+        Route(vehicle_no, date, shops, distances)
     """
-    根据物流规则构建路段
+    for record in iter_route_records(file_path, backend):
+        yield route_from_record(record)
+
+
+def extract_routes_from_excel(file_path, start_point, backend=None):
+    """
+    从对账单Excel中提取路线数据
+
+    解析结果按文件内容缓存（见 parse_cache），文件未变时不再重新解析
 
     Args:
-        route: 路线字典 {'shops': [...], 'distances': [...]}
+        file_path: Excel文件路径
         start_point: 起点名称
+        backend: 读取后端 'openpyxl' 或 'xml'（可选）
 
     Returns:
-        [(起点, 终点, 距离), ...]
+        RouteBatch（列式存储，可按下标或迭代取得 Route）
     """
-    segments = []
-    shops = route['shops']
-    distances = route['distances']
+    return PARSE_CACHE.get_or_parse(file_path, 'routes',
+                                    lambda: RouteBatch.from_routes(iter_routes_from_excel(file_path, start_point, backend)),
+                                    encode_routes, decode_routes)
 
-    if not shops:
-        return segments
 
-    # 第一段：起点到第一站
-    first_distance = distances[0] if len(distances) > 0 else None
-    segments.append((start_point, shops[0], first_distance))
+def build_segments(route, start_point):
+    """
+    根据物流规则构建路段
 
-    # 后续段：前一站到下一站
-    for i in range(1, len(shops)):
-        distance = distances[i] if i < len(distances) else None
-        segments.append((shops[i-1], shops[i], distance))
+    Args:
+        route: Route
+        start_point: 起点名称
 
-    return segments
+    Returns:
+        [Segment(起点, 终点, 距离), ...]；第一段为起点到第一站，后续为前一站到下一站
+    """
+    return list(route_segments(route.shops, route.distances, start_point))
 
 
-def format_distance(dist_val):
+def format_distance(dist_val, estimated=False):
     """
     格式化距离值为字符串
 
     Args:
         dist_val: 距离数值
+        estimated: 是否为估算距离
 
     Returns:
-        格式化后的字符串，如 "10km" 或 "10.5km"
+        格式化后的字符串，如 "10km"、"10.5km" 或估算的 "约10km"
     """
     if dist_val is None:
         return "?km"
+    mark = ESTIMATE_MARK if estimated else ''
     if dist_val == int(dist_val):
-        return f"{int(dist_val)}km"
-    return f"{dist_val}km"
+        return f"{mark}{int(dist_val)}km"
+    return f"{mark}{dist_val}km"
 
 
 def load_distance_cache(cache_file):
-    """加载距离缓存"""
+    """
+    加载距离缓存（快照 + 变更日志中尚未压缩的路段写入）
+
+    Returns:
+        SegmentTable，店名驻留为整数ID，同时支持 "A -> B" 字典方式访问
+    """
     try:
         with open(cache_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            table = SegmentTable.from_mapping(json.load(f))
     except FileNotFoundError:
-        return {}
+        table = SegmentTable()
+    replay_journal(journal_path_for(cache_file), table)
+    return table
 
 
 def save_distance_cache(cache_file, distances):
-    """保存距离缓存"""
+    """保存距离缓存（SegmentTable 或距离字典）"""
+    if isinstance(distances, SegmentTable):
+        distances = distances.to_dict()
     with open(cache_file, 'w', encoding='utf-8') as f:
         json.dump(distances, f, ensure_ascii=False, indent=2)
 
@@ -348,77 +381,89 @@ def date_str_to_excel_serial(date_str, year=2026):
     return delta.days
 
 
-def parse_txt_data(txt_file):
+def iter_txt_vehicles(lines):
     """
-    解析txt文件，返回按日期分组的店名数据
+    逐车解析txt格式的店名数据（日期行、店名行，车辆之间空行分隔）
+
+    每辆车在遇到空行、下一个日期行或输入结束时立即产出，可用于流式读取标准输入。
 
     Args:
-        txt_file: txt文件路径
+        lines: 可迭代的文本行
 
-    Returns:
-        {日期: [[车1店名], [车2店名], ...], ...}
+    Yields:
+        (日期, [店名...])；第一个日期行之前的车辆日期为None
     """
-    with open(txt_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    data = {}
     current_date = None
     current_vehicle = []
 
     for line in lines:
         line = line.strip()
 
-        # 跳过空行
+        # 空行：一辆车结束
         if not line:
-            if current_vehicle and current_date:
-                if current_date not in data:
-                    data[current_date] = []
-                data[current_date].append(current_vehicle)
+            if current_vehicle:
+                yield current_date, current_vehicle
                 current_vehicle = []
             continue
 
         # 检查是否是日期行(格式如"1.13")
         if line.replace('.', '').isdigit() and '.' in line:
             # 保存前一辆车的数据
-            if current_vehicle and current_date:
-                if current_date not in data:
-                    data[current_date] = []
-                data[current_date].append(current_vehicle)
+            if current_vehicle:
+                yield current_date, current_vehicle
                 current_vehicle = []
             current_date = line
         else:
             # 店名行
             current_vehicle.append(line)
 
-    # 保存最后一辆车的数据
-    if current_vehicle and current_date:
-        if current_date not in data:
-            data[current_date] = []
-        data[current_date].append(current_vehicle)
+    # 最后一辆车
+    if current_vehicle:
+        yield current_date, current_vehicle
+
 
+def parse_txt_data(txt_file):
+    """
+    解析txt文件，返回按日期分组的店名数据
+
+    Args:
+        txt_file: txt文件路径
+
+    Returns:
+        {日期: [[车1店名], [车2店名], ...], ...}，第一个日期行之前的车辆忽略
+    """
+    data = {}
+    with open(txt_file, 'r', encoding='utf-8') as f:
+        for date_str, vehicle in iter_txt_vehicles(f):
+            if date_str:
+                data.setdefault(date_str, []).append(vehicle)
     return data
 
 
-def extract_stores_from_excel(excel_file, store_column=4):
+def extract_stores_from_excel(excel_file, store_column=4, backend=None):
     """
     从Excel文件中提取店名，按车辆分组
 
+    解析结果按文件内容缓存（见 parse_cache），文件未变时不再重新解析
+
     Args:
         excel_file: Excel文件路径
         store_column: 店名所在列（默认第4列）
+        backend: 读取后端 'openpyxl' 或 'xml'（可选）
 
     Returns:
         [[车1的店名列表], [车2的店名列表], ...]
     """
-    wb = load_workbook(excel_file)
-    ws = wb.active
+    return PARSE_CACHE.get_or_parse(excel_file, f'stores-c{store_column}',
+                                    lambda: _read_store_column(excel_file, store_column, backend),
+                                    encode_vehicles, decode_vehicles)
+
 
+def _read_store_column(excel_file, store_column, backend=None):
     vehicles = []
     current_vehicle = []
 
-    for row_idx in range(2, ws.max_row + 1):
-        store_name = ws.cell(row=row_idx, column=store_column).value
-
+    for store_name in iter_column_values(excel_file, store_column, backend):
         if store_name is None or str(store_name).strip() == '':
             if current_vehicle:
                 vehicles.append(current_vehicle)
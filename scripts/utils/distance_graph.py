@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+基于路段图的距离估算
+把距离缓存看作店名之间的加权图，对缓存中没有的 A -> B，
+优先使用反向路段 B -> A，否则用已知路段拼出的最短路径作为估算值
+"""
+
+import heapq
+from collections import OrderedDict
+
+from .cache_snapshot import SnapshotIndex
+from .distance_index import DistanceIndex
+
+# 最短路径结果缓存的起点数量上限
+PATH_CACHE_SIZE = 128
+
+# 估算来源
+SOURCE_REVERSE = 'reverse'
+SOURCE_PATH = 'path'
+
+
+class DistanceGraph:
+    """
+    距离估算图
+
+    节点为激进标准化后的店名（同一门店的写法变体合并为一个节点），
+    每条缓存路段同时作为正反两个方向的边。以起点为单位运行 Dijkstra，
+    结果按起点做LRU缓存，仓库起点这类高频起点只需计算一次。
+
+    图在构建时对索引做快照，之后索引再更新需要重新构建。
+    """
+
+    def __init__(self, distances, path_cache_size=PATH_CACHE_SIZE):
+        """
+        Args:
+            distances: DistanceIndex、SnapshotIndex、SegmentTable 或距离字典
+            path_cache_size: 最短路径结果缓存的起点数量上限
+        """
+        if isinstance(distances, SnapshotIndex):
+            distances = distances.materialize()
+        if isinstance(distances, DistanceIndex):
+            self.index = distances
+        else:
+            self.index = DistanceIndex(distances)
+        self.table = self.index.table
+        self.path_cache_size = path_cache_size
+
+        # 邻接表: 节点ID -> [(相邻节点ID, 距离, 路段行号), ...]
+        self.adjacency = {}
+        for row in range(len(self.table)):
+            from_node, to_node = self.index.row_aggressive_pair(row)
+            if from_node is None or to_node is None or from_node == to_node:
+                continue
+            distance = self.table.values[row]
+            self.adjacency.setdefault(from_node, []).append((to_node, distance, row))
+            self.adjacency.setdefault(to_node, []).append((from_node, distance, row))
+
+        self._path_cache = OrderedDict()
+
+    def _shortest_paths(self, source):
+        """返回 (距离表, 前驱表)，前驱表为 节点 -> (前驱节点, 路段行号)"""
+        cached = self._path_cache.get(source)
+        if cached is not None:
+            self._path_cache.move_to_end(source)
+            return cached
+
+        dist = {source: 0.0}
+        prev = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            for neighbor, weight, row in self.adjacency.get(node, ()):
+                nd = d + weight
+                if nd < dist.get(neighbor, float('inf')):
+                    dist[neighbor] = nd
+                    prev[neighbor] = (node, row)
+                    heapq.heappush(heap, (nd, neighbor))
+
+        self._path_cache[source] = (dist, prev)
+        if len(self._path_cache) > self.path_cache_size:
+            self._path_cache.popitem(last=False)
+        return dist, prev
+
+    def estimate(self, from_store, to_store):
+        """
+        估算缓存中没有的路段距离
+
+        Args:
+            from_store: 起点店名
+            to_store: 终点店名
+
+        Returns:
+            {'distance': 估算距离, 'source': 'reverse'/'path', 'path': [路段键, ...]}，
+            无法估算时返回None
+        """
+        # 反向路段最接近真实距离，优先使用
+        dist, key, _ = self.index.lookup(to_store, from_store)
+        if dist is not None:
+            return {'distance': dist, 'source': SOURCE_REVERSE, 'path': [key]}
+
+        source = self.index.aggressive_id(from_store)
+        target = self.index.aggressive_id(to_store)
+        if source is None or target is None or source == target:
+            return None
+
+        dist_map, prev = self._shortest_paths(source)
+        if target not in dist_map:
+            return None
+
+        path = []
+        node = target
+        while node != source:
+            node, row = prev[node]
+            path.append(self.table.key_at(row))
+        path.reverse()
+
+        return {
+            'distance': round(dist_map[target], 2),
+            'source': SOURCE_PATH,
+            'path': path
+        }
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+距离索引
+在加载距离缓存时一次性构建精确、标准化、激进标准化三级哈希表，
+使每次路段查询都是 O(1)，不再对整个缓存做线性扫描
+"""
+
+from array import array
+
+from .normalize import normalize_store_name
+from .segment_table import SegmentTable, StoreRegistry, pack_pair, split_segment_key
+
+# 匹配层级
+TIER_EXACT = 'exact'
+TIER_NORMALIZED = 'normalized'
+TIER_AGGRESSIVE = 'aggressive'
+TIER_MISS = 'miss'
+
+# 店名标准化结果为空时的占位ID
+_NO_ID = -1
+
+
+def _to_half_brackets(name):
+    return name.replace('（', '(').replace('）', ')')
+
+
+def _to_full_brackets(name):
+    return name.replace('(', '（').replace(')', '）')
+
+
+def exact_name_variants(from_store, to_store):
+    """精确层依次尝试的 (起点, 终点)：原始名称及其半角/全角括号变体"""
+    return ((from_store, to_store),
+            (_to_half_brackets(from_store), _to_half_brackets(to_store)),
+            (_to_full_brackets(from_store), _to_full_brackets(to_store)))
+
+
+class DistanceIndex:
+    """
+    距离缓存索引
+
+    建立在 SegmentTable 之上：精确层直接使用路段表的ID哈希，
+    标准化层和激进层把每个店名的标准化结果再驻留为ID，以打包后的 (起点ID, 终点ID) 定位行号。
+    查询严格按层级进行：精确（含括号变体）全部未命中才查标准化层，再查激进层；
+    同一标准化键对应多条记录时保留缓存中最先出现的一条。
+
+    注意与原线性扫描的结果并不完全一致：原实现还把 "标准化起点 -> 标准化终点" 当作精确键查询，
+    并按缓存顺序交替检查标准化和激进匹配，因此少数路段（同一店名对有多条标准化/激进等价记录时）
+    命中的键和距离会不同。
+    """
+
+    def __init__(self, distances=None):
+        """
+        Args:
+            distances: SegmentTable 或距离字典 {"A -> B": 10.5, ...}
+        """
+        if isinstance(distances, SegmentTable):
+            self.table = distances
+        else:
+            self.table = SegmentTable.from_mapping(distances or {})
+        self.registry = self.table.registry
+
+        # 店名ID -> 标准化名ID / 激进标准化名ID
+        self._norm_names = StoreRegistry()
+        self._agg_names = StoreRegistry()
+        self._store_norm = array('i')
+        self._store_agg = array('i')
+
+        self._normalized = {}
+        self._aggressive = {}
+
+        for row in range(len(self.table)):
+            self._index_row(row)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, segment_key):
+        return segment_key in self.table
+
+    def store_names(self):
+        """全部已知店名"""
+        return self.registry.names
+
+    @property
+    def distances(self):
+        """底层路段表（可按 "A -> B" 字典方式访问）"""
+        return self.table
+
+    def _store_keys(self, store_id):
+        """返回店名ID对应的 (标准化名ID, 激进标准化名ID)，按需计算并缓存"""
+        while len(self._store_norm) <= store_id:
+            name = self.registry.name(len(self._store_norm))
+            norm = normalize_store_name(name)
+            agg = normalize_store_name(name, aggressive=True)
+            self._store_norm.append(self._norm_names.intern(norm) if norm else _NO_ID)
+            self._store_agg.append(self._agg_names.intern(agg) if agg else _NO_ID)
+        return self._store_norm[store_id], self._store_agg[store_id]
+
+    def _index_row(self, row):
+        from_id, to_id = self.table.pair_at(row)
+        from_norm, from_agg = self._store_keys(from_id)
+        to_norm, to_agg = self._store_keys(to_id)
+
+        if from_norm != _NO_ID and to_norm != _NO_ID:
+            self._normalized.setdefault(pack_pair(from_norm, to_norm), row)
+        if from_agg != _NO_ID and to_agg != _NO_ID:
+            self._aggressive.setdefault(pack_pair(from_agg, to_agg), row)
+
+    def add(self, segment_key, distance):
+        """
+        添加或更新一条路段记录
+
+        Args:
+            segment_key: 路段键 "A -> B"
+            distance: 距离（km）
+        """
+        pair = split_segment_key(segment_key)
+        if pair is None:
+            raise ValueError(f"无效的路段键: {segment_key}")
+        from_id = self.registry.intern(pair[0])
+        to_id = self.registry.intern(pair[1])
+        row = self.table.set_by_ids(from_id, to_id, distance)
+        self._index_row(row)
+
+    def aggressive_id(self, name):
+        """返回店名激进标准化后的ID，缓存中没有该店名时返回None"""
+        agg = normalize_store_name(name, aggressive=True)
+        return self._agg_names.get_id(agg) if agg else None
+
+    def row_aggressive_pair(self, row):
+        """返回指定行起止店名激进标准化后的 (起点ID, 终点ID)，店名无效的一端为None"""
+        from_id, to_id = self.table.pair_at(row)
+        from_agg = self._store_keys(from_id)[1]
+        to_agg = self._store_keys(to_id)[1]
+        return (from_agg if from_agg != _NO_ID else None,
+                to_agg if to_agg != _NO_ID else None)
+
+    def _hit(self, row, tier):
+        return self.table.distance_at(row), self.table.key_at(row), tier
+
+    def _exact_row(self, from_store, to_store):
+        from_id = self.registry.get_id(from_store)
+        if from_id is None:
+            return None
+        to_id = self.registry.get_id(to_store)
+        if to_id is None:
+            return None
+        return self.table.row_of(from_id, to_id)
+
+    def lookup(self, from_store, to_store):
+        """
+        查找路段距离
+
+        Args:
+            from_store: 起点店名
+            to_store: 终点店名
+
+        Returns:
+            (距离值, 匹配的键, 匹配层级)，未找到时为 (None, None, 'miss')
+        """
+        from_norm = normalize_store_name(from_store)
+        to_norm = normalize_store_name(to_store)
+
+        if not from_norm or not to_norm:
+            return None, None, TIER_MISS
+
+        # 精确匹配：原始名称及其半角/全角括号变体
+        for pair in exact_name_variants(from_store, to_store):
+            row = self._exact_row(*pair)
+            if row is not None:
+                return self._hit(row, TIER_EXACT)
+
+        from_id = self._norm_names.get_id(from_norm)
+        to_id = self._norm_names.get_id(to_norm)
+        if from_id is not None and to_id is not None:
+            row = self._normalized.get(pack_pair(from_id, to_id))
+            if row is not None:
+                return self._hit(row, TIER_NORMALIZED)
+
+        from_id = self._agg_names.get_id(normalize_store_name(from_store, aggressive=True))
+        to_id = self._agg_names.get_id(normalize_store_name(to_store, aggressive=True))
+        if from_id is not None and to_id is not None:
+            row = self._aggressive.get(pack_pair(from_id, to_id))
+            if row is not None:
+                return self._hit(row, TIER_AGGRESSIVE)
+
+        return None, None, TIER_MISS
+
+    def resolve_segments(self, pairs):
+        """
+        批量查找路段距离，重复的 (起点, 终点) 只查询一次
+
+        Args:
+            pairs: 可迭代的 (起点, 终点) 元组
+
+        Returns:
+            {(起点, 终点): (距离值, 匹配的键, 匹配层级), ...}
+        """
+        resolved = {}
+        for pair in pairs:
+            if pair not in resolved:
+                resolved[pair] = self.lookup(pair[0], pair[1])
+        return resolved
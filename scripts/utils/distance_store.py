@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+"""
+距离缓存存储后端
+- json: 每个区域一个 reusable_distances.json（原有格式）
+- journal: 以 reusable_distances.json 为快照，每次更新只向变更日志追加行，定期压缩回快照
+- sqlite: 所有区域共用一个 SQLite 数据库（WAL模式），按区域分区，
+  原始店名和标准化店名均建索引，合并更新在事务内完成
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from .cache_journal import (
+    OP_LARGE_DIFF, append_journal, journal_path_for, large_diff_entry, read_journal,
+    upsert_entry, write_json_atomic
+)
+from .cache_snapshot import load_snapshot_index, source_fingerprint
+from .common import CONFLICT_THRESHOLD, build_distance_index, get_region_config, load_distance_cache
+from .distance_index import exact_name_variants
+from .normalize import normalize_store_name
+from .segment_table import SegmentTable
+
+# SQLite 数据库默认路径（所有区域共用）
+DEFAULT_DB_FILE = 'data/cache/distances.sqlite3'
+
+# 存储后端
+BACKEND_JSON = 'json'
+BACKEND_SQLITE = 'sqlite'
+BACKEND_JOURNAL = 'journal'
+BACKENDS = (BACKEND_JSON, BACKEND_SQLITE, BACKEND_JOURNAL)
+
+# 日志超过该条数时自动压缩回快照
+JOURNAL_COMPACT_ENTRIES = 5000
+
+LARGE_DIFF_WARNING = '距离差异超过5km，已保留旧数据，请人工检查'
+
+
+def merge_segment_distances(table, new_distances, threshold=CONFLICT_THRESHOLD):
+    """
+    按冲突阈值把新距离合并进路段表
+
+    - 旧数据不存在：新增
+    - 差值不超过阈值：使用新数据（差值超过0.1km时记为冲突）
+    - 差值超过阈值：保留旧数据，记为大差异
+
+    Args:
+        table: SegmentTable（原地更新）
+        new_distances: {(起点ID, 终点ID): 距离}，ID来自 table.registry
+        threshold: 冲突阈值（km）
+
+    Returns:
+        {'conflicts': [...], 'large_differences': [...], 'new': 新增数, 'updated': 更新数,
+         'changed': [(起点ID, 终点ID, 距离), ...]}
+    """
+    registry = table.registry
+    conflicts = []
+    large_differences = []
+    changed = []
+    new_additions = 0
+    updates = 0
+
+    for (from_id, to_id), new_distance in new_distances.items():
+        segment_key = f"{registry.name(from_id)} -> {registry.name(to_id)}"
+        old_distance = table.get_by_ids(from_id, to_id)
+
+        if old_distance is not None:
+            diff = abs(new_distance - old_distance)
+
+            if diff <= threshold:
+                if diff > 0.1:
+                    conflicts.append({
+                        'segment': segment_key,
+                        'old_distance': old_distance,
+                        'new_distance': new_distance,
+                        'difference': diff
+                    })
+                table.set_by_ids(from_id, to_id, new_distance)
+                changed.append((from_id, to_id, new_distance))
+                updates += 1
+            else:
+                large_differences.append({
+                    'segment': segment_key,
+                    'old_distance': old_distance,
+                    'new_distance': new_distance,
+                    'difference': diff,
+                    'used_distance': old_distance
+                })
+        else:
+            table.set_by_ids(from_id, to_id, new_distance)
+            changed.append((from_id, to_id, new_distance))
+            new_additions += 1
+
+    return {
+        'conflicts': conflicts,
+        'large_differences': large_differences,
+        'new': new_additions,
+        'updated': updates,
+        'changed': changed
+    }
+
+
+def large_difference_records(large_differences, source_name):
+    """将大差异路段转换为 large_distance_differences.json 的记录格式"""
+    return [{
+        'segment': d['segment'],
+        'old_distance_km': d['old_distance'],
+        'new_distance_km': d['new_distance'],
+        'difference_km': round(d['difference'], 2),
+        'used_distance_km': d['used_distance'],
+        'source': source_name,
+        'warning': LARGE_DIFF_WARNING
+    } for d in large_differences]
+
+
+class JsonDistanceStore:
+    """
+    JSON文件存储：reusable_distances.json + large_distance_differences.json
+
+    读取时会重放变更日志（journal 后端写入的尚未压缩的部分）；
+    整体写回时先把日志合并进快照，保证两种后端可以交替使用。
+    """
+
+    backend = BACKEND_JSON
+
+    def __init__(self, cache_file, large_diff_file=None):
+        self.cache_file = cache_file
+        if large_diff_file is None:
+            large_diff_file = os.path.join(os.path.dirname(cache_file), 'large_distance_differences.json')
+        self.large_diff_file = large_diff_file
+        self.journal_file = journal_path_for(cache_file)
+
+    @property
+    def location(self):
+        return self.cache_file
+
+    @property
+    def large_diff_location(self):
+        return self.large_diff_file
+
+    def load(self):
+        """加载全部路段，返回 SegmentTable"""
+        return load_distance_cache(self.cache_file)
+
+    def load_index(self):
+        """加载只读查询索引（优先使用二进制快照，过期时自动重建）"""
+        return load_snapshot_index(self.cache_file)
+
+    def version(self):
+        """缓存版本：缓存文件和变更日志的大小、修改时间，任一写入都会改变"""
+        return '-'.join(str(v) for v in source_fingerprint(self.cache_file))
+
+    def save(self, table):
+        """整体写回缓存文件（存在变更日志时一并压缩）"""
+        large_diffs = self.load_large_differences() if os.path.exists(self.journal_file) else None
+        write_json_atomic(self.cache_file, table.to_dict() if isinstance(table, SegmentTable) else table)
+        if large_diffs is not None:
+            write_json_atomic(self.large_diff_file, large_diffs)
+            os.remove(self.journal_file)
+
+    def compact(self):
+        """
+        把变更日志合并进快照并删除日志
+
+        Returns:
+            合并的日志条数
+        """
+        entries = sum(1 for _ in read_journal(self.journal_file))
+        if os.path.exists(self.journal_file):
+            self.save(self.load())
+        return entries
+
+    def merge(self, table, new_distances, threshold=CONFLICT_THRESHOLD):
+        """合并新距离并写回缓存文件，返回 merge_segment_distances 的结果"""
+        result = merge_segment_distances(table, new_distances, threshold)
+        self.save(table)
+        return result
+
+    def load_large_differences(self):
+        try:
+            with open(self.large_diff_file, 'r', encoding='utf-8') as f:
+                large_diffs = json.load(f)
+        except FileNotFoundError:
+            large_diffs = []
+        for entry in read_journal(self.journal_file):
+            if entry.get('op') == OP_LARGE_DIFF:
+                large_diffs.append(entry['record'])
+        return large_diffs
+
+    def append_large_differences(self, records):
+        """追加大差异记录，返回记录总数"""
+        self.compact()
+        existing = self.load_large_differences()
+        existing.extend(records)
+        write_json_atomic(self.large_diff_file, existing)
+        return len(existing)
+
+    def close(self):
+        pass
+
+
+class JournalDistanceStore(JsonDistanceStore):
+    """
+    追加日志存储
+
+    快照文件与 json 后端相同；merge 只把发生变化的路段、append_large_differences
+    只把新的大差异记录各作为一行追加到 reusable_distances.journal.jsonl，
+    写入成本与本次变更量成正比。日志超过 compact_entries 条时自动压缩回快照。
+    """
+
+    backend = BACKEND_JOURNAL
+
+    def __init__(self, cache_file, large_diff_file=None, compact_entries=JOURNAL_COMPACT_ENTRIES):
+        super().__init__(cache_file, large_diff_file)
+        self.compact_entries = compact_entries
+        self._journal_entries = None
+        self._large_diff_count = None
+
+    def journal_entries(self):
+        """当前日志条数"""
+        if self._journal_entries is None:
+            self._journal_entries = sum(1 for _ in read_journal(self.journal_file))
+        return self._journal_entries
+
+    def _append(self, entries):
+        append_journal(self.journal_file, entries)
+        self._journal_entries = self.journal_entries() + len(entries)
+        if self._journal_entries >= self.compact_entries:
+            self.compact()
+
+    def compact(self):
+        entries = super().compact()
+        self._journal_entries = 0
+        return entries
+
+    def merge(self, table, new_distances, threshold=CONFLICT_THRESHOLD):
+        """合并新距离，只把变化的路段追加到日志"""
+        result = merge_segment_distances(table, new_distances, threshold)
+        names = table.registry.names
+        self._append([upsert_entry(names[from_id], names[to_id], distance)
+                      for from_id, to_id, distance in result['changed']])
+        return result
+
+    def large_difference_count(self):
+        """大差异记录总数（首次调用时统计，之后随追加累加；压缩不改变总数）"""
+        if self._large_diff_count is None:
+            self._large_diff_count = len(self.load_large_differences())
+        return self._large_diff_count
+
+    def append_large_differences(self, records):
+        """把大差异记录追加到日志，返回记录总数"""
+        total = self.large_difference_count() + len(records)
+        self._append([large_diff_entry(r) for r in records])
+        self._large_diff_count = total
+        return total
+
+    @property
+    def large_diff_location(self):
+        return f"{self.large_diff_file} (+ {self.journal_file})"
+
+
+class SqliteDistanceStore:
+    """
+    SQLite存储
+
+    segments 表以 (region, from_store, to_store) 为主键，并对标准化店名 (region, from_norm, to_norm)
+    和激进标准化店名 (region, from_agg, to_agg) 建索引，lookup 按 DistanceIndex 的层级逐级走索引查询；
+    distance 列不声明类型，整数与浮点原样保存，导出JSON时数值类型不变；
+    按 rowid 排序即为首次写入顺序，与JSON文件中的键顺序一致。
+    revisions 表记录每个区域的修订号，每个修改路段的写事务内加1，作为缓存版本。
+    """
+
+    backend = BACKEND_SQLITE
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS segments (
+            region TEXT NOT NULL,
+            from_store TEXT NOT NULL,
+            to_store TEXT NOT NULL,
+            from_norm TEXT,
+            to_norm TEXT,
+            from_agg TEXT,
+            to_agg TEXT,
+            distance NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (region, from_store, to_store)
+        );
+        CREATE INDEX IF NOT EXISTS idx_segments_norm ON segments (region, from_norm, to_norm);
+        CREATE TABLE IF NOT EXISTS large_differences (
+            region TEXT NOT NULL,
+            segment TEXT NOT NULL,
+            old_distance_km,
+            new_distance_km,
+            difference_km,
+            used_distance_km,
+            source TEXT,
+            warning TEXT,
+            created_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_large_differences_region ON large_differences (region);
+        CREATE TABLE IF NOT EXISTS revisions (
+            region TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_file, region):
+        self.db_file = db_file
+        self.region = region
+        db_dir = os.path.dirname(db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # isolation_level=None: 由本类显式管理事务
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """早期版本的数据库没有激进标准化列：补充列并回填"""
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(segments)')}
+        if 'from_agg' not in columns:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.execute('ALTER TABLE segments ADD COLUMN from_agg TEXT')
+                self.conn.execute('ALTER TABLE segments ADD COLUMN to_agg TEXT')
+                rows = self.conn.execute('SELECT rowid, from_store, to_store FROM segments').fetchall()
+                self.conn.executemany(
+                    'UPDATE segments SET from_agg = ?, to_agg = ? WHERE rowid = ?',
+                    [(normalize_store_name(from_store, aggressive=True),
+                      normalize_store_name(to_store, aggressive=True), rowid)
+                     for rowid, from_store, to_store in rows])
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_segments_agg ON segments (region, from_agg, to_agg)')
+
+    @property
+    def location(self):
+        return f"{self.db_file} [{self.region}]"
+
+    @property
+    def large_diff_location(self):
+        return f"{self.db_file} [{self.region}] large_differences"
+
+    def load(self):
+        """加载本区域全部路段，返回 SegmentTable"""
+        table = SegmentTable()
+        rows = self.conn.execute(
+            'SELECT from_store, to_store, distance FROM segments WHERE region = ? ORDER BY rowid',
+            (self.region,))
+        registry = table.registry
+        for from_store, to_store, distance in rows:
+            table.set_by_ids(registry.intern(from_store), registry.intern(to_store), distance)
+        return table
+
+    def load_index(self):
+        """加载本区域全部路段并构建查询索引"""
+        return build_distance_index(self.load())
+
+    def version(self):
+        """
+        缓存版本：本区域修订号（每次写入路段时加1）及其创建时间
+
+        创建时间用于区分删除后重建的数据库，修订号从头计数时版本也不会与之前的相同。
+        """
+        row = self.conn.execute(
+            'SELECT revision, created_at FROM revisions WHERE region = ?', (self.region,)).fetchone()
+        if row is None:
+            return '0'
+        return f"{row[1]}-{row[0]}"
+
+    def _bump_revision(self):
+        """在当前写事务内把本区域修订号加1"""
+        self.conn.execute(
+            'INSERT INTO revisions (region, revision, created_at) VALUES (?, 1, ?) '
+            'ON CONFLICT (region) DO UPDATE SET revision = revision + 1',
+            (self.region, datetime.now().isoformat(timespec='microseconds')))
+
+    def _lookup_row(self, columns, from_value, to_value):
+        """按 (起点列, 终点列) 查询最先写入的一条路段"""
+        from_column, to_column = columns
+        return self.conn.execute(
+            f'SELECT from_store, to_store, distance FROM segments '
+            f'WHERE region = ? AND {from_column} = ? AND {to_column} = ? ORDER BY rowid LIMIT 1',
+            (self.region, from_value, to_value)).fetchone()
+
+    def lookup(self, from_store, to_store):
+        """
+        走索引查询单个路段，匹配层级与 DistanceIndex.lookup 相同：
+        精确（原始名称及括号变体，主键）、标准化（idx_segments_norm）、激进标准化（idx_segments_agg），
+        同一标准化键有多条记录时取最先写入的一条
+
+        Returns:
+            (距离值, 匹配的键) 或 (None, None)
+        """
+        from_norm = normalize_store_name(from_store)
+        to_norm = normalize_store_name(to_store)
+        if not from_norm or not to_norm:
+            return None, None
+
+        row = None
+        for from_name, to_name in exact_name_variants(from_store, to_store):
+            row = self._lookup_row(('from_store', 'to_store'), from_name, to_name)
+            if row is not None:
+                break
+        if row is None:
+            row = self._lookup_row(('from_norm', 'to_norm'), from_norm, to_norm)
+        if row is None:
+            from_agg = normalize_store_name(from_store, aggressive=True)
+            to_agg = normalize_store_name(to_store, aggressive=True)
+            if from_agg and to_agg:
+                row = self._lookup_row(('from_agg', 'to_agg'), from_agg, to_agg)
+        if row is None:
+            return None, None
+        return row[2], f"{row[0]} -> {row[1]}"
+
+    def _upsert(self, from_store, to_store, distance, now):
+        self.conn.execute(
+            'INSERT INTO segments (region, from_store, to_store, from_norm, to_norm, from_agg, to_agg, '
+            'distance, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (region, from_store, to_store) '
+            'DO UPDATE SET distance = excluded.distance, updated_at = excluded.updated_at',
+            (self.region, from_store, to_store,
+             normalize_store_name(from_store), normalize_store_name(to_store),
+             normalize_store_name(from_store, aggressive=True), normalize_store_name(to_store, aggressive=True),
+             distance, now))
+
+    def save(self, table):
+        """用路段表整体替换本区域数据"""
+        now = datetime.now().isoformat(timespec='seconds')
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute('DELETE FROM segments WHERE region = ?', (self.region,))
+            names = table.registry.names
+            for row in range(len(table)):
+                from_id, to_id = table.pair_at(row)
+                self._upsert(names[from_id], names[to_id], table.distance_at(row), now)
+            self._bump_revision()
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def merge(self, table, new_distances, threshold=CONFLICT_THRESHOLD):
+        """
+        在一个写事务内合并新距离
+
+        先按数据库中的当前值刷新涉及的路段（其他进程可能已更新），
+        再按冲突阈值合并，只写入发生变化的路段。
+        """
+        registry = table.registry
+        now = datetime.now().isoformat(timespec='seconds')
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            for from_id, to_id in new_distances:
+                row = self.conn.execute(
+                    'SELECT distance FROM segments WHERE region = ? AND from_store = ? AND to_store = ?',
+                    (self.region, registry.name(from_id), registry.name(to_id))).fetchone()
+                if row is not None:
+                    table.set_by_ids(from_id, to_id, row[0])
+
+            result = merge_segment_distances(table, new_distances, threshold)
+            for from_id, to_id, distance in result['changed']:
+                self._upsert(registry.name(from_id), registry.name(to_id), distance, now)
+            if result['changed']:
+                self._bump_revision()
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def load_large_differences(self):
+        rows = self.conn.execute(
+            'SELECT segment, old_distance_km, new_distance_km, difference_km, used_distance_km, '
+            'source, warning FROM large_differences WHERE region = ? ORDER BY rowid',
+            (self.region,))
+        keys = ('segment', 'old_distance_km', 'new_distance_km', 'difference_km',
+                'used_distance_km', 'source', 'warning')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def append_large_differences(self, records):
+        """追加大差异记录，返回本区域记录总数"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO large_differences (region, segment, old_distance_km, new_distance_km, '
+                'difference_km, used_distance_km, source, warning, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(self.region, r['segment'], r['old_distance_km'], r['new_distance_km'],
+                  r['difference_km'], r['used_distance_km'], r.get('source'), r.get('warning'), now)
+                 for r in records])
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM large_differences WHERE region = ?', (self.region,)).fetchone()[0]
+
+    def import_json(self, cache_file, large_diff_file=None):
+        """
+        从JSON缓存导入本区域数据（覆盖本区域现有路段和大差异记录）
+
+        Returns:
+            (导入路段数, 导入大差异记录数)
+        """
+        source = JsonDistanceStore(cache_file, large_diff_file)
+        table = source.load()
+        large_diffs = source.load_large_differences()
+        self.save(table)
+        with self.conn:
+            self.conn.execute('DELETE FROM large_differences WHERE region = ?', (self.region,))
+        if large_diffs:
+            self.append_large_differences(large_diffs)
+        return len(table), len(large_diffs)
+
+    def export_json(self, cache_file, large_diff_file=None):
+        """
+        把本区域数据导出为JSON缓存格式
+
+        Returns:
+            (导出路段数, 导出大差异记录数)
+        """
+        target = JsonDistanceStore(cache_file, large_diff_file)
+        table = self.load()
+        large_diffs = self.load_large_differences()
+        target.save(table)
+        write_json_atomic(target.large_diff_file, large_diffs)
+        return len(table), len(large_diffs)
+
+    def close(self):
+        self.conn.close()
+
+
+def open_distance_store(region, backend=BACKEND_JSON, path=None):
+    """
+    打开区域的距离存储
+
+    Args:
+        region: 区域
+        backend: 'json'、'journal' 或 'sqlite'
+        path: json/journal 后端为缓存文件路径，sqlite 后端为数据库路径（可选，默认按区域配置）
+    """
+    if backend in (BACKEND_JSON, BACKEND_JOURNAL):
+        if path is None:
+            path = os.path.join(get_region_config(region)['cache_dir'], 'reusable_distances.json')
+        if backend == BACKEND_JOURNAL:
+            return JournalDistanceStore(path)
+        return JsonDistanceStore(path)
+    if backend == BACKEND_SQLITE:
+        return SqliteDistanceStore(path or DEFAULT_DB_FILE, region)
+    raise ValueError(f"未知存储后端: {backend}, 支持: {list(BACKENDS)}")
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+对账单填充状态索引
+每本对账单记录各行站点列表的指纹，以及填充该行时距离缓存的版本。
+再次填充同一本对账单时，只重新处理站点有变化、或含 "?km" 且缓存在此之后有更新的行。
+
+状态文件保存在 data/cache/fill_state 下，文件名为对账单绝对路径的哈希。
+以指纹而不是行号为键，插入或删除行不会使已有记录失效。
+"""
+
+import hashlib
+import json
+import os
+
+FILL_STATE_DIR = os.path.join('data', 'cache', 'fill_state')
+FILL_STATE_VERSION = 1
+
+
+def stops_fingerprint(stops):
+    """站点名称列表的指纹（不含距离）"""
+    return hashlib.blake2b('\n'.join(stops).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class FillState:
+    """
+    一本对账单的填充状态
+
+    rows: {站点指纹: 填充时的缓存版本}；本次运行中 record() 过的指纹才会被保存，
+    对账单中已不存在的行随之清除。
+    """
+
+    def __init__(self, workbook_path, state_dir=FILL_STATE_DIR):
+        """
+        Args:
+            workbook_path: 对账单路径（读取该对账单上次保存的状态）
+            state_dir: 状态文件目录
+        """
+        self.state_dir = state_dir
+        self.rows = {}
+        self._seen = {}
+        try:
+            with open(self.state_file(workbook_path), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == FILL_STATE_VERSION:
+                self.rows = data['rows']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    def state_file(self, workbook_path):
+        key = hashlib.blake2b(os.path.abspath(workbook_path).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.state_dir, f"{key}.json")
+
+    def cache_version(self, fingerprint):
+        """返回该站点列表上次填充时的缓存版本，没有记录时返回None"""
+        return self.rows.get(fingerprint)
+
+    def record(self, fingerprint, cache_version):
+        """记录一行在 cache_version 下已处理"""
+        self._seen[fingerprint] = cache_version
+
+    def save(self, workbook_path):
+        """
+        保存本次运行记录的状态
+
+        Args:
+            workbook_path: 保存后的对账单路径（输出文件）
+        """
+        os.makedirs(self.state_dir, exist_ok=True)
+        _write_atomic(self.state_file(workbook_path), {
+            'version': FILL_STATE_VERSION,
+            'workbook': os.path.abspath(workbook_path),
+            'rows': self._seen
+        })
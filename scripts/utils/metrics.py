@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标采集
+记录各处理阶段的耗时、调用次数以及计数器（如路段查询的匹配层级），
+命令行加 --metrics json 时在运行结束后输出，用于逐月对比性能变化
+
+用法:
+    with stage('load_workbook'):
+        wb = load_workbook(path)
+
+    @timed('resolve_segments')
+    def resolve(...): ...
+
+    count('tier.exact', 3)
+"""
+
+import functools
+import json
+import sys
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from .distance_index import TIER_AGGRESSIVE, TIER_EXACT, TIER_MISS, TIER_NORMALIZED
+
+METRICS_FORMATS = ('json',)
+
+# 路段查询匹配层级计数器前缀
+TIER_COUNTER_PREFIX = 'tier.'
+
+
+class Metrics:
+    """
+    指标采集器
+
+    阶段可以嵌套，嵌套阶段以 "外层/内层" 命名；同名阶段多次进入时累加耗时和次数。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, command=None):
+        """清空已采集的指标，开始新的一次运行"""
+        self.command = command
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._start = time.perf_counter()
+        self._stack = []
+        self.stages = OrderedDict()
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name):
+        """计时一个处理阶段"""
+        self._stack.append(name)
+        path = '/'.join(self._stack)
+        entry = self.stages.setdefault(path, {'calls': 0, 'seconds': 0.0})
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] += time.perf_counter() - start
+            entry['calls'] += 1
+            self._stack.pop()
+
+    def timed(self, name=None):
+        """装饰器：把函数的每次调用计为一个阶段，默认以函数名命名"""
+        def decorator(func):
+            stage_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        """累加计数器"""
+        self.counters[name] += n
+
+    def count_tiers(self, tier_counts):
+        """
+        累加路段查询匹配层级计数
+
+        Args:
+            tier_counts: {'exact': n, 'normalized': n, 'aggressive': n, 'miss': n}
+        """
+        for tier in (TIER_EXACT, TIER_NORMALIZED, TIER_AGGRESSIVE, TIER_MISS):
+            self.counters[TIER_COUNTER_PREFIX + tier] += tier_counts.get(tier, 0)
+
+    def to_dict(self):
+        return {
+            'command': self.command,
+            'started_at': self.started_at,
+            'total_seconds': round(time.perf_counter() - self._start, 6),
+            'stages': {name: {'calls': e['calls'], 'seconds': round(e['seconds'], 6)}
+                       for name, e in self.stages.items()},
+            'counters': dict(self.counters)
+        }
+
+    def dump(self, fmt='json', output=None):
+        """
+        输出指标
+
+        Args:
+            fmt: 输出格式（目前仅 'json'）
+            output: 输出文件路径（可选，默认写到标准错误，不与标准输出中的进度信息混在一起）
+        """
+        if fmt not in METRICS_FORMATS:
+            raise ValueError(f"未知指标格式: {fmt}, 支持: {list(METRICS_FORMATS)}")
+        text = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+        else:
+            sys.stderr.write(text + '\n')
+
+
+# 进程级默认采集器
+METRICS = Metrics()
+stage = METRICS.stage
+timed = METRICS.timed
+count = METRICS.count
+count_tiers = METRICS.count_tiers
+
+
+def add_metrics_arguments(parser):
+    """给命令行添加 --metrics / --metrics-output 参数"""
+    parser.add_argument('--metrics', choices=METRICS_FORMATS,
+                        help='运行结束后输出各阶段耗时和计数器（json）')
+    parser.add_argument('--metrics-output',
+                        help='指标输出文件路径（可选，默认写到标准错误，如 2> metrics.json）')
+
+
+def dump_metrics(args):
+    """按命令行参数输出指标（未指定 --metrics 时不输出）"""
+    if args.metrics:
+        METRICS.dump(args.metrics, args.metrics_output)
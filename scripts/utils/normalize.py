@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+店名标准化
+正则预编译，括号/连字符统一通过一次 str.translate 完成，
+结果按 (店名, 是否激进) 做有界LRU缓存，并提供命中/未命中统计
+"""
+
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# 标准化结果缓存上限（条）
+NORMALIZE_CACHE_SIZE = 16384
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_GONGCHENG_RE = re.compile(r'共橙[-\s]*站式')
+
+# 统一括号格式
+_BRACKET_TABLE = str.maketrans({'（': '(', '）': ')'})
+# 激进模式：括号之外再统一连字符
+_AGGRESSIVE_TABLE = str.maketrans({'（': '(', '）': ')', '—': '-', '－': '-'})
+
+# 激进模式下的固定替换（按顺序执行）
+_AGGRESSIVE_REPLACEMENTS = (
+    # 处理"共橙超市"和"供橙超市"
+    ('供橙超市', '共橙超市'),
+    ('供橙一站式超市', '共橙一站式超市'),
+)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_cached(name, aggressive):
+    name = name.strip()
+    if not name:
+        return None
+
+    if aggressive:
+        name = name.translate(_AGGRESSIVE_TABLE)
+        # 移除多余空格
+        name = _WHITESPACE_RE.sub('', name)
+        # 处理"历臣"和"厉臣"的混用
+        name = name.replace('历臣', '厉臣')
+        # 处理"共橙一站式"和"共橙-站式"的混用
+        name = _GONGCHENG_RE.sub('共橙一站式', name)
+        for old, new in _AGGRESSIVE_REPLACEMENTS:
+            name = name.replace(old, new)
+    else:
+        name = name.translate(_BRACKET_TABLE)
+        name = _WHITESPACE_RE.sub('', name)
+
+    return name
+
+
+def normalize_store_name(name, aggressive=False):
+    """
+    标准化店名，处理常见的格式差异
+
+    Args:
+        name: 店名
+        aggressive: 是否使用激进模式（处理更多变体）
+
+    Returns:
+        标准化后的店名，或None如果输入无效
+    """
+    if name is None or pd.isna(name):
+        return None
+    return _normalize_cached(str(name), bool(aggressive))
+
+
+def normalize_cache_info():
+    """
+    返回标准化缓存统计
+
+    Returns:
+        {'hits': ..., 'misses': ..., 'size': ..., 'maxsize': ...}
+    """
+    info = _normalize_cached.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+    }
+
+
+def clear_normalize_cache():
+    """清空标准化缓存及统计"""
+    _normalize_cached.cache_clear()
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+工作簿解析结果缓存
+历史对账单会被反复解析（重建缓存、分析等），解析结果按文件内容哈希缓存到
+data/cache/parse 下，以列式结构压缩存储；文件大小和修改时间未变时直接复用已知哈希，
+不必重新读取文件内容。缓存总大小超过预算时按最近使用时间淘汰旧条目。
+"""
+
+import hashlib
+import json
+import os
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from time import sleep
+
+from .route_model import RouteBatch
+
+PARSE_CACHE_DIR = os.path.join('data', 'cache', 'parse')
+PARSE_CACHE_BUDGET = 64 * 1024 * 1024
+PARSE_CACHE_VERSION = 1
+
+_INDEX_FILE = 'index.json'
+_ENTRY_SUFFIX = '.cols.z'
+_LOCK_SUFFIX = '.lock'
+# 超过该秒数的锁视为崩溃进程遗留
+_LOCK_STALE_SECONDS = 30
+
+
+class _Uncacheable(Exception):
+    """单元格值无法序列化（如公式对象），该文件不缓存"""
+
+
+def _encode_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, time):
+        return {'$t': value.isoformat()}
+    raise _Uncacheable(type(value).__name__)
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$d' in value:
+            return date.fromisoformat(value['$d'])
+        if '$t' in value:
+            return time.fromisoformat(value['$t'])
+    return value
+
+
+def _intern_strings(groups):
+    """把嵌套字符串列表转为 (字符串表, 偏移列, ID列)"""
+    table = {}
+    offsets = [0]
+    ids = []
+    for group in groups:
+        for s in group:
+            ids.append(table.setdefault(s, len(table)))
+        offsets.append(len(ids))
+    return list(table), offsets, ids
+
+
+def _expand_strings(strings, offsets, ids):
+    return [[strings[i] for i in ids[offsets[n]:offsets[n + 1]]] for n in range(len(offsets) - 1)]
+
+
+def encode_routes(routes):
+    """RouteBatch（或 Route 列表） -> 列式结构"""
+    if not isinstance(routes, RouteBatch):
+        routes = RouteBatch.from_routes(routes)
+    return {
+        'vehicle_no': [_encode_value(v) for v in routes.vehicle_nos],
+        'date': [_encode_value(d) for d in routes.dates],
+        'strings': list(routes.registry.names),
+        'offsets': list(routes.offsets),
+        'shop_ids': list(routes.shop_ids),
+        'distances': [None if d != d else d for d in routes.distances]
+    }
+
+
+def decode_routes(columns):
+    """列式结构 -> RouteBatch（直接使用缓存中的列，不逐条创建路线）"""
+    return RouteBatch.from_columns(
+        [_decode_value(v) for v in columns['vehicle_no']],
+        [_decode_value(d) for d in columns['date']],
+        columns['strings'], columns['offsets'], columns['shop_ids'], columns['distances'])
+
+
+def encode_vehicles(vehicles):
+    """车辆店名列表 -> 列式结构"""
+    strings, offsets, ids = _intern_strings(vehicles)
+    return {'strings': strings, 'offsets': offsets, 'ids': ids}
+
+
+def decode_vehicles(columns):
+    """列式结构 -> 车辆店名列表"""
+    return _expand_strings(columns['strings'], columns['offsets'], columns['ids'])
+
+
+def file_digest(path):
+    """文件内容哈希"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ParseCache:
+    """
+    解析结果缓存
+
+    index.json 记录 文件绝对路径 -> (大小, 修改时间, 内容哈希)；
+    条目文件名为 "内容哈希.解析类型.cols.z"，内容为 zlib 压缩的列式JSON。
+    相同内容的文件（如复制、改名）共用同一条目。
+    """
+
+    def __init__(self, cache_dir=PARSE_CACHE_DIR, budget_bytes=PARSE_CACHE_BUDGET, enabled=True):
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_bytes
+        self.enabled = enabled
+        self._index = None
+
+    @property
+    def index_file(self):
+        return os.path.join(self.cache_dir, _INDEX_FILE)
+
+    def _read_index_file(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = self._read_index_file()
+        return self._index
+
+    @contextmanager
+    def _index_lock(self):
+        """
+        index.json 的跨进程写锁（以创建目录为锁，各平台都是原子操作）
+
+        并行的工作进程（extract_stores/rebuild_cache/build 的 --jobs）共用同一个解析缓存，
+        读取-合并-替换 index.json 期间持有该锁，其他进程写入的记录不会被覆盖。
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        lock_path = self.index_file + _LOCK_SUFFIX
+        while True:
+            try:
+                os.mkdir(lock_path)
+                break
+            except FileExistsError:
+                try:
+                    if os.stat(lock_path).st_mtime < datetime.now().timestamp() - _LOCK_STALE_SECONDS:
+                        os.rmdir(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                sleep(0.005)
+        try:
+            yield
+        finally:
+            os.rmdir(lock_path)
+
+    def _save_index(self, updates=None, removed=()):
+        """
+        把本进程的修改合并进磁盘上当前的 index.json 再原子替换（调用方需持有 _index_lock）
+
+        Args:
+            updates: 新增或更新的记录 {文件绝对路径: [大小, 修改时间, 内容哈希]}
+            removed: 删除的文件路径
+        """
+        index = self._read_index_file()
+        index.update(updates or {})
+        for key in removed:
+            index.pop(key, None)
+        self._index = index
+        _write_atomic(self.index_file, json.dumps(index, ensure_ascii=False).encode('utf-8'))
+
+    def _record_digest(self, record):
+        if record is not None:
+            with self._index_lock():
+                self._save_index(dict([record]))
+
+    def _digest(self, path):
+        """
+        返回文件内容哈希；大小和修改时间与索引一致时不重新读取文件
+
+        Returns:
+            (内容哈希, 待记录的索引条目)，后者在条目文件写入后才记入 index.json
+            （否则并行进程淘汰时会把还没有条目文件的记录当作失效删除）；已知哈希时为None
+        """
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        index = self._load_index()
+        known = index.get(key)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2], None
+        digest = file_digest(path)
+        return digest, (key, [st.st_size, st.st_mtime_ns, digest])
+
+    def _entry_path(self, digest, kind):
+        return os.path.join(self.cache_dir, f"{digest}.{kind}{_ENTRY_SUFFIX}")
+
+    def get_or_parse(self, path, kind, parse, encode, decode):
+        """
+        读取缓存的解析结果，未命中时解析并写入缓存
+
+        Args:
+            path: 源文件路径
+            kind: 解析类型（同一文件的不同解析方式分别缓存，如 'routes'、'stores-c4'）
+            parse: 无参函数，返回解析结果
+            encode: 解析结果 -> 列式结构
+            decode: 列式结构 -> 解析结果
+
+        Returns:
+            解析结果
+        """
+        if not self.enabled:
+            return parse()
+
+        digest, record = self._digest(path)
+        entry_path = self._entry_path(digest, kind)
+        try:
+            with open(entry_path, 'rb') as f:
+                payload = json.loads(zlib.decompress(f.read()))
+            if payload.get('version') == PARSE_CACHE_VERSION:
+                os.utime(entry_path)
+                self._record_digest(record)
+                return decode(payload['columns'])
+        except (FileNotFoundError, zlib.error, json.JSONDecodeError, KeyError):
+            pass
+
+        result = parse()
+        try:
+            columns = encode(result)
+        except _Uncacheable:
+            return result
+        payload = {'version': PARSE_CACHE_VERSION, 'columns': columns}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _write_atomic(entry_path, zlib.compress(json.dumps(payload, ensure_ascii=False).encode('utf-8')))
+        self._record_digest(record)
+        self.evict()
+        return result
+
+    def evict(self):
+        """
+        按最近使用时间淘汰条目，直到总大小不超过预算；
+        同时从 index.json 中删除源文件已不存在、或内容哈希已没有任何条目的记录
+
+        Returns:
+            删除的条目数
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(_ENTRY_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = set()
+        for _, size, path in sorted(entries):
+            if total <= self.budget_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed.add(path)
+
+        with self._index_lock():
+            # 持锁后重新列出条目：其他进程先写条目文件再记录索引，索引中的记录都能找到其条目
+            live_digests = {name.split('.', 1)[0] for name in os.listdir(self.cache_dir)
+                            if name.endswith(_ENTRY_SUFFIX)}
+            index = self._read_index_file()
+            stale = [key for key, (_, _, digest) in index.items()
+                     if digest not in live_digests or not os.path.exists(key)]
+            if stale:
+                self._save_index(removed=stale)
+        return len(removed)
+
+
+# 进程级默认缓存
+PARSE_CACHE = ParseCache()
+
+
+def configure_parse_cache(cache_dir=None, budget_bytes=None, enabled=None):
+    """修改默认解析缓存的位置、大小预算或开关"""
+    if cache_dir is not None:
+        PARSE_CACHE.cache_dir = cache_dir
+        PARSE_CACHE._index = None
+    if budget_bytes is not None:
+        PARSE_CACHE.budget_bytes = budget_bytes
+    if enabled is not None:
+        PARSE_CACHE.enabled = enabled
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+路线数据模型
+路线、路段、站点查询结果使用不可变的轻量记录（namedtuple，无实例字典），
+一个月的路线用 RouteBatch 按列存储：店名驻留为整数ID，站点和距离放在并列的平铺数组中，
+按偏移量切分到各条路线
+"""
+
+import math
+from array import array
+from collections import namedtuple
+
+from .segment_table import StoreRegistry
+
+# 一条路线：车次序号、日期、站点列表、各站点的已知距离（无距离为None）
+Route = namedtuple('Route', ['vehicle_no', 'date', 'shops', 'distances'])
+
+# 一个路段：起点、终点、距离（无距离为None）
+Segment = namedtuple('Segment', ['from_store', 'to_store', 'distance'])
+
+
+class StopResult(namedtuple('StopResult', ['stop', 'from_store', 'to_store', 'distance', 'key', 'tier'])):
+    """站点距离查询结果：站点、路段起终点、距离、匹配的缓存键、匹配层级"""
+
+    __slots__ = ()
+
+    @property
+    def found(self):
+        return self.distance is not None
+
+
+def route_segments(shops, distances, start_point):
+    """
+    按"上一站 -> 下一站"规则生成路段
+
+    Args:
+        shops: 站点列表
+        distances: 各站点的距离（可短于站点列表，缺少的视为None）
+        start_point: 起点名称
+
+    Yields:
+        Segment
+    """
+    prev = start_point
+    for i, shop in enumerate(shops):
+        yield Segment(prev, shop, distances[i] if i < len(distances) else None)
+        prev = shop
+
+
+# 距离数组中用 NaN 表示没有距离
+_NO_DISTANCE = math.nan
+
+
+class RouteBatch:
+    """
+    列式路线集合
+
+    vehicle_nos / dates: 每条路线一个值
+    shop_ids / distances: 所有路线的站点店名ID和距离首尾相接平铺
+    offsets: 第 n 条路线的站点位于 [offsets[n], offsets[n + 1])
+    """
+
+    def __init__(self, registry=None):
+        """
+        Args:
+            registry: 店名驻留表（可选，多个批次可以共用一张表）
+        """
+        self.registry = registry if registry is not None else StoreRegistry()
+        self.vehicle_nos = []
+        self.dates = []
+        self.shop_ids = array('i')
+        self.distances = array('d')
+        self.offsets = array('I', [0])
+
+    @classmethod
+    def from_routes(cls, routes, registry=None):
+        """由 Route 可迭代对象构建"""
+        batch = cls(registry)
+        for route in routes:
+            batch.append(*route)
+        return batch
+
+    @classmethod
+    def from_columns(cls, vehicle_nos, dates, strings, offsets, shop_ids, distances):
+        """
+        由列式数据直接构建（解析缓存的存储格式），不逐条创建路线
+
+        Args:
+            vehicle_nos / dates: 每条路线一个值
+            strings: 店名表，shop_ids 为其下标
+            offsets: 路线偏移量
+            shop_ids: 平铺的店名下标
+            distances: 平铺的距离，无距离为None
+        """
+        batch = cls()
+        for name in strings:
+            batch.registry.intern(name)
+        batch.vehicle_nos = list(vehicle_nos)
+        batch.dates = list(dates)
+        batch.shop_ids = array('i', shop_ids)
+        batch.distances = array('d', [_NO_DISTANCE if d is None else d for d in distances])
+        batch.offsets = array('I', offsets)
+        return batch
+
+    def append(self, vehicle_no, date, shops, distances):
+        """追加一条路线"""
+        intern = self.registry.intern
+        self.vehicle_nos.append(vehicle_no)
+        self.dates.append(date)
+        for i, shop in enumerate(shops):
+            self.shop_ids.append(intern(shop))
+            distance = distances[i] if i < len(distances) else None
+            self.distances.append(_NO_DISTANCE if distance is None else distance)
+        self.offsets.append(len(self.shop_ids))
+
+    def __len__(self):
+        return len(self.vehicle_nos)
+
+    def _span(self, n):
+        return self.offsets[n], self.offsets[n + 1]
+
+    def shops(self, n):
+        """第 n 条路线的站点列表"""
+        start, end = self._span(n)
+        names = self.registry.names
+        return [names[i] for i in self.shop_ids[start:end]]
+
+    def route_distances(self, n):
+        """第 n 条路线各站点的距离列表（无距离为None）"""
+        start, end = self._span(n)
+        return [None if d != d else d for d in self.distances[start:end]]
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+        return Route(self.vehicle_nos[n], self.dates[n], self.shops(n), self.route_distances(n))
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def __eq__(self, other):
+        if isinstance(other, RouteBatch):
+            other = list(other)
+        return list(self) == other
+
+    def segments(self, start_point):
+        """
+        所有路线的路段
+
+        Args:
+            start_point: 起点名称
+
+        Yields:
+            Segment
+        """
+        names = self.registry.names
+        for n in range(len(self)):
+            start, end = self._span(n)
+            prev = start_point
+            for i in range(start, end):
+                shop = names[self.shop_ids[i]]
+                distance = self.distances[i]
+                yield Segment(prev, shop, None if distance != distance else distance)
+                prev = shop
+
+    def known_segment_ids(self, start_point):
+        """
+        有距离的路段，以店名ID表示（不创建字符串）
+
+        Args:
+            start_point: 起点名称
+
+        Returns:
+            (起点ID, 终点ID, 距离) 迭代器；起点会立即驻留到 registry 中
+        """
+        return self._iter_known_segments(self.registry.intern(start_point))
+
+    def _iter_known_segments(self, start_id):
+        shop_ids = self.shop_ids
+        distances = self.distances
+        for n in range(len(self)):
+            start, end = self._span(n)
+            prev = start_id
+            for i in range(start, end):
+                distance = distances[i]
+                if distance == distance:
+                    yield prev, shop_ids[i], distance
+                prev = shop_ids[i]
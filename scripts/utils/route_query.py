@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+路线距离查询
+按README约定的查询规则：按"上一站 -> 下一站"逐段查询，站点名称保持原样，
+输出 "地址名称-距离km" / "地址名称-?km"，并可列出每一段的查询键（查询逻辑）。
+
+WarmDistanceIndex 供常驻进程使用：距离索引只加载一次，缓存版本变化时自动重新加载。
+"""
+
+import threading
+import time
+
+from .common import build_route_results, format_distance, route_segment_pairs
+from .distance_store import BACKEND_JSON, open_distance_store
+
+# 匹配层级的说明（查询逻辑中标注非精确匹配）
+TIER_LABELS = {
+    'exact': '精确',
+    'normalized': '标准化',
+    'aggressive': '激进',
+    'miss': '未找到'
+}
+
+
+class WarmDistanceIndex:
+    """
+    常驻内存的距离索引
+
+    get() 时检查缓存版本（json 后端为缓存文件和变更日志的大小、修改时间），有变化才重新加载；
+    可以在多个线程中使用，重新加载期间其他线程继续使用旧索引。
+    """
+
+    def __init__(self, region, backend=BACKEND_JSON, cache_file=None, check_interval=0.0):
+        """
+        Args:
+            region: 区域 ('hefei' 或 'jiangxi')
+            backend: 距离存储后端
+            cache_file: 距离缓存文件/数据库路径（可选）
+            check_interval: 两次检查缓存版本的最小间隔秒数（0 表示每次都检查）
+        """
+        self.region = region
+        self.backend = backend
+        self.cache_file = cache_file
+        self.check_interval = check_interval
+        self.index = None
+        self.version = None
+        self.location = None
+        self.reloads = 0
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        store = open_distance_store(self.region, self.backend, self.cache_file)
+        try:
+            version = store.version()
+            if self.index is None or version != self.version:
+                if self.index is not None:
+                    self.reloads += 1
+                self.index = store.load_index()
+                self.version = version
+                self.location = store.location
+        finally:
+            store.close()
+
+    def get(self):
+        """
+        Returns:
+            (距离索引, 缓存版本)
+        """
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                    self._reload_if_changed()
+                    self._checked_at = now
+        return self.index, self.version
+
+
+def query_routes(index, routes, start_point):
+    """
+    批量查询多条路线，所有路线的路段去重后只查询一次
+
+    Args:
+        index: DistanceIndex 或 SnapshotIndex
+        routes: [[站点...], ...]
+        start_point: 起点名称
+
+    Returns:
+        每条路线的 StopResult 列表
+    """
+    resolved = index.resolve_segments(pair for stops in routes for pair in route_segment_pairs(stops, start_point))
+    return [build_route_results(stops, start_point, resolved) for stops in routes]
+
+
+def format_route_output(results):
+    """
+    输出结果：每行一个站点及其到达该站点的距离
+
+    Returns:
+        ["地址名称-距离km" 或 "地址名称-?km", ...]
+    """
+    return [f"{r.stop}-{format_distance(r.distance)}" for r in results]
+
+
+def format_query_logic(results):
+    """
+    查询逻辑：每一段的起止点、查询键和结果
+
+    Returns:
+        ['1. **起点 → 终点** - 查询键: "起点 -> 终点" - 9.1km ✓', ...]
+    """
+    lines = []
+    for i, r in enumerate(results, 1):
+        segment = f"{i}. **{r.from_store} → {r.to_store}**"
+        if r.found:
+            tier = '' if r.tier == 'exact' else f"（{TIER_LABELS[r.tier]}匹配）"
+            lines.append(f'{segment} - 查询键: "{r.key}"{tier} - {format_distance(r.distance)} ✓')
+        else:
+            lines.append(f'{segment} - 查询键: "{r.from_store} -> {r.to_store}" - 未找到 ✗')
+    return lines
+
+
+def route_result_dict(results):
+    """路线查询结果的JSON结构"""
+    return {
+        'output': '\n'.join(format_route_output(results)),
+        'found': sum(1 for r in results if r.found),
+        'missing': sum(1 for r in results if not r.found),
+        'segments': [
+            {'from': r.from_store, 'to': r.to_store, 'key': r.key, 'distance': r.distance, 'tier': r.tier}
+            for r in results
+        ]
+    }
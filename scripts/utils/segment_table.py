@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+店名驻留与紧凑路段表
+每个店名只保存一份并映射为小整数ID，路段以并列数组存储，
+按 (起点ID, 终点ID) 打包成的64位整数做哈希定位
+"""
+
+from array import array
+from collections.abc import MutableMapping
+
+SEGMENT_SEPARATOR = ' -> '
+
+
+def split_segment_key(segment_key):
+    """
+    拆分路段键
+
+    Args:
+        segment_key: 形如 "A -> B" 的路段键
+
+    Returns:
+        (起点, 终点) 元组，格式不合法时返回None
+    """
+    if SEGMENT_SEPARATOR not in segment_key:
+        return None
+    parts = segment_key.split(SEGMENT_SEPARATOR)
+    if len(parts) != 2:
+        return None
+    return parts[0], parts[1]
+
+
+def pack_pair(from_id, to_id):
+    """将 (起点ID, 终点ID) 打包为一个64位整数键"""
+    return (from_id << 32) | to_id
+
+
+class StoreRegistry:
+    """店名驻留表：店名 <-> 整数ID"""
+
+    def __init__(self):
+        self._ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def intern(self, name):
+        """返回店名的ID，不存在时分配新ID"""
+        store_id = self._ids.get(name)
+        if store_id is None:
+            store_id = len(self.names)
+            self._ids[name] = store_id
+            self.names.append(name)
+        return store_id
+
+    def get_id(self, name):
+        """返回店名的ID，不存在时返回None（不分配新ID）"""
+        return self._ids.get(name)
+
+    def name(self, store_id):
+        """返回ID对应的店名"""
+        return self.names[store_id]
+
+
+class SegmentTable(MutableMapping):
+    """
+    紧凑路段表
+
+    from/to 两列为 array('i') 店名ID，距离列为 array('d')。
+    另用一个字节列记录距离原本是否为整数，保证与JSON缓存往返时数值类型不变。
+    同时实现以 "A -> B" 字符串为键的字典接口，可直接替换原来的距离字典（只能新增和修改，不能删除）。
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else StoreRegistry()
+        self.from_ids = array('i')
+        self.to_ids = array('i')
+        self.values = array('d')
+        self._int_flags = bytearray()
+        self._rows = {}
+
+    @classmethod
+    def from_mapping(cls, distances, registry=None):
+        """
+        从距离字典构建路段表
+
+        Args:
+            distances: {"A -> B": 10.5, ...}
+            registry: 共享的店名驻留表（可选）
+        """
+        table = cls(registry)
+        for segment_key, distance in distances.items():
+            table[segment_key] = distance
+        return table
+
+    # ---- 基于ID的接口 ----
+
+    def row_of(self, from_id, to_id):
+        """返回路段所在行号，不存在时返回None"""
+        return self._rows.get(pack_pair(from_id, to_id))
+
+    def get_by_ids(self, from_id, to_id, default=None):
+        """按ID查询距离"""
+        row = self._rows.get(pack_pair(from_id, to_id))
+        if row is None:
+            return default
+        return self.distance_at(row)
+
+    def set_by_ids(self, from_id, to_id, distance):
+        """
+        按ID新增或更新路段
+
+        Returns:
+            路段所在行号
+        """
+        is_int = isinstance(distance, int) and not isinstance(distance, bool)
+        packed = pack_pair(from_id, to_id)
+        row = self._rows.get(packed)
+        if row is None:
+            row = len(self.values)
+            self._rows[packed] = row
+            self.from_ids.append(from_id)
+            self.to_ids.append(to_id)
+            self.values.append(distance)
+            self._int_flags.append(is_int)
+        else:
+            self.values[row] = distance
+            self._int_flags[row] = is_int
+        return row
+
+    def distance_at(self, row):
+        """返回指定行的距离，保持原始的整数/浮点类型"""
+        value = self.values[row]
+        if self._int_flags[row]:
+            return int(value)
+        return value
+
+    def pair_at(self, row):
+        """返回指定行的 (起点ID, 终点ID)"""
+        return self.from_ids[row], self.to_ids[row]
+
+    def key_at(self, row):
+        """返回指定行的路段键 "A -> B" """
+        names = self.registry.names
+        return f"{names[self.from_ids[row]]}{SEGMENT_SEPARATOR}{names[self.to_ids[row]]}"
+
+    def to_dict(self):
+        """转换为 {"A -> B": 距离} 字典（用于JSON导出）"""
+        return {self.key_at(row): self.distance_at(row) for row in range(len(self.values))}
+
+    # ---- 以路段键为键的字典接口 ----
+
+    def _pair_ids(self, segment_key):
+        pair = split_segment_key(segment_key)
+        if pair is None:
+            return None
+        from_id = self.registry.get_id(pair[0])
+        to_id = self.registry.get_id(pair[1])
+        if from_id is None or to_id is None:
+            return None
+        return from_id, to_id
+
+    def __getitem__(self, segment_key):
+        ids = self._pair_ids(segment_key)
+        row = self.row_of(*ids) if ids is not None else None
+        if row is None:
+            raise KeyError(segment_key)
+        return self.distance_at(row)
+
+    def __setitem__(self, segment_key, distance):
+        pair = split_segment_key(segment_key)
+        if pair is None:
+            raise ValueError(f"无效的路段键: {segment_key}")
+        from_id = self.registry.intern(pair[0])
+        to_id = self.registry.intern(pair[1])
+        self.set_by_ids(from_id, to_id, distance)
+
+    def __delitem__(self, segment_key):
+        # 行号被 DistanceIndex 和快照索引引用，行顺序也决定JSON导出的键顺序，不支持删除单个路段
+        raise TypeError("SegmentTable 不支持删除路段，请重新构建路段表")
+
+    def __contains__(self, segment_key):
+        ids = self._pair_ids(segment_key)
+        return ids is not None and self.row_of(*ids) is not None
+
+    def __iter__(self):
+        for row in range(len(self.values)):
+            yield self.key_at(row)
+
+    def __len__(self):
+        return len(self.values)
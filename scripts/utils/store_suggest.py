@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+店名模糊建议索引
+对缓存中的全部已知店名建立字符 n-gram 倒排索引，
+为找不到距离的店名（OCR/录入变体，如 历臣/厉臣、共橙-站式）给出最接近的已知店名
+"""
+
+from collections import defaultdict
+
+from .normalize import normalize_store_name
+
+# 默认 n-gram 长度
+DEFAULT_GRAM_SIZE = 2
+# 默认最大编辑距离
+DEFAULT_MAX_DISTANCE = 3
+
+
+def _grams(text, size):
+    """返回文本的 n-gram 集合，文本短于 n 时返回文本本身"""
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """
+    计算编辑距离（Levenshtein），超过上限时提前终止
+
+    Args:
+        a, b: 待比较的字符串
+        max_distance: 距离上限
+
+    Returns:
+        编辑距离，超过上限时返回 max_distance + 1
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1,
+                       current[j - 1] + 1,
+                       previous[j - 1] + (ca != cb))
+            current.append(cost)
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+class StoreNameIndex:
+    """
+    店名 n-gram 倒排索引
+
+    店名先做标准化再切分 n-gram。查询时按 q-gram 计数下界过滤：
+    每次编辑最多破坏 n 个 n-gram，编辑距离不超过 d 的候选至少包含查询的 |G| - d*n 个 n-gram，
+    并且只需从最稀有的若干个 n-gram 的倒排表中取候选（前缀过滤），
+    因此候选集远小于全部店名，最后再用有界编辑距离精确排序。
+    """
+
+    def __init__(self, names=(), gram_size=DEFAULT_GRAM_SIZE):
+        """
+        Args:
+            names: 已知店名
+            gram_size: n-gram 长度
+        """
+        self.gram_size = gram_size
+        self._keys = []
+        self._key_ids = {}
+        self._originals = []
+        self._key_grams = []
+        self._postings = defaultdict(list)
+
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        return normalize_store_name(name) in self._key_ids
+
+    def add(self, name):
+        """添加一个已知店名"""
+        key = normalize_store_name(name)
+        if not key:
+            return
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = len(self._keys)
+            self._key_ids[key] = key_id
+            self._keys.append(key)
+            self._originals.append([])
+            grams = _grams(key, self.gram_size)
+            self._key_grams.append(grams)
+            for gram in grams:
+                self._postings[gram].append(key_id)
+        if name not in self._originals[key_id]:
+            self._originals[key_id].append(name)
+
+    def suggest(self, name, k=3, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        查找与给定店名最接近的已知店名
+
+        Args:
+            name: 待查询店名
+            k: 返回的最大条数
+            max_distance: 最大编辑距离（基于标准化后的店名）
+
+        Returns:
+            [(已知店名, 编辑距离), ...]，按编辑距离升序
+        """
+        query = normalize_store_name(name)
+        if not query or not self._keys:
+            return []
+
+        query_grams = _grams(query, self.gram_size)
+        # 每次编辑最多破坏 n 个 gram，候选至少包含查询中 |G| - d*n 个不同 gram
+        min_shared = len(query_grams) - max_distance * self.gram_size
+
+        if min_shared <= 0:
+            candidates = range(len(self._keys))
+        else:
+            # 前缀过滤：满足下界的候选必出现在最稀有的 (|G| - T + 1) 个 gram 中
+            ordered = sorted(query_grams, key=lambda g: len(self._postings.get(g, ())))
+            prefix = ordered[:max(len(ordered) - min_shared + 1, 1)]
+            candidates = set()
+            for gram in prefix:
+                candidates.update(self._postings.get(gram, ()))
+
+        scored = []
+        for key_id in candidates:
+            key = self._keys[key_id]
+            # 长度过滤与 gram 计数过滤，通过后才计算编辑距离
+            if abs(len(key) - len(query)) > max_distance:
+                continue
+            if min_shared > 0 and len(query_grams & self._key_grams[key_id]) < min_shared:
+                continue
+            distance = bounded_edit_distance(query, key, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, key))
+
+        scored.sort()
+        suggestions = []
+        for distance, key in scored:
+            for original in self._originals[self._key_ids[key]]:
+                suggestions.append((original, distance))
+                if len(suggestions) >= k:
+                    return suggestions
+        return suggestions
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+流式只读工作簿读取
+以 openpyxl 只读模式逐行读取需要的几列（values_only），不构建单元格和样式对象，
+内存占用与工作簿行数无关；也可以切换为直接解析XML的 xml 后端（见 xlsx_xml）
+"""
+
+from collections import namedtuple
+
+from openpyxl import load_workbook
+
+from .xlsx_xml import iter_sheet_values_xml
+
+# 对账单一行：行号、车次序号（A列）、日期（B列）、店名/路线文本（C列）
+RouteRecord = namedtuple('RouteRecord', ['row', 'vehicle_no', 'date', 'route_text'])
+
+# 读取后端
+READER_OPENPYXL = 'openpyxl'
+READER_XML = 'xml'
+READERS = (READER_OPENPYXL, READER_XML)
+
+_default_reader = READER_OPENPYXL
+
+
+def set_default_reader(backend):
+    """设置未指定 backend 时使用的读取后端"""
+    global _default_reader
+    if backend not in READERS:
+        raise ValueError(f"未知读取后端: {backend}, 支持: {list(READERS)}")
+    _default_reader = backend
+
+
+def resolve_reader(backend=None):
+    """返回实际使用的读取后端"""
+    return backend or _default_reader
+
+
+def iter_sheet_values(file_path, max_col, min_col=1, min_row=2, backend=None):
+    """
+    逐行读取活动工作表中指定列的值
+
+    Args:
+        file_path: Excel文件路径
+        max_col: 读取到第几列
+        min_col: 从第几列开始（默认第1列）
+        min_row: 从第几行开始（默认第2行，跳过标题行）
+        backend: 读取后端 'openpyxl' 或 'xml'（可选，默认见 set_default_reader）
+
+    Yields:
+        (行号, (值, ...))，缺失的单元格为None
+    """
+    backend = resolve_reader(backend)
+    if backend == READER_XML:
+        yield from iter_sheet_values_xml(file_path, max_col, min_col, min_row)
+        return
+    if backend != READER_OPENPYXL:
+        raise ValueError(f"未知读取后端: {backend}, 支持: {list(READERS)}")
+
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        ws = wb.active
+        # 不信任文件里记录的尺寸，按实际存在的行读取
+        ws.reset_dimensions()
+        width = max_col - min_col + 1
+        for row_idx, values in enumerate(
+                ws.iter_rows(min_row=min_row, min_col=min_col, max_col=max_col, values_only=True),
+                start=min_row):
+            if len(values) < width:
+                values = values + (None,) * (width - len(values))
+            yield row_idx, values
+    finally:
+        wb.close()
+
+
+def iter_route_records(file_path, backend=None):
+    """
+    逐行读取对账单的车次记录（A-C列），遇到序号为空的行停止
+
+    Args:
+        file_path: 对账单Excel文件路径
+        backend: 读取后端（可选）
+
+    Yields:
+        RouteRecord
+    """
+    yield from route_records(iter_sheet_values(file_path, max_col=3, backend=backend))
+
+
+def route_records(rows):
+    """把 (行号, (A, B, C)) 序列转换为 RouteRecord，遇到序号为空的行停止"""
+    for row_idx, (vehicle_no, date_value, route_text) in rows:
+        if vehicle_no is None:
+            break
+        yield RouteRecord(row_idx, vehicle_no, date_value, route_text)
+
+
+def iter_column_values(file_path, column, backend=None):
+    """
+    逐行读取单列的值（从第2行开始）
+
+    Args:
+        file_path: Excel文件路径
+        column: 列号（从1开始）
+        backend: 读取后端（可选）
+
+    Yields:
+        单元格的值
+    """
+    for _, (value,) in iter_sheet_values(file_path, max_col=column, min_col=column, backend=backend):
+        yield value
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+工作簿会话
+一个进程内对同一个对账单只加载一次：填充、验证、报告共用同一份已解析的工作簿，
+最后只保存一次。
+两种写回方式：openpyxl 完整加载后整本保存；patch 只读入A-C列，保存时只改写修改过的单元格
+"""
+
+from openpyxl import load_workbook
+
+from .workbook_reader import iter_route_records, route_records
+from .xlsx_patch import PatchedSheet
+
+# 写回方式
+WRITER_OPENPYXL = 'openpyxl'
+WRITER_PATCH = 'patch'
+WRITERS = (WRITER_OPENPYXL, WRITER_PATCH)
+
+
+class WorkbookSession:
+    """
+    已加载的对账单工作簿
+
+    以完整模式加载（保留格式，可编辑），验证类步骤通过 iter_route_records()
+    读取内存中的当前内容，能看到填充步骤写入但尚未保存的修改。
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Excel文件路径
+        """
+        self.path = path
+        self.wb = load_workbook(path)
+        self.ws = self.wb.active
+
+    @property
+    def shape(self):
+        """(行数, 列数)"""
+        return self.ws.max_row, self.ws.max_column
+
+    def iter_route_records(self):
+        """逐行读取内存中的车次记录（A-C列），遇到序号为空的行停止"""
+        rows = enumerate(self.ws.iter_rows(min_row=2, max_col=3, values_only=True), start=2)
+        return route_records(rows)
+
+    def save(self, output=None):
+        """
+        保存工作簿
+
+        Args:
+            output: 输出路径（可选，默认覆盖原文件）
+        """
+        self.wb.save(output or self.path)
+
+    def close(self):
+        self.wb.close()
+
+
+class PatchSession:
+    """
+    补丁模式的对账单会话
+
+    只解析A-C列，填充写入的内容记录为单元格补丁，save() 时直接改写xlsx中对应的单元格，
+    其余内容原样保留；接口与 WorkbookSession 相同（ws 支持 max_row / cell()）。
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Excel文件路径
+        """
+        self.path = path
+        self.ws = PatchedSheet(path)
+
+    @property
+    def shape(self):
+        """(行数, 已读入的列数)"""
+        return self.ws.max_row, self.ws.max_column
+
+    def iter_route_records(self):
+        """逐行读取当前内容（含未保存的修改）的车次记录，遇到序号为空的行停止"""
+        return route_records(self.ws.iter_rows(min_row=2, max_col=3))
+
+    def save(self, output=None):
+        """
+        写回修改的单元格
+
+        Args:
+            output: 输出路径（可选，默认覆盖原文件）
+        """
+        self.ws.save(output or self.path)
+
+    def close(self):
+        pass
+
+
+def open_session(path, writer=WRITER_OPENPYXL):
+    """
+    按写回方式打开对账单会话
+
+    Args:
+        path: Excel文件路径
+        writer: 'openpyxl'（完整加载、整本保存）或 'patch'（只改写修改的单元格）
+
+    Returns:
+        WorkbookSession 或 PatchSession
+    """
+    if writer == WRITER_OPENPYXL:
+        return WorkbookSession(path)
+    if writer == WRITER_PATCH:
+        return PatchSession(path)
+    raise ValueError(f"未知写回方式: {writer}, 支持: {list(WRITERS)}")
+
+
+def open_route_records(source):
+    """
+    读取车次记录
+
+    Args:
+        source: Excel文件路径（流式只读），或 WorkbookSession/PatchSession（读取内存中的内容）
+
+    Returns:
+        RouteRecord 迭代器
+    """
+    if isinstance(source, (WorkbookSession, PatchSession)):
+        return source.iter_route_records()
+    return iter_route_records(source)
+
+
+def source_path(source):
+    """返回文件路径或会话对应的文件路径"""
+    return source.path if isinstance(source, (WorkbookSession, PatchSession)) else source
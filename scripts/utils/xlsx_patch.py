@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+xlsx单元格原地补丁
+只改写被修改的 <c> 元素，新文本追加到共享字符串表末尾，压缩包中其他成员原样复制；
+不经过 openpyxl 的完整加载和保存，openpyxl 不支持的内容（数据验证扩展、WPS自定义数据等）
+也不会丢失。
+
+不能安全补丁的单元格（含公式的单元格：改写需要同步 calcChain.xml；工作表中不存在的单元格）
+抛出 PatchUnsupported，由 PatchedSheet.save 改用 openpyxl 整本写回。
+"""
+
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import openpyxl
+from openpyxl.utils.cell import get_column_letter
+
+from .xlsx_xml import XlsxXmlReader
+
+_SHARED_STRINGS = 'xl/sharedStrings.xml'
+
+# 单元格元素不会嵌套，非贪婪匹配到第一个 </c> 即为该单元格的结尾；
+# 按元素本地名匹配，带命名空间前缀的工作表（<x:c>...</x:c>）也能识别，第1组为前缀（含冒号）
+_CELL_RE = re.compile(r'<((?:[\w.-]+:)?)c\b([^>]*?)(?:/>|>(.*?)</\1c>)', re.S)
+_ATTR_RE = re.compile(r'([\w:.-]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+_FORMULA_RE = re.compile(r'<(?:[\w.-]+:)?f\b')
+_SST_RE = re.compile(r'<((?:[\w.-]+:)?)sst\b[^>]*>')
+
+
+class PatchUnsupported(ValueError):
+    """修改的单元格无法安全地原地补丁"""
+
+
+def _attrs(text):
+    """单元格属性 {属性名: 带引号的原文}（保持原顺序，原样写回，不重新转义）"""
+    return dict(_ATTR_RE.findall(text))
+
+
+def _attr_value(attrs, name):
+    quoted = attrs.get(name)
+    return quoted[1:-1] if quoted is not None else None
+
+
+def _text_element(text, prefix=''):
+    return f'<{prefix}t xml:space="preserve">{escape(text)}</{prefix}t>'
+
+
+class _Patch:
+    """一次补丁的状态：待写单元格、新增共享字符串"""
+
+    def __init__(self, edits, shared_count):
+        # {"C12": 值}
+        self.edits = {f'{get_column_letter(col)}{row}': value for (row, col), value in edits.items()}
+        self.applied = set()
+        self.shared_count = shared_count
+        self.new_strings = {}
+        # 共享字符串引用数的增减，用于更新 sst 的 count
+        self.added_refs = 0
+        self.removed_refs = 0
+
+    def shared_index(self, text):
+        self.added_refs += 1
+        if text not in self.new_strings:
+            self.new_strings[text] = self.shared_count + len(self.new_strings)
+        return self.new_strings[text]
+
+    def cell_xml(self, ref, attrs, value, inline, prefix=''):
+        """
+        生成单元格XML
+
+        Args:
+            ref: 单元格引用
+            attrs: 原单元格的属性 _attrs()（除 t 外原样保留，如 s、cm、vm、ph）
+            value: 新值
+            inline: 字符串写为内联字符串（否则写入共享字符串表）
+            prefix: 命名空间前缀（含冒号）
+        """
+        kept = ''.join(f' {name}={quoted}' for name, quoted in attrs.items() if name != 't')
+        if value is None:
+            return f'<{prefix}c{kept}/>'
+        if isinstance(value, bool):
+            return f'<{prefix}c{kept} t="b"><{prefix}v>{int(value)}</{prefix}v></{prefix}c>'
+        if isinstance(value, (int, float)):
+            return f'<{prefix}c{kept}><{prefix}v>{value!r}</{prefix}v></{prefix}c>'
+        if isinstance(value, str):
+            if inline:
+                return (f'<{prefix}c{kept} t="inlineStr"><{prefix}is>{_text_element(value, prefix)}'
+                        f'</{prefix}is></{prefix}c>')
+            return f'<{prefix}c{kept} t="s"><{prefix}v>{self.shared_index(value)}</{prefix}v></{prefix}c>'
+        raise TypeError(f"不支持写入的单元格值类型: {type(value).__name__} ({ref})")
+
+    def replace_cell(self, match, inline):
+        prefix, attr_text, body = match.group(1), match.group(2), match.group(3)
+        attrs = _attrs(attr_text)
+        ref = _attr_value(attrs, 'r')
+        if ref not in self.edits:
+            return match.group(0)
+        if body and _FORMULA_RE.search(body):
+            # 去掉公式需要同时更新 xl/calcChain.xml，否则Excel打开时提示修复
+            raise PatchUnsupported(f"单元格 {ref} 含公式，无法补丁写入")
+        self.applied.add(ref)
+        if _attr_value(attrs, 't') == 's':
+            self.removed_refs += 1
+        return self.cell_xml(ref, attrs, self.edits[ref], inline, prefix)
+
+
+def _patch_sheet(xml, patch, inline):
+    """替换工作表XML中被修改的单元格"""
+    xml = _CELL_RE.sub(lambda m: patch.replace_cell(m, inline), xml)
+    missing = set(patch.edits) - patch.applied
+    if missing:
+        # 只替换已有单元格；新增单元格需要调整行结构，交给 openpyxl 写入
+        raise PatchUnsupported(f"工作表中不存在以下单元格，无法补丁写入: {sorted(missing)}")
+    return xml
+
+
+def _patch_shared_strings(xml, patch):
+    """在共享字符串表末尾追加新文本，并更新 count/uniqueCount"""
+    def update_header(match):
+        header = match.group(0)
+        for name, delta in (('count', patch.added_refs - patch.removed_refs),
+                            ('uniqueCount', len(patch.new_strings))):
+            header = re.sub(rf'\b{name}="(\d+)"',
+                            lambda m: f'{name}="{int(m.group(1)) + delta}"', header)
+        return header
+
+    match = _SST_RE.search(xml)
+    prefix = match.group(1) if match else ''
+    xml = _SST_RE.sub(update_header, xml, count=1)
+    added = ''.join(f'<{prefix}si>{_text_element(text, prefix)}</{prefix}si>' for text in patch.new_strings)
+    if xml.rstrip().endswith('/>'):
+        # 空表 <sst .../>
+        head = xml.rstrip()[:-2]
+        return f'{head}>{added}</{prefix}sst>'
+    end = xml.rindex(f'</{prefix}sst>')
+    return xml[:end] + added + xml[end:]
+
+
+def patch_cells(input_path, output_path, edits):
+    """
+    把单元格修改直接写入xlsx文件
+
+    Args:
+        input_path: 源xlsx文件
+        output_path: 输出路径（可与源文件相同）
+        edits: {(行号, 列号): 值}，值为 str/int/float/bool/None；
+               被修改的单元格必须已存在于活动工作表中且不含公式（保留原有样式和其他属性）
+
+    Returns:
+        写入的单元格数
+
+    Raises:
+        PatchUnsupported: 修改的单元格不存在或含公式（不写入任何内容）
+    """
+    with XlsxXmlReader(input_path) as reader:
+        sheet_path = reader.sheet_path
+        has_shared = _SHARED_STRINGS in reader.zip.namelist()
+        patch = _Patch(edits, len(reader.shared_strings))
+
+        # 没有共享字符串表的工作簿用内联字符串，不必新增部件和关系
+        sheet_xml = reader.zip.read(sheet_path).decode('utf-8')
+        sheet_xml = _patch_sheet(sheet_xml, patch, inline=not has_shared)
+        patched = {sheet_path: sheet_xml.encode('utf-8')}
+        if has_shared and (patch.added_refs or patch.removed_refs):
+            sst_xml = reader.zip.read(_SHARED_STRINGS).decode('utf-8')
+            patched[_SHARED_STRINGS] = _patch_shared_strings(sst_xml, patch).encode('utf-8')
+
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(tmp_path, 'w') as out:
+            for info in reader.zip.infolist():
+                data = patched.get(info.filename)
+                if data is None:
+                    data = reader.zip.read(info.filename)
+                out.writestr(info, data)
+
+    os.replace(tmp_path, output_path)
+    return len(patch.applied)
+
+
+class _PatchCell:
+    """PatchedSheet.cell() 返回的单元格，只有 value 属性"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class PatchedSheet:
+    """
+    补丁模式下的工作表
+
+    只读入需要的几列（XML流式解析），提供与 openpyxl 工作表相同的 max_row / max_column /
+    cell(row, column, value) 接口；写入只记录修改，保存时由 patch_cells 写回文件。
+    """
+
+    def __init__(self, path, max_col=3):
+        """
+        Args:
+            path: xlsx文件路径
+            max_col: 读入的列数（默认A-C列）
+        """
+        self.path = path
+        self.max_column = max_col
+        self.rows = {}
+        self.edits = {}
+        with XlsxXmlReader(path) as reader:
+            for row_idx, values in reader.iter_rows(max_col):
+                self.rows[row_idx] = values
+        self.max_row = max(self.rows, default=0)
+
+    def cell(self, row, column, value=None):
+        """读取单元格；传入 value 时记录修改（与 openpyxl 的 ws.cell 相同，value=None 不修改）"""
+        if value is not None:
+            self.edits[(row, column)] = value
+        if (row, column) in self.edits:
+            return _PatchCell(self.edits[(row, column)])
+        values = self.rows.get(row)
+        if values is None or column > len(values):
+            return _PatchCell(None)
+        return _PatchCell(values[column - 1])
+
+    def iter_rows(self, min_row=1, max_col=None):
+        """
+        逐行读取当前内容（含未保存的修改）
+
+        Yields:
+            (行号, (值, ...))
+        """
+        max_col = max_col or self.max_column
+        for row_idx in range(min_row, self.max_row + 1):
+            yield row_idx, tuple(self.cell(row_idx, col).value for col in range(1, max_col + 1))
+
+    def save(self, output_path):
+        """
+        写回修改
+
+        Args:
+            output_path: 输出路径（可与源文件相同）
+        """
+        if not self.edits and os.path.abspath(output_path) == os.path.abspath(self.path):
+            return
+        try:
+            patch_cells(self.path, output_path, self.edits)
+        except PatchUnsupported as e:
+            print(f"  {e}，改用 openpyxl 整本写回")
+            wb = openpyxl.load_workbook(self.path)
+            ws = wb.active
+            for (row, column), value in self.edits.items():
+                ws.cell(row=row, column=column, value=value)
+            wb.save(output_path)
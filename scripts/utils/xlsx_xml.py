@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+基于XML流式解析的xlsx读取
+直接打开xlsx压缩包：共享字符串表只解析一次，活动工作表用 iterparse 逐行解析，
+只解码需要的列，逐行产出，不构建任何单元格对象。
+返回值与 openpyxl（非 data_only）一致：数字为 int/float，日期格式的数字转为 datetime，
+公式单元格返回 "=公式文本"，数组公式返回 ArrayFormula，共享公式的从属单元格按位置平移公式。
+"""
+
+import posixpath
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+from xml.etree.ElementTree import iterparse
+
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+from openpyxl.worksheet.formula import ArrayFormula, DataTableFormula
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_ROW = f'{_NS}row'
+_CELL = f'{_NS}c'
+_VALUE = f'{_NS}v'
+_FORMULA = f'{_NS}f'
+_INLINE = f'{_NS}is'
+_TEXT = f'{_NS}t'
+_RUN = f'{_NS}r'
+_SHEET_DATA = f'{_NS}sheetData'
+
+# 数字格式分类
+_FMT_NUMBER = 0
+_FMT_DATE = 1
+_FMT_TIMEDELTA = 2
+
+
+def _rich_text(elem):
+    """<si>/<is> 元素的文本：纯文本 <t>，或富文本各 <r><t> 拼接（忽略拼音 <rPh>）"""
+    t = elem.find(_TEXT)
+    if t is not None:
+        return t.text or ''
+    return ''.join(run.findtext(_TEXT, '') for run in elem.iter(_RUN))
+
+
+def _column_of(ref):
+    """从 "C12" 取列号"""
+    letters = ref.rstrip('0123456789')
+    return column_index_from_string(letters)
+
+
+def _cast_number(text):
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+
+class XlsxXmlReader:
+    """
+    xlsx流式读取器
+
+    Args:
+        file_path: xlsx文件路径
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.zip = zipfile.ZipFile(file_path)
+        self._names = set(self.zip.namelist())
+        self.sheet_path, self.epoch = self._active_sheet()
+        self.shared_strings = self._read_shared_strings()
+        self.style_kinds = self._read_style_kinds()
+        self._shared_formulae = {}
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _parse(self, name):
+        with self.zip.open(name) as f:
+            for _, elem in iterparse(f):
+                yield elem
+
+    def _active_sheet(self):
+        """返回 (活动工作表在压缩包中的路径, 日期纪元)"""
+        with self.zip.open('xl/workbook.xml') as f:
+            root = ElementTree.parse(f).getroot()
+        epoch = CALENDAR_WINDOWS_1900
+        pr = root.find(f'{_NS}workbookPr')
+        if pr is not None and pr.get('date1904') in ('1', 'true'):
+            epoch = CALENDAR_MAC_1904
+
+        active = 0
+        view = root.find(f'{_NS}bookViews/{_NS}workbookView')
+        if view is not None:
+            active = int(view.get('activeTab', 0))
+        sheets = root.findall(f'{_NS}sheets/{_NS}sheet')
+        sheet = sheets[active] if active < len(sheets) else sheets[0]
+        rel_id = sheet.get(f'{_REL_NS}id')
+
+        target = None
+        for elem in self._parse('xl/_rels/workbook.xml.rels'):
+            if elem.tag == f'{_PKG_REL_NS}Relationship' and elem.get('Id') == rel_id:
+                target = elem.get('Target')
+                break
+        if target.startswith('/'):
+            path = target.lstrip('/')
+        else:
+            path = posixpath.normpath(posixpath.join('xl', target))
+        return path, epoch
+
+    def _read_shared_strings(self):
+        name = 'xl/sharedStrings.xml'
+        if name not in self._names:
+            return []
+        strings = []
+        for elem in self._parse(name):
+            if elem.tag == f'{_NS}si':
+                strings.append(_rich_text(elem))
+                elem.clear()
+        return strings
+
+    def _read_style_kinds(self):
+        """单元格样式序号 -> 数字格式分类（普通数字/日期/时长）"""
+        name = 'xl/styles.xml'
+        if name not in self._names:
+            return []
+        custom = {}
+        kinds = []
+        in_cell_xfs = False
+        with self.zip.open(name) as f:
+            for event, elem in iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == f'{_NS}cellXfs':
+                        in_cell_xfs = True
+                    continue
+                if elem.tag == f'{_NS}numFmt':
+                    custom[int(elem.get('numFmtId'))] = elem.get('formatCode')
+                elif elem.tag == f'{_NS}xf' and in_cell_xfs:
+                    fmt_id = int(elem.get('numFmtId', 0))
+                    fmt = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+                    if fmt is None:
+                        kinds.append(_FMT_NUMBER)
+                    elif is_timedelta_format(fmt):
+                        kinds.append(_FMT_TIMEDELTA)
+                    elif is_date_format(fmt):
+                        kinds.append(_FMT_DATE)
+                    else:
+                        kinds.append(_FMT_NUMBER)
+                elif elem.tag == f'{_NS}cellXfs':
+                    in_cell_xfs = False
+        return kinds
+
+    def _formula_value(self, cell, formula):
+        """公式单元格的值，与 openpyxl WorkSheetParser.parse_formula 相同"""
+        value = '='
+        if formula.text is not None:
+            value += formula.text
+
+        formula_type = formula.get('t')
+        if formula_type == 'array':
+            return ArrayFormula(ref=formula.get('ref'), text=value)
+        if formula_type == 'shared':
+            idx = formula.get('si')
+            if idx in self._shared_formulae:
+                return self._shared_formulae[idx].translate_formula(cell.get('r'))
+            if value != '=':
+                self._shared_formulae[idx] = Translator(value, cell.get('r'))
+        elif formula_type == 'dataTable':
+            return DataTableFormula(**formula.attrib)
+        return value
+
+    def _cell_value(self, cell):
+        data_type = cell.get('t', 'n')
+
+        formula = cell.find(_FORMULA)
+        if formula is not None:
+            return self._formula_value(cell, formula)
+
+        if data_type == 'inlineStr':
+            inline = cell.find(_INLINE)
+            return _rich_text(inline) if inline is not None else None
+
+        text = cell.findtext(_VALUE)
+        if text is None:
+            return None
+        if data_type == 's':
+            return self.shared_strings[int(text)]
+        if data_type == 'b':
+            return bool(int(text))
+        if data_type == 'str' or data_type == 'e':
+            return text
+        if data_type == 'd':
+            return datetime.fromisoformat(text.rstrip('Z'))
+
+        value = _cast_number(text)
+        style = cell.get('s')
+        if style is not None and self.style_kinds:
+            kind = self.style_kinds[int(style)] if int(style) < len(self.style_kinds) else _FMT_NUMBER
+            if kind == _FMT_DATE:
+                return from_excel(value, self.epoch)
+            if kind == _FMT_TIMEDELTA:
+                return from_excel(value, self.epoch, timedelta=True)
+        return value
+
+    def iter_rows(self, max_col, min_col=1, min_row=1):
+        """
+        逐行读取指定列
+
+        Args:
+            max_col: 读取到第几列
+            min_col: 从第几列开始
+            min_row: 从第几行开始
+
+        Yields:
+            (行号, (值, ...))；缺失的行和单元格补None，与 openpyxl 只读模式的 iter_rows 一致
+        """
+        width = max_col - min_col + 1
+        empty = (None,) * width
+        next_row = min_row
+        row_idx = 0
+        sheet_data = None
+        self._shared_formulae = {}
+
+        with self.zip.open(self.sheet_path) as f:
+            for event, elem in iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == _SHEET_DATA:
+                        sheet_data = elem
+                    continue
+                if elem.tag != _ROW:
+                    continue
+
+                r = elem.get('r')
+                row_idx = int(r) if r else row_idx + 1
+                if row_idx >= min_row:
+                    values = [None] * width
+                    col = 0
+                    for cell in elem.findall(_CELL):
+                        ref = cell.get('r')
+                        col = _column_of(ref) if ref else col + 1
+                        if min_col <= col <= max_col:
+                            values[col - min_col] = self._cell_value(cell)
+                        else:
+                            # 范围外的共享公式主单元格也要登记，从属单元格可能在范围内
+                            formula = cell.find(_FORMULA)
+                            if formula is not None and formula.get('t') == 'shared':
+                                self._formula_value(cell, formula)
+
+                    while next_row < row_idx:
+                        yield next_row, empty
+                        next_row += 1
+                    yield row_idx, tuple(values)
+                    next_row = row_idx + 1
+
+                # 已处理的行从树中移除，内存与行数无关
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+
+def iter_sheet_values_xml(file_path, max_col, min_col=1, min_row=2):
+    """
+    与 workbook_reader.iter_sheet_values 相同的接口，使用XML流式解析
+
+    Yields:
+        (行号, (值, ...))
+    """
+    with XlsxXmlReader(file_path) as reader:
+        yield from reader.iter_rows(max_col, min_col, min_row)
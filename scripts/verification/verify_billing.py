@@ -16,122 +16,128 @@ import re
 import sys
 from collections import defaultdict
 
-import openpyxl
-
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from scripts.utils.common import parse_shop_and_distance
+from scripts.utils.common import route_from_record, ESTIMATE_MARK
+from scripts.utils.metrics import METRICS, add_metrics_arguments, count, dump_metrics, stage, timed
+from scripts.utils.workbook_session import open_route_records, source_path
+
+
+def _segment_status(line):
+    """判断一个站点行的距离填充状态"""
+    if '-?km' in line:
+        return "待填充"
+    if re.search(r'-\d+(\.\d+)?km', line):
+        return "已填充"
+    if re.search(rf'-{ESTIMATE_MARK}\d+(\.\d+)?km', line):
+        return "估算"
+    return "无距离"
 
 
+@timed()
 def verify_filled_data(excel_file, preview_rows=10):
     """
     验证填充后的数据
+
+    逐行读取，前 preview_rows 车打印预览，同时累计整本的统计
+
+    Args:
+        excel_file: Excel文件路径，或已加载的 WorkbookSession
+        preview_rows: 预览车次数
     """
     print("=" * 100)
     print("验证填充后的对账单数据")
     print("=" * 100)
-    print(f"文件: {excel_file}")
-
-    wb = openpyxl.load_workbook(excel_file)
-    ws = wb.active
+    print(f"文件: {source_path(excel_file)}")
 
     print(f"\n前{preview_rows}车的数据预览:\n")
 
-    for row_idx in range(2, min(preview_rows + 2, ws.max_row + 1)):
-        vehicle_no = ws.cell(row=row_idx, column=1).value
-        shop_names_cell = ws.cell(row=row_idx, column=3).value
-
-        if vehicle_no is None:
-            break
-
-        print(f"车次 {vehicle_no}:")
-        print("-" * 80)
+    status_counts = defaultdict(int)
 
-        if shop_names_cell:
-            shop_lines = str(shop_names_cell).split('\n')
-            for i, line in enumerate(shop_lines, 1):
-                line = line.strip()
-                if not line:
-                    continue
+    with stage('scan_rows'):
+        for i, record in enumerate(open_route_records(excel_file)):
+            preview = i < preview_rows
+            if preview:
+                print(f"车次 {record.vehicle_no}:")
+                print("-" * 80)
 
-                if '-?km' in line:
-                    status = "待填充"
-                elif re.search(r'-\d+(\.\d+)?km', line):
-                    status = "已填充"
-                else:
-                    status = "无距离"
+            if record.route_text:
+                shop_lines = str(record.route_text).split('\n')
+                for j, line in enumerate(shop_lines, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
 
-                print(f"  {i}. {line} [{status}]")
+                    status = _segment_status(line)
+                    status_counts[status] += 1
+                    if preview:
+                        print(f"  {j}. {line} [{status}]")
 
-        print()
+            if preview:
+                print()
 
     # 统计
     print("=" * 100)
     print("统计信息")
     print("=" * 100)
 
-    total_segments = 0
-    filled_segments = 0
-    missing_segments = 0
-
-    for row_idx in range(2, ws.max_row + 1):
-        vehicle_no = ws.cell(row=row_idx, column=1).value
-        shop_names_cell = ws.cell(row=row_idx, column=3).value
-
-        if vehicle_no is None:
-            break
-
-        if shop_names_cell:
-            shop_lines = str(shop_names_cell).split('\n')
-            for line in shop_lines:
-                line = line.strip()
-                if line:
-                    total_segments += 1
-                    if '-?km' in line:
-                        missing_segments += 1
-                    elif re.search(r'-\d+(\.\d+)?km', line):
-                        filled_segments += 1
+    total_segments = sum(status_counts.values())
+    filled_segments = status_counts["已填充"]
+    missing_segments = status_counts["待填充"]
+    estimated_segments = status_counts["估算"]
 
     print(f"\n总路段数: {total_segments}")
     if total_segments > 0:
         print(f"已填充: {filled_segments} ({filled_segments/total_segments*100:.1f}%)")
+        if estimated_segments:
+            print(f"估算: {estimated_segments} ({estimated_segments/total_segments*100:.1f}%)")
         print(f"待填充: {missing_segments} ({missing_segments/total_segments*100:.1f}%)")
 
-    wb.close()
+    count('segments', total_segments)
+    count('segments.filled', filled_segments)
+    count('segments.estimated', estimated_segments)
+    count('segments.missing', missing_segments)
+
+
+def _date_sort_key(date_val):
+    """日期列可能混有序列号、日期对象、文本和空值，按类型分组后排序，空值排最后"""
+    if date_val is None:
+        return 2, ''
+    if isinstance(date_val, (int, float)):
+        return 0, date_val
+    return 1, str(date_val)
 
 
+@timed()
 def verify_summary(excel_file):
     """
     生成数据摘要
+
+    Args:
+        excel_file: Excel文件路径，或已加载的 WorkbookSession
     """
     print("=" * 100)
     print("对账单数据摘要")
     print("=" * 100)
-    print(f"文件: {excel_file}")
-
-    wb = openpyxl.load_workbook(excel_file)
-    ws = wb.active
+    print(f"文件: {source_path(excel_file)}")
 
     # 按日期统计
     date_stats = defaultdict(lambda: {'vehicles': 0, 'shops': 0})
     total_vehicles = 0
     total_shops = 0
 
-    for row_idx in range(2, ws.max_row + 1):
-        vehicle_no = ws.cell(row=row_idx, column=1).value
-        date_value = ws.cell(row=row_idx, column=2).value
-        shop_names_cell = ws.cell(row=row_idx, column=3).value
+    with stage('scan_rows'):
+        for record in open_route_records(excel_file):
+            route = route_from_record(record)
+            total_vehicles += 1
+            date_stats[route.date]['vehicles'] += 1
 
-        if vehicle_no is None:
-            break
-
-        total_vehicles += 1
-        date_stats[date_value]['vehicles'] += 1
-
-        if shop_names_cell:
-            shop_count = len([s for s in str(shop_names_cell).split('\n') if s.strip()])
+            shop_count = len(route.shops)
             total_shops += shop_count
-            date_stats[date_value]['shops'] += shop_count
+            date_stats[route.date]['shops'] += shop_count
+
+    count('vehicles', total_vehicles)
+    count('shops', total_shops)
 
     print(f"\n总车次: {total_vehicles}")
     print(f"总店铺: {total_shops}")
@@ -139,57 +145,54 @@ def verify_summary(excel_file):
 
     print("\n按日期统计:")
     print("-" * 60)
-    for date_val in sorted(date_stats.keys()):
+    for date_val in sorted(date_stats.keys(), key=_date_sort_key):
         stats = date_stats[date_val]
         print(f"  {date_val}: {stats['vehicles']} 车, {stats['shops']} 店")
 
-    wb.close()
-
 
+@timed()
 def verify_complete(excel_file):
     """
     完整性检查
+
+    Args:
+        excel_file: Excel文件路径，或已加载的 WorkbookSession
     """
     print("=" * 100)
     print("数据完整性检查")
     print("=" * 100)
-    print(f"文件: {excel_file}")
-
-    wb = openpyxl.load_workbook(excel_file)
-    ws = wb.active
+    print(f"文件: {source_path(excel_file)}")
 
     issues = []
 
-    for row_idx in range(2, ws.max_row + 1):
-        vehicle_no = ws.cell(row=row_idx, column=1).value
-        date_value = ws.cell(row=row_idx, column=2).value
-        shop_names_cell = ws.cell(row=row_idx, column=3).value
-
-        if vehicle_no is None:
-            break
-
-        # 检查必填字段
-        if not vehicle_no:
-            issues.append(f"行{row_idx}: 缺少车次序号")
-        if not date_value:
-            issues.append(f"行{row_idx}: 缺少日期")
-        if not shop_names_cell:
-            issues.append(f"行{row_idx}: 缺少店铺信息")
-            continue
-
-        # 检查店铺数据格式
-        shop_lines = str(shop_names_cell).split('\n')
-        if len(shop_lines) == 0:
-            issues.append(f"行{row_idx}: 店铺列表为空")
-
-        for i, line in enumerate(shop_lines, 1):
-            line = line.strip()
-            if not line:
+    with stage('scan_rows'):
+        for record in open_route_records(excel_file):
+            row_idx = record.row
+
+            # 检查必填字段
+            if not record.vehicle_no:
+                issues.append(f"行{row_idx}: 缺少车次序号")
+            if not record.date:
+                issues.append(f"行{row_idx}: 缺少日期")
+            if not record.route_text:
+                issues.append(f"行{row_idx}: 缺少店铺信息")
                 continue
 
-            # 检查是否有异常字符
-            if '\t' in line:
-                issues.append(f"行{row_idx}店铺{i}: 包含制表符")
+            # 检查店铺数据格式
+            shop_lines = str(record.route_text).split('\n')
+            if len(shop_lines) == 0:
+                issues.append(f"行{row_idx}: 店铺列表为空")
+
+            for i, line in enumerate(shop_lines, 1):
+                line = line.strip()
+                if not line:
+                    continue
+
+                # 检查是否有异常字符
+                if '\t' in line:
+                    issues.append(f"行{row_idx}店铺{i}: 包含制表符")
+
+    count('issues', len(issues))
 
     if issues:
         print(f"\n发现 {len(issues)} 个问题:")
@@ -200,27 +203,45 @@ def verify_complete(excel_file):
     else:
         print("\n检查通过！未发现问题。")
 
-    wb.close()
+
+VERIFY_MODES = ('filled', 'summary', 'complete')
+
+
+def run_verification(excel_file, mode, preview_rows=10):
+    """
+    按模式运行验证
+
+    Args:
+        excel_file: Excel文件路径，或已加载的 WorkbookSession
+        mode: 'filled' / 'summary' / 'complete'
+        preview_rows: filled 模式的预览车次数
+    """
+    if mode == 'filled':
+        verify_filled_data(excel_file, preview_rows)
+    elif mode == 'summary':
+        verify_summary(excel_file)
+    elif mode == 'complete':
+        verify_complete(excel_file)
+    else:
+        raise ValueError(f"未知验证模式: {mode}, 支持: {list(VERIFY_MODES)}")
 
 
 def main():
     parser = argparse.ArgumentParser(description='对账单数据验证工具')
     parser.add_argument('--mode', '-m', required=True,
-                        choices=['filled', 'summary', 'complete'],
+                        choices=VERIFY_MODES,
                         help='验证模式: filled/summary/complete')
     parser.add_argument('--input', '-i', required=True,
                         help='输入Excel文件路径')
     parser.add_argument('--rows', '-r', type=int, default=10,
                         help='预览行数（默认10）')
+    add_metrics_arguments(parser)
 
     args = parser.parse_args()
+    METRICS.reset('verify_billing')
 
-    if args.mode == 'filled':
-        verify_filled_data(args.input, args.rows)
-    elif args.mode == 'summary':
-        verify_summary(args.input)
-    elif args.mode == 'complete':
-        verify_complete(args.input)
+    run_verification(args.input, args.mode, args.rows)
+    dump_metrics(args)
 
 
 if __name__ == '__main__':
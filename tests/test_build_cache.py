@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""增量构建的缓存步骤：对账单内容不变时重新保存不应改变距离缓存"""
+
+import json
+import os
+import shutil
+
+import openpyxl
+import pytest
+
+from conftest import REPO_ROOT
+from scripts.core.build import build
+from scripts.utils.parse_cache import configure_parse_cache
+
+HEFEI_2025 = os.path.join('data', 'hefei', 'summary', '2025')
+HEFEI_CACHE = os.path.join('data', 'hefei', 'cache', 'reusable_distances.json')
+OLD_STATEMENT = os.path.join(HEFEI_2025, '惠宜选合肥仓9月份对账单9.22.xlsx')
+
+
+@pytest.fixture
+def hefei_tree(tmp_path, monkeypatch):
+    """只含2025年合肥对账单和距离缓存的工作目录（没有当年对账单和模板，构建只有缓存步骤）"""
+    shutil.copytree(os.path.join(REPO_ROOT, HEFEI_2025), tmp_path / HEFEI_2025)
+    os.makedirs(tmp_path / os.path.dirname(HEFEI_CACHE))
+    shutil.copy(os.path.join(REPO_ROOT, HEFEI_CACHE), tmp_path / HEFEI_CACHE)
+    monkeypatch.chdir(tmp_path)
+    configure_parse_cache(cache_dir=str(tmp_path / 'parse'))
+    yield tmp_path
+    configure_parse_cache(cache_dir=os.path.join('data', 'cache', 'parse'))
+
+
+def _load_cache():
+    with open(HEFEI_CACHE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_resaving_old_statement_keeps_cache(hefei_tree):
+    manifest = str(hefei_tree / 'build_manifest.json')
+    assert build(['hefei'], manifest_path=manifest)
+    built = _load_cache()
+
+    # 只重新保存，单元格内容不变（文件哈希变化）
+    wb = openpyxl.load_workbook(OLD_STATEMENT)
+    wb.save(OLD_STATEMENT)
+
+    assert build(['hefei'], manifest_path=manifest)
+    assert _load_cache() == built
+
+
+def test_cache_keeps_segments_not_in_statements(hefei_tree):
+    cache = _load_cache()
+    cache['手工店甲 -> 手工店乙'] = 12.5
+    with open(HEFEI_CACHE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+
+    assert build(['hefei'], manifest_path=str(hefei_tree / 'build_manifest.json'))
+    assert _load_cache()['手工店甲 -> 手工店乙'] == 12.5
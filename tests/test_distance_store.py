@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""SQLite后端的索引查询与 DistanceIndex 的匹配层级一致"""
+
+import os
+
+import pytest
+
+from conftest import REPO_ROOT
+from scripts.utils.common import build_distance_index
+from scripts.utils.distance_store import JsonDistanceStore, SqliteDistanceStore
+
+
+def _variants(from_store, to_store):
+    """原始名称，以及需要括号变体/标准化/激进标准化才能命中的写法"""
+    yield from_store, to_store
+    yield from_store.replace('（', '(').replace('）', ')'), to_store.replace('(', '（').replace(')', '）')
+    yield from_store.replace('店', ''), to_store
+    yield f" {from_store}-", to_store.replace('超市', '')
+
+
+@pytest.mark.parametrize('region', ['hefei', 'jiangxi'])
+def test_sqlite_lookup_matches_index(tmp_path, region):
+    cache_file = os.path.join(REPO_ROOT, 'data', region, 'cache', 'reusable_distances.json')
+    table = JsonDistanceStore(cache_file).load()
+    index = build_distance_index(table)
+
+    store = SqliteDistanceStore(str(tmp_path / 'distances.sqlite3'), region)
+    try:
+        store.import_json(cache_file)
+        names = index.store_names()
+        pairs = [table.key_at(row).split(' -> ') for row in range(0, len(table), 7)]
+        pairs += [(names[i], names[(i * 31 + 7) % len(names)]) for i in range(0, len(names), 5)]
+        for from_store, to_store in pairs:
+            for pair in _variants(from_store, to_store):
+                assert store.lookup(*pair) == index.lookup(*pair)[:2], pair
+    finally:
+        store.close()
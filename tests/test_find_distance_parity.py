@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""find_distance 与原线性扫描实现的一致性（使用仓库中已提交的合肥/江西距离缓存）"""
+
+import json
+import os
+import re
+
+import pytest
+
+from conftest import REPO_ROOT
+from scripts.utils.common import build_distance_index, find_distance, normalize_store_name
+
+
+def _baseline_normalize(name, aggressive=False):
+    """原实现的店名标准化（逐字保留，作为对照）"""
+    if not name:
+        return None
+    name = str(name).strip().replace('（', '(').replace('）', ')')
+    name = re.sub(r'\s+', '', name)
+    if aggressive:
+        name = name.replace('历臣', '厉臣')
+        name = name.replace('—', '-').replace('－', '-')
+        name = re.sub(r'共橙[-\s]*站式', '共橙一站式', name)
+        name = name.replace('供橙超市', '共橙超市')
+        name = name.replace('供橙一站式超市', '共橙一站式超市')
+    return name
+
+
+def _baseline_find_distance(distances, from_store, to_store):
+    """原实现：直接键、标准化键、括号变体，然后按缓存顺序线性扫描"""
+    from_norm = _baseline_normalize(from_store)
+    to_norm = _baseline_normalize(to_store)
+    if not from_norm or not to_norm:
+        return None, None
+
+    for key in (f"{from_store} -> {to_store}",
+                f"{from_norm} -> {to_norm}",
+                f"{from_store.replace('（', '(').replace('）', ')')} -> "
+                f"{to_store.replace('（', '(').replace('）', ')')}",
+                f"{from_store.replace('(', '（').replace(')', '）')} -> "
+                f"{to_store.replace('(', '（').replace(')', '）')}"):
+        if key in distances:
+            return distances[key], key
+
+    from_agg = _baseline_normalize(from_store, aggressive=True)
+    to_agg = _baseline_normalize(to_store, aggressive=True)
+    for key, dist in distances.items():
+        if ' -> ' not in key:
+            continue
+        parts = key.split(' -> ')
+        if len(parts) != 2:
+            continue
+        if (_baseline_normalize(parts[0]) == from_norm
+                and _baseline_normalize(parts[1]) == to_norm):
+            return dist, key
+        if (_baseline_normalize(parts[0], aggressive=True) == from_agg
+                and _baseline_normalize(parts[1], aggressive=True) == to_agg):
+            return dist, key
+    return None, None
+
+
+def _load_cache(region):
+    cache_file = os.path.join(REPO_ROOT, 'data', region, 'cache', 'reusable_distances.json')
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _queries(distances):
+    """缓存中的每个路段，以及其全角/半角括号写法"""
+    for key in distances:
+        from_store, to_store = key.split(' -> ')
+        yield from_store, to_store
+        yield (from_store.replace('(', '（').replace(')', '）'),
+               to_store.replace('(', '（').replace(')', '）'))
+        yield (from_store.replace('（', '(').replace('）', ')'),
+               to_store.replace('（', '(').replace('）', ')'))
+
+
+def _equivalent(key, from_store, to_store):
+    """key 与查询在标准化或激进标准化意义下是否为同一店名对"""
+    key_from, key_to = key.split(' -> ')
+    return any(
+        normalize_store_name(key_from, aggressive=aggressive) == normalize_store_name(from_store, aggressive=aggressive)
+        and normalize_store_name(key_to, aggressive=aggressive) == normalize_store_name(to_store, aggressive=aggressive)
+        for aggressive in (False, True))
+
+
+def _mismatches(distances):
+    index = build_distance_index(distances)
+    result = []
+    for query in _queries(distances):
+        expected = _baseline_find_distance(distances, *query)
+        actual = find_distance(index, *query)
+        assert find_distance(distances, *query) == actual, query
+        if actual != expected:
+            result.append((query, expected, actual))
+    return result
+
+
+@pytest.mark.parametrize('region', ['hefei', 'jiangxi'])
+def test_find_distance_only_diverges_on_duplicate_keys(region):
+    """
+    与原实现不一致的查询只能是缓存里同一店名对有多条等价记录的情况：
+    两边命中的都是与查询等价的记录，只是选中的那条不同
+    """
+    distances = _load_cache(region)
+    for query, expected, actual in _mismatches(distances):
+        assert expected[1] is not None and actual[1] is not None, query
+        assert expected[1] != actual[1], query
+        assert _equivalent(expected[1], *query), (query, expected)
+        assert _equivalent(actual[1], *query), (query, actual)
+
+
+@pytest.mark.parametrize('region, key_diffs, distance_diffs', [
+    ('hefei', 1, 0),
+    ('jiangxi', 39, 14),
+])
+def test_find_distance_parity_counts(region, key_diffs, distance_diffs):
+    """差异数量固定下来（命中键不同 / 其中距离也不同），缓存或查询逻辑变化时需要复核"""
+    mismatches = _mismatches(_load_cache(region))
+    assert len(mismatches) == key_diffs
+    assert sum(expected[0] != actual[0] for _, expected, actual in mismatches) == distance_diffs
+
+
+def test_find_distance_duplicate_normalization_case():
+    """
+    江西缓存中 "共橙一站式超市(永修建昌大道店) -> 共橙一站式超市(德安宝塔大道店)" 有两条等价记录：
+    原实现线性扫描先遇到激进等价的 "共橙- -站式超市(...)"（48km），
+    索引按层级优先取标准化等价的 "共橙一站式超市 (...)"（41km）
+    """
+    distances = _load_cache('jiangxi')
+    query = ('共橙一站式超市 (永修建昌大道店)', '共橙一站式超市(德安宝塔大道店)')
+
+    assert _baseline_find_distance(distances, *query) == (
+        48.0, '共橙- -站式超市(永修建昌大道店) -> 共橙一站式超市(德安宝塔大道店)')
+    assert find_distance(distances, *query) == (
+        41.0, '共橙一站式超市 (永修建昌大道店) -> 共橙一站式超市（德安宝塔大道店）')
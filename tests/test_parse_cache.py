@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""解析缓存的 index.json：并行进程各自写入时不丢失记录，淘汰时清理失效记录"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from scripts.utils.parse_cache import ParseCache
+
+
+def _parse_in_worker(cache_dir, path):
+    cache = ParseCache(cache_dir)
+    return cache.get_or_parse(path, 'text', lambda: open(path, encoding='utf-8').read(),
+                              lambda text: [text], lambda columns: columns[0])
+
+
+def _write_sources(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'src{i}.txt'
+        path.write_text(f'内容{i}', encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+def test_parallel_workers_keep_all_index_entries(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    paths = _write_sources(tmp_path, 24)
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(_parse_in_worker, [cache_dir] * len(paths), paths))
+    assert results == [f'内容{i}' for i in range(len(paths))]
+
+    with open(os.path.join(cache_dir, 'index.json'), encoding='utf-8') as f:
+        index = json.load(f)
+    assert set(index) == {os.path.abspath(path) for path in paths}
+
+
+def test_evict_prunes_missing_sources(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    paths = _write_sources(tmp_path, 2)
+    for path in paths:
+        _parse_in_worker(cache_dir, path)
+    os.remove(paths[0])
+
+    ParseCache(cache_dir).evict()
+    with open(os.path.join(cache_dir, 'index.json'), encoding='utf-8') as f:
+        assert set(json.load(f)) == {os.path.abspath(paths[1])}
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""单元格补丁：保留其他属性、带前缀的工作表、含公式的单元格改用openpyxl写回"""
+
+import re
+import zipfile
+
+import openpyxl
+import pytest
+
+from scripts.utils.xlsx_patch import PatchedSheet, PatchUnsupported, patch_cells
+
+SHEET = 'xl/worksheets/sheet1.xml'
+
+
+def _workbook(path, formula=False):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws['A1'] = '序号'
+    ws['C1'] = '店名'
+    ws['A2'] = 1
+    ws['C2'] = '=A2*2' if formula else '店A\n店B'
+    wb.save(path)
+
+
+def _rewrite_sheet(path, transform):
+    with zipfile.ZipFile(path) as src:
+        members = [(info, src.read(info.filename)) for info in src.infolist()]
+    with zipfile.ZipFile(path, 'w') as out:
+        for info, data in members:
+            if info.filename == SHEET:
+                data = transform(data.decode('utf-8')).encode('utf-8')
+            out.writestr(info, data)
+
+
+def _sheet_xml(path):
+    with zipfile.ZipFile(path) as z:
+        return z.read(SHEET).decode('utf-8')
+
+
+def test_patch_keeps_unknown_attributes(tmp_path):
+    path = str(tmp_path / 'a.xlsx')
+    _workbook(path)
+    _rewrite_sheet(path, lambda xml: xml.replace('<c r="C2"', '<c r="C2" cm="1" ph="1"'))
+
+    assert patch_cells(path, path, {(2, 3): '店A-10km\n店B-5km'}) == 1
+    cell = re.search(r'<c r="C2"[^>]*>', _sheet_xml(path)).group(0)
+    assert 'cm="1"' in cell and 'ph="1"' in cell
+    assert openpyxl.load_workbook(path).active['C2'].value == '店A-10km\n店B-5km'
+
+
+def test_patch_prefixed_sheet(tmp_path):
+    path = str(tmp_path / 'a.xlsx')
+    _workbook(path)
+
+    def add_prefix(xml):
+        xml = xml.replace('xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"',
+                          'xmlns:x="http://schemas.openxmlformats.org/spreadsheetml/2006/main"')
+        return re.sub(r'<(/?)(worksheet|sheetPr|outlinePr|pageSetUpPr|dimension|sheetViews|sheetView|selection|'
+                      r'sheetFormatPr|sheetData|row|c|v|is|t|pageMargins)\b', r'<\1x:\2', xml)
+    _rewrite_sheet(path, add_prefix)
+
+    assert patch_cells(path, path, {(2, 3): '店A-10km'}) == 1
+    assert '<x:c r="C2"' in _sheet_xml(path)
+    assert openpyxl.load_workbook(path).active['C2'].value == '店A-10km'
+
+
+def test_formula_cell_falls_back_to_openpyxl(tmp_path):
+    path = str(tmp_path / 'a.xlsx')
+    _workbook(path, formula=True)
+
+    with pytest.raises(PatchUnsupported):
+        patch_cells(path, path, {(2, 3): '店A-10km'})
+
+    sheet = PatchedSheet(path)
+    sheet.cell(2, 3, '店A-10km')
+    sheet.save(path)
+    assert openpyxl.load_workbook(path).active['C2'].value == '店A-10km'